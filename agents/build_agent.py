@@ -1,28 +1,27 @@
 import logging
 from utils.logger import setup_logger  # Centralized logger from utils
-from openai import OpenAI  # OpenAI v1.x client
+from utils.llm_gateway import LLMGateway, DEFAULT_MODEL  # Shared LLM gateway
+from utils.helper_functions import write_stream
 
 class BuildAgent:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None):
         """
         Initializes the BuildAgent with the given configuration.
         :param config: A configuration object/dictionary containing build options.
+        :param gateway: Optional shared LLMGateway; a private one is created if omitted.
         """
         self.config = config
         self.logger = setup_logger(__name__)
         self.logger.info("BuildAgent initialized with configuration.")
 
-        # Initialize OpenAI Client
-        self.client = OpenAI(api_key=self.config.get("openai_api_key", ""))
+        # Shared LLM gateway (pooled OpenAI client)
+        self.llm = gateway or LLMGateway.from_config(self.config)
 
-    def compile_code(self):
+    def build_prompt(self):
         """
-        Generates a complete and optimized Python build script using the OpenAI API.
-        :return: Generated code as a string.
+        Constructs the prompt for generating a build script.
+        :return: A formatted prompt string.
         """
-        self.logger.info("Starting build code generation...")
-
-        # Construct a prompt for generating a build script
         prompt = (
             "Generate a complete and optimized Python build script that performs the following tasks:\n"
             "- Cleans previous builds\n"
@@ -31,41 +30,104 @@ class BuildAgent:
             "- Generates binaries\n\n"
             "Include detailed comments for clarity."
         )
+        return prompt
 
-        code_output = self.get_code_output(prompt)
+    def compile_code(self, output_path=None):
+        """
+        Generates a complete and optimized Python build script using the OpenAI API.
+        :param output_path: Optional file the script is streamed to as it is generated.
+        :return: Generated code as a string.
+        """
+        self.logger.info("Starting build code generation...")
+        code_output = self.get_code_output(self.build_prompt(), output_path)
         self.logger.info("Build code generation completed.")
         return code_output
 
-    def get_code_output(self, prompt):
+    async def acompile_code(self):
+        """
+        Awaitable variant of compile_code().
+        :return: Generated code as a string.
+        """
+        self.logger.info("Starting build code generation...")
+        code_output = await self.aget_code_output(self.build_prompt())
+        self.logger.info("Build code generation completed.")
+        return code_output
+
+    def code_request(self, prompt):
+        """
+        Builds the chat completion request used for code generation.
+        :param prompt: A string prompt to send to the OpenAI API.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert in build automation and Python scripting."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 150,  # Adjust token limit as needed
+            "tag": "BuildAgent.get_code_output",
+        }
+
+    def stream_code_output(self, prompt):
+        """
+        Streams generated code from the OpenAI API as it arrives.
+        :param prompt: A string prompt to send to the OpenAI API.
+        :return: Generator of text chunks.
+        """
+        return self.llm.stream(**self.code_request(prompt))
+
+    def get_code_output(self, prompt, output_path=None):
         """
         Uses the OpenAI API to generate code output based on the given prompt.
         :param prompt: A string prompt to send to the OpenAI API.
+        :param output_path: Optional file the code is streamed to as it is generated.
         :return: The generated code as a string.
         """
         try:
             self.logger.info("Querying OpenAI API for code generation...")
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert in build automation and Python scripting."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,  # Adjust token limit as needed
-            )
-            generated_code = response.choices[0].message.content.strip()
+            if output_path:
+                generated_code = write_stream(self.stream_code_output(prompt), output_path).strip()
+            else:
+                generated_code = self.llm.complete(**self.code_request(prompt))
             self.logger.info("Received code from OpenAI API.")
             return generated_code
         except Exception as e:
             self.logger.error(f"OpenAI API call failed: {e}")
             return "No code generated."
 
-    def run_build(self):
+    async def aget_code_output(self, prompt):
+        """
+        Awaitable variant of get_code_output().
+        :param prompt: A string prompt to send to the OpenAI API.
+        :return: The generated code as a string.
+        """
+        try:
+            self.logger.info("Querying OpenAI API for code generation...")
+            generated_code = await self.llm.acomplete(**self.code_request(prompt))
+            self.logger.info("Received code from OpenAI API.")
+            return generated_code
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed: {e}")
+            return "No code generated."
+
+    def run_build(self, output_path=None):
         """
         Executes the build code generation process.
+        :param output_path: Optional file the script is streamed to as it is generated.
+        :return: The generated build script as a string.
+        """
+        self.logger.info("Running the build code generation process...")
+        code = self.compile_code(output_path)
+        return code
+
+    async def arun_build(self):
+        """
+        Awaitable variant of run_build().
         :return: The generated build script as a string.
         """
         self.logger.info("Running the build code generation process...")
-        code = self.compile_code()
+        code = await self.acompile_code()
         return code
 
 # Example usage (for standalone testing)
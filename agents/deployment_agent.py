@@ -1,56 +1,101 @@
 import logging
 from utils.logger import setup_logger  # Centralized logger from utils
-from openai import OpenAI  # OpenAI v1.x client
+from utils.llm_gateway import LLMGateway, DEFAULT_MODEL  # Shared LLM gateway
+from utils.helper_functions import write_stream
 
 class DeploymentAgent:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None):
         """
         Initializes the DeploymentAgent with the given configuration.
         :param config: A configuration object/dictionary containing deployment settings.
+        :param gateway: Optional shared LLMGateway; a private one is created if omitted.
         """
         self.config = config
         self.logger = setup_logger(__name__)
         self.logger.info("DeploymentAgent initialized with configuration.")
 
-        # Initialize OpenAI Client
-        self.client = OpenAI(api_key=self.config.get("openai_api_key", ""))
+        # Shared LLM gateway (pooled OpenAI client)
+        self.llm = gateway or LLMGateway.from_config(self.config)
 
-    def generate_deployment_script(self):
+    def deployment_request(self):
         """
-        Uses the OpenAI API to generate a complete deployment script in Python.
+        Builds the chat completion request used for deployment script generation.
         The script should cover packaging the project and deploying it to a target environment.
-        :return: The generated deployment script as a string.
+        :return: Keyword arguments for LLMGateway.complete().
         """
-        self.logger.info("Generating deployment script using OpenAI API...")
         prompt = (
             "Generate a complete and optimized deployment script in Python that performs the following tasks:\n"
             "- Packages the project (e.g., creates a distributable archive or builds a Docker image)\n"
             "- Deploys the packaged project to a target environment (e.g., cloud deployment, Kubernetes, etc.)\n\n"
             "Include detailed comments, proper error handling, and clear step-by-step instructions."
         )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert in cloud deployment and Python scripting."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 250,  # Adjust token limit as needed
+            "tag": "DeploymentAgent.generate_deployment_script",
+        }
+
+    def stream_deployment_script(self):
+        """
+        Streams the generated deployment script from the OpenAI API as it arrives.
+        :return: Generator of text chunks.
+        """
+        return self.llm.stream(**self.deployment_request())
+
+    def generate_deployment_script(self, output_path=None):
+        """
+        Uses the OpenAI API to generate a complete deployment script in Python.
+        The script should cover packaging the project and deploying it to a target environment.
+        :param output_path: Optional file the script is streamed to as it is generated.
+        :return: The generated deployment script as a string.
+        """
+        self.logger.info("Generating deployment script using OpenAI API...")
+        try:
+            if output_path:
+                generated_script = write_stream(self.stream_deployment_script(), output_path).strip()
+            else:
+                generated_script = self.llm.complete(**self.deployment_request())
+            self.logger.info("Deployment script generated successfully.")
+            return generated_script
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for generating deployment script: {e}")
+            return "No deployment script generated."
+
+    async def agenerate_deployment_script(self):
+        """
+        Awaitable variant of generate_deployment_script().
+        :return: The generated deployment script as a string.
+        """
+        self.logger.info("Generating deployment script using OpenAI API...")
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert in cloud deployment and Python scripting."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=250,  # Adjust token limit as needed
-            )
-            generated_script = response.choices[0].message.content.strip()
+            generated_script = await self.llm.acomplete(**self.deployment_request())
             self.logger.info("Deployment script generated successfully.")
             return generated_script
         except Exception as e:
             self.logger.error(f"OpenAI API call failed for generating deployment script: {e}")
             return "No deployment script generated."
 
-    def run_deployment(self):
+    def run_deployment(self, output_path=None):
         """
         Executes the deployment script generation process.
+        :param output_path: Optional file the script is streamed to as it is generated.
+        :return: The generated deployment script as a string.
+        """
+        self.logger.info("Running deployment script generation process...")
+        script = self.generate_deployment_script(output_path)
+        return script
+
+    async def arun_deployment(self):
+        """
+        Awaitable variant of run_deployment().
         :return: The generated deployment script as a string.
         """
         self.logger.info("Running deployment script generation process...")
-        script = self.generate_deployment_script()
+        script = await self.agenerate_deployment_script()
         return script
 
 # Example usage (for standalone testing)
@@ -1,30 +1,163 @@
+import os
+import asyncio
 import logging
-from openai import OpenAI  # OpenAI v1.x client
+from concurrent.futures import ThreadPoolExecutor
+from utils.llm_gateway import LLMGateway, DEFAULT_MODEL  # Shared LLM gateway
+from utils.helper_functions import atomic_write, write_stream
+from utils.symbol_index import SymbolIndex, clip_to_budget, full_size, group_by_package, pack_symbols, render_module
+from utils.doc_sections import OVERVIEW_KEY, DocManifest, existing_sections, splice_sections, text_digest
+from utils.test_selection import file_digest, is_test_file
 from utils.logger import setup_logger  # Centralized logger from utils
 
+CONTEXT_MODES = ("auto", "raw", "symbols", "map_reduce")
+DEFAULT_PROMPT_BUDGET = 2000  # tokens of code context per documentation prompt
+# In "auto" mode, projects whose full symbol listing exceeds this many prompt budgets are map-reduced.
+MAP_REDUCE_FACTOR = 4
+DOCUMENTATION_FAILED = "Documentation generation failed."
+MODULE_KEY_PREFIX = "module:"
+
 class DocumentationAgent:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None):
         """
         Initializes the DocumentationAgent with the given configuration.
         :param config: A configuration object/dictionary containing documentation settings.
+        :param gateway: Optional shared LLMGateway; a private one is created if omitted.
         """
         self.config = config
         self.logger = setup_logger(__name__)
         self.logger.info("DocumentationAgent initialized with configuration.")
-        # Initialize OpenAI Client
-        self.client = OpenAI(api_key=self.config.get("openai_api_key", ""))
+        # Shared LLM gateway (pooled OpenAI client)
+        self.llm = gateway or LLMGateway.from_config(self.config)
+        self.symbol_index = None
+
+    def context_settings(self):
+        """
+        Reads the code context options from the configuration.
+        :return: Tuple of (mode, token budget).
+        """
+        mode = self.config.get("doc_context_mode", "auto")
+        if mode not in CONTEXT_MODES:
+            self.logger.warning(f"Unknown documentation context mode '{mode}'; using 'auto'.")
+            mode = "auto"
+        return mode, max(1, int(self.config.get("doc_prompt_budget", DEFAULT_PROMPT_BUDGET)))
+
+    def index_symbols(self):
+        """
+        Brings the project's symbol index up to date (only changed files are re-parsed).
+        :return: Index entries keyed by relative path.
+        """
+        if self.symbol_index is None:
+            self.symbol_index = SymbolIndex(self.config.get("project_dir", "."),
+                                            self.config.get("state_dir", ".devautomator"))
+        return self.symbol_index.build()
+
+    def context_plan(self, project_summary):
+        """
+        Decides how the code is presented to the model.
+        :param project_summary: A string summary of the project, used to rank symbols.
+        :return: Tuple of (mode, payload): ("raw", None), ("symbols", packed text) or
+                 ("map_reduce", {package: packed text}).
+        """
+        mode, budget = self.context_settings()
+        if mode == "raw":
+            return "raw", None
+        entries = self.index_symbols()
+        if mode == "auto":
+            mode = "map_reduce" if full_size(entries) > budget * MAP_REDUCE_FACTOR else "symbols"
+        if mode == "symbols":
+            return mode, pack_symbols(entries, budget, project_summary)
+        groups = group_by_package(entries)
+        return mode, {package: pack_symbols(group, budget, project_summary) for package, group in sorted(groups.items())}
+
+    def package_summary_request(self, package, symbols):
+        """
+        Builds the map-step request summarizing one package from its symbols.
+        :param package: Package name.
+        :param symbols: Packed symbol listing of the package.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        prompt = (
+            f"Summarize the purpose and public API of the package '{package}' in a short paragraph, "
+            f"based on its modules and signatures:\n{symbols}"
+        )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert technical writer."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 150,
+            "tag": "DocumentationAgent.summarize_package",
+        }
+
+    def merge_package_summaries(self, summaries):
+        """
+        Reduce step: joins the package summaries into the code context of the final prompt,
+        clipped to the prompt budget.
+        """
+        _, budget = self.context_settings()
+        merged = "\n".join(f"- {package}: {summary}" for package, summary in summaries.items())
+        return clip_to_budget(merged, budget)
+
+    def summarize_package(self, package, symbols):
+        try:
+            return self.llm.complete(**self.package_summary_request(package, symbols))
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for package summary of {package}: {e}")
+            return "Summary unavailable."
+
+    async def asummarize_package(self, package, symbols):
+        try:
+            return await self.llm.acomplete(**self.package_summary_request(package, symbols))
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for package summary of {package}: {e}")
+            return "Summary unavailable."
+
+    def code_context(self, project_summary):
+        """
+        Builds the budgeted code context for the documentation prompt, summarizing each
+        package concurrently first in map-reduce mode.
+        :param project_summary: A string summary of the project.
+        :return: Context text, or None in raw mode.
+        """
+        mode, payload = self.context_plan(project_summary)
+        if mode != "map_reduce":
+            return payload
+        self.logger.info(f"Summarizing {len(payload)} package(s) before documentation generation...")
+        workers = max(1, min(len(payload), int(self.config.get("doc_map_concurrency", 4))))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            summaries = dict(zip(payload, pool.map(self.summarize_package, payload, payload.values())))
+        return self.merge_package_summaries(summaries)
+
+    async def acode_context(self, project_summary):
+        """
+        Awaitable variant of code_context(); the package summaries run concurrently on the event loop.
+        """
+        mode, payload = await asyncio.to_thread(self.context_plan, project_summary)
+        if mode != "map_reduce":
+            return payload
+        self.logger.info(f"Summarizing {len(payload)} package(s) before documentation generation...")
+        results = await asyncio.gather(*(self.asummarize_package(package, symbols) for package, symbols in payload.items()))
+        return self.merge_package_summaries(dict(zip(payload, results)))
 
-    def build_documentation_prompt(self, project_summary, code_structure):
+    def build_documentation_prompt(self, project_summary, code_structure, code_context=None):
         """
         Constructs the prompt for generating comprehensive project documentation.
         :param project_summary: A string summary of the project.
         :param code_structure: A string representing the structure of the project code.
+        :param code_context: Optional budgeted symbol listing or package summaries from code_context();
+                             when given, the structure is clipped to the prompt budget as well.
         :return: A formatted prompt string.
         """
+        if code_context is not None:
+            _, budget = self.context_settings()
+            code_structure = clip_to_budget(code_structure, budget // 2)
         prompt = (
             f"Generate comprehensive documentation for a software project with the following details:\n"
             f"Project Summary: {project_summary}\n"
-            f"Code Structure: {code_structure}\n\n"
+            f"Code Structure: {code_structure}\n"
+            + (f"Key Modules and APIs:\n{code_context}\n" if code_context else "")
+            + "\n"
             "The documentation should include:\n"
             "- An overview\n"
             "- Installation instructions\n"
@@ -34,6 +167,25 @@ class DocumentationAgent:
         )
         return prompt
 
+    def documentation_request(self, project_summary, code_structure, code_context=None):
+        """
+        Builds the chat completion request used for documentation generation.
+        :param project_summary: A string summary of the project.
+        :param code_structure: A string representing the structure of the project code.
+        :param code_context: Optional budgeted code context from code_context().
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        prompt = self.build_documentation_prompt(project_summary, code_structure, code_context)
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert technical writer."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 300,  # Adjust as needed for more detailed documentation
+            "tag": "DocumentationAgent.generate_documentation",
+        }
+
     def generate_documentation(self, project_summary, code_structure):
         """
         Uses the OpenAI API to generate comprehensive project documentation.
@@ -43,26 +195,48 @@ class DocumentationAgent:
         """
         try:
             self.logger.info("Querying OpenAI API for documentation generation...")
-            prompt = self.build_documentation_prompt(project_summary, code_structure)
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert technical writer."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300  # Adjust as needed for more detailed documentation
-            )
-            documentation = response.choices[0].message.content.strip()
+            context = self.code_context(project_summary)
+            documentation = self.llm.complete(**self.documentation_request(project_summary, code_structure, context))
             self.logger.info("Received documentation from OpenAI API.")
             return documentation
         except Exception as e:
             self.logger.error(f"OpenAI API call failed for documentation generation: {e}")
-            return "Documentation generation failed."
+            return DOCUMENTATION_FAILED
+
+    async def agenerate_documentation(self, project_summary, code_structure):
+        """
+        Awaitable variant of generate_documentation().
+        :param project_summary: A string summary of the project.
+        :param code_structure: A string representing the structure of the project code.
+        :return: Generated documentation text as a string.
+        """
+        try:
+            self.logger.info("Querying OpenAI API for documentation generation...")
+            context = await self.acode_context(project_summary)
+            documentation = await self.llm.acomplete(**self.documentation_request(project_summary, code_structure,
+                                                                                   context))
+            self.logger.info("Received documentation from OpenAI API.")
+            return documentation
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for documentation generation: {e}")
+            return DOCUMENTATION_FAILED
+
+    def stream_documentation(self, project_summary, code_structure):
+        """
+        Streams generated documentation from the OpenAI API as it arrives.
+        :param project_summary: A string summary of the project.
+        :param code_structure: A string representing the structure of the project code.
+        :return: Generator of text chunks.
+        """
+        self.logger.info("Streaming documentation from OpenAI API...")
+        context = self.code_context(project_summary)
+        return self.llm.stream(**self.documentation_request(project_summary, code_structure, context))
 
     def update_documentation_file(self, documentation, filepath="README.md", append=False):
         """
         Writes the generated documentation to a file.
-        :param documentation: The documentation text to write.
+        :param documentation: The documentation text to write, or an iterable of text chunks
+                              that are written to the file as they arrive.
         :param filepath: Path to the documentation file.
         :param append: If True, append to the existing file instead of overwriting.
         :return: Boolean indicating whether the file update was successful.
@@ -71,6 +245,10 @@ class DocumentationAgent:
             mode = "a" if append else "w"
             action = "Appending to" if append else "Overwriting"
             self.logger.info(f"{action} documentation file at {filepath}...")
+            if not isinstance(documentation, str):
+                write_stream(documentation, filepath, append, separator="\n\n" if append else "")
+                self.logger.info("Documentation file updated successfully.")
+                return True
             with open(filepath, mode) as f:
                 if append:
                     f.write("\n\n" + documentation)
@@ -82,18 +260,226 @@ class DocumentationAgent:
             self.logger.error(f"Failed to update documentation file: {e}")
             return False
 
-    def generate_and_update_documentation(self, project_summary, code_structure, filepath="README.md", append=False):
+    def module_section_request(self, relpath, entry):
+        """
+        Builds the request documenting a single module from its symbols.
+        :param relpath: Module path relative to the project root.
+        :param entry: The module's symbol index entry.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        _, budget = self.context_settings()
+        prompt = (
+            f"Write a concise Markdown reference for the Python module '{entry['module']}' ({relpath}): "
+            "its purpose and how to use its public classes and functions. Do not add a top-level heading.\n"
+            f"{clip_to_budget(render_module(relpath, entry), budget)}"
+        )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert technical writer."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 250,
+            "tag": "DocumentationAgent.document_module",
+        }
+
+    def document_module(self, relpath, entry):
+        """
+        Generates the documentation section of one module.
+        :return: The section body, or None if the API call failed.
+        """
+        try:
+            text = self.llm.complete(**self.module_section_request(relpath, entry))
+            return f"### `{relpath}`\n\n{text}"
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for documentation of {relpath}: {e}")
+            return None
+
+    async def adocument_module(self, relpath, entry):
+        """
+        Awaitable variant of document_module().
+        """
+        try:
+            text = await self.llm.acomplete(**self.module_section_request(relpath, entry))
+            return f"### `{relpath}`\n\n{text}"
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for documentation of {relpath}: {e}")
+            return None
+
+    def section_targets(self, project_summary, code_structure):
+        """
+        Lists the sections the document should contain and the hash of the source each one
+        is generated from: the overview hashes the summary and structure, module sections
+        hash the module's source file. Test modules and conftest.py get no section.
+        :return: Tuple of (dict mapping section key to source hash, symbol index entries).
+        """
+        entries = self.index_symbols()
+        targets = {OVERVIEW_KEY: text_digest(f"{project_summary}\0{code_structure}")}
+        for relpath in sorted(entries):
+            if not is_test_file(relpath) and os.path.basename(relpath) != "conftest.py":
+                targets[MODULE_KEY_PREFIX + relpath] = file_digest(os.path.join(self.symbol_index.root, relpath))
+        return targets, entries
+
+    def stale_sections(self, filepath, targets):
+        """
+        Compares the section targets with the manifest and the current document.
+        :return: Tuple of (current document text, manifest hashes, keys of the sections to regenerate).
+        """
+        try:
+            with open(filepath) as f:
+                text = f.read()
+        except FileNotFoundError:
+            text = ""
+        hashes = self.doc_manifest().load(filepath)
+        present = existing_sections(text)
+        stale = [key for key, digest in targets.items() if hashes.get(key) != digest or key not in present]
+        return text, hashes, stale
+
+    def doc_manifest(self):
+        state_dir = self.config.get("state_dir", ".devautomator")
+        if not os.path.isabs(state_dir):
+            state_dir = os.path.join(self.config.get("project_dir", "."), state_dir)
+        return DocManifest(state_dir)
+
+    def write_sections(self, filepath, text, targets, hashes, generated):
+        """
+        Splices the regenerated sections into the document with one atomic rewrite and records
+        their source hashes. Sections that failed to generate keep their old text and hash, so
+        they are retried on the next run; the file is not rewritten if nothing changed.
+        :return: The new document text, or DOCUMENTATION_FAILED if any section failed.
+        """
+        sections = {key: body for key, body in generated.items() if body is not None}
+        document = splice_sections(text, sections, list(targets))
+        manifest = {key: targets[key] if key in sections else hashes[key]
+                    for key in targets if key in sections or key in hashes}
+        if document != text:
+            atomic_write(filepath, document)
+        if manifest != hashes:
+            self.doc_manifest().save(filepath, manifest)
+        failed = len(generated) - len(sections)
+        if failed:
+            self.logger.error(f"Regenerated {len(sections)} documentation section(s) in {filepath}; "
+                              f"{failed} failed and keep their previous text.")
+            return DOCUMENTATION_FAILED
+        self.logger.info(f"Regenerated {len(sections)} documentation section(s) in {filepath}.")
+        return document
+
+    def update_documentation_sections(self, project_summary, code_structure, filepath="README.md"):
+        """
+        Regenerates only the documentation sections whose source changed since the last run
+        and splices them into the file in place.
+        :param project_summary: A string summary of the project.
+        :param code_structure: A string representing the structure of the project code.
+        :param filepath: Path to the documentation file.
+        :return: The updated document text, or DOCUMENTATION_FAILED if a section could not be
+                 regenerated (the others are still written).
+        """
+        targets, entries = self.section_targets(project_summary, code_structure)
+        text, hashes, stale = self.stale_sections(filepath, targets)
+        self.logger.info(f"{len(stale)} of {len(targets)} documentation section(s) are out of date.")
+        if not stale and set(hashes) == set(targets):
+            return text
+
+        def generate(key):
+            if key == OVERVIEW_KEY:
+                documentation = self.generate_documentation(project_summary, code_structure)
+                return None if documentation == DOCUMENTATION_FAILED else documentation
+            relpath = key[len(MODULE_KEY_PREFIX):]
+            return self.document_module(relpath, entries[relpath])
+
+        generated = {}
+        if stale:
+            workers = max(1, min(len(stale), int(self.config.get("doc_map_concurrency", 4))))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                generated = dict(zip(stale, pool.map(generate, stale)))
+        return self.write_sections(filepath, text, targets, hashes, generated)
+
+    async def aupdate_documentation_sections(self, project_summary, code_structure, filepath="README.md"):
+        """
+        Awaitable variant of update_documentation_sections(); stale sections are generated concurrently.
+        """
+        targets, entries = await asyncio.to_thread(self.section_targets, project_summary, code_structure)
+        text, hashes, stale = self.stale_sections(filepath, targets)
+        self.logger.info(f"{len(stale)} of {len(targets)} documentation section(s) are out of date.")
+        if not stale and set(hashes) == set(targets):
+            return text
+
+        async def generate(key):
+            if key == OVERVIEW_KEY:
+                documentation = await self.agenerate_documentation(project_summary, code_structure)
+                return None if documentation == DOCUMENTATION_FAILED else documentation
+            relpath = key[len(MODULE_KEY_PREFIX):]
+            return await self.adocument_module(relpath, entries[relpath])
+
+        generated = dict(zip(stale, await asyncio.gather(*(generate(key) for key in stale))))
+        return self.write_sections(filepath, text, targets, hashes, generated)
+
+    def generate_and_update_documentation(self, project_summary, code_structure, filepath="README.md", append=False,
+                                          stream=False, incremental=None):
         """
         Orchestrates the generation of documentation and updates the documentation file.
         :param project_summary: A string summary of the project.
         :param code_structure: A string representing the structure of the project code.
         :param filepath: Path to the documentation file.
         :param append: If True, append to the existing file instead of overwriting.
+        :param stream: If True, chunks are written to the file as they arrive from the API.
+        :param incremental: If True, only the sections whose source changed are regenerated and
+                            spliced into the file (`append` and `stream` are ignored). Defaults to
+                            the "doc_incremental" setting.
+        :return: The generated documentation text.
+        """
+        if incremental is None:
+            incremental = self.config.get("doc_incremental", True)
+        if incremental:
+            self.logger.info("Starting incremental documentation update...")
+            try:
+                return self.update_documentation_sections(project_summary, code_structure, filepath)
+            except Exception as e:
+                self.logger.error(f"Incremental documentation update failed: {e}")
+                return DOCUMENTATION_FAILED
+        self.logger.info("Starting full documentation generation and update process...")
+        if stream:
+            parts = []
+
+            def collect(chunks):
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+
+            update_success = self.update_documentation_file(
+                collect(self.stream_documentation(project_summary, code_structure)), filepath, append
+            )
+            documentation = "".join(parts).strip() if parts else DOCUMENTATION_FAILED
+        else:
+            documentation = self.generate_documentation(project_summary, code_structure)
+            # The failure notice never replaces the existing document
+            update_success = documentation != DOCUMENTATION_FAILED and self.update_documentation_file(
+                documentation, filepath, append)
+        if update_success:
+            self.logger.info("Documentation process completed successfully.")
+        else:
+            self.logger.error("Documentation process encountered errors during file update.")
+        return documentation
+
+    async def agenerate_and_update_documentation(self, project_summary, code_structure, filepath="README.md", append=False,
+                                                 incremental=None):
+        """
+        Awaitable variant of generate_and_update_documentation().
         :return: The generated documentation text.
         """
+        if incremental is None:
+            incremental = self.config.get("doc_incremental", True)
+        if incremental:
+            self.logger.info("Starting incremental documentation update...")
+            try:
+                return await self.aupdate_documentation_sections(project_summary, code_structure, filepath)
+            except Exception as e:
+                self.logger.error(f"Incremental documentation update failed: {e}")
+                return DOCUMENTATION_FAILED
         self.logger.info("Starting full documentation generation and update process...")
-        documentation = self.generate_documentation(project_summary, code_structure)
-        update_success = self.update_documentation_file(documentation, filepath, append)
+        documentation = await self.agenerate_documentation(project_summary, code_structure)
+        update_success = documentation != DOCUMENTATION_FAILED and self.update_documentation_file(
+            documentation, filepath, append)
         if update_success:
             self.logger.info("Documentation process completed successfully.")
         else:
@@ -134,6 +520,6 @@ DevAutomator/
     └── helper_functions.py
     """
     
-    # Generate and update documentation in one step
-    documentation = doc_agent.generate_and_update_documentation(project_summary, code_structure, filepath="README.md", append=True)
+    # Regenerate the out-of-date sections of the documentation and splice them into the file
+    documentation = doc_agent.generate_and_update_documentation(project_summary, code_structure, filepath="README.md")
     print("Generated Documentation:\n", documentation)
@@ -1,20 +1,44 @@
 import logging
-from openai import OpenAI  # OpenAI v1.x client
-from utils.logger import setup_logger  # Centralized logger from utils
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from utils.llm_gateway import LLMGateway, DEFAULT_MODEL  # Shared LLM gateway
+from utils.logger import setup_logger, truncated  # Centralized logger from utils
 import json
 
+PLANNING_MODES = ("sequential", "concurrent", "batched")
+DEFAULT_PLANNING_CONCURRENCY = 8
+DEFAULT_PLANNING_BATCH_SIZE = 10
+
+
+def placeholder_description(requirement):
+    """
+    Returns the description a task gets when its requirement could not be refined.
+    """
+    return f"Process for '{requirement}' needs to be defined."
+
+
+def is_placeholder_plan(plan):
+    """
+    Returns True if every task of a non-empty plan carries the placeholder description, i.e.
+    no requirement was refined (typically because every API call failed).
+    """
+    return bool(plan) and all(task.get("details") == placeholder_description(task.get("requirement"))
+                              for task in plan)
+
+
 class PlanningAgent:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None):
         """
         Initializes the Planning Agent with the given configuration.
         :param config: A configuration object/dictionary containing planning notes and settings.
+        :param gateway: Optional shared LLMGateway; a private one is created if omitted.
         """
         self.config = config
         self.logger = setup_logger(__name__)
         self.logger.info("PlanningAgent initialized with configuration.")
 
-        # Initialize OpenAI Client
-        self.client = OpenAI(api_key=self.config.get("openai_api_key", ""))
+        # Shared LLM gateway (pooled OpenAI client)
+        self.llm = gateway or LLMGateway.from_config(self.config)
 
     def gather_requirements(self):
         """
@@ -23,9 +47,25 @@ class PlanningAgent:
         """
         self.logger.info("Gathering requirements...")
         requirements = self.config.get('task_notes', ["Default Requirement: Setup project structure"])
-        self.logger.info(f"Requirements gathered: {requirements}")
+        self.logger.info("Requirements gathered: %s", truncated(requirements))
         return requirements
 
+    def task_description_request(self, requirement):
+        """
+        Builds the chat completion request used to refine a single requirement.
+        :param requirement: A requirement string.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert project manager."},
+                {"role": "user", "content": f"Break down the following requirement into actionable development tasks, including estimated effort: {requirement}"}
+            ],
+            "max_tokens": 200,
+            "tag": "PlanningAgent.get_task_description",
+        }
+
     def get_task_description(self, requirement):
         """
         Uses the OpenAI API to generate a detailed breakdown for a given requirement.
@@ -34,39 +74,204 @@ class PlanningAgent:
         """
         try:
             self.logger.info("Querying OpenAI API for task refinement...")
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert project manager."},
-                    {"role": "user", "content": f"Break down the following requirement into actionable development tasks, including estimated effort: {requirement}"}
-                ],
-                max_tokens=200
-            )
-            task_details = response.choices[0].message.content.strip()
+            task_details = self.llm.complete(**self.task_description_request(requirement))
             self.logger.info("Received detailed task description from OpenAI API.")
             return task_details
         except Exception as e:
             self.logger.error(f"OpenAI API call failed: {e}")
-            return f"Process for '{requirement}' needs to be defined."
+            return placeholder_description(requirement)
+
+    async def aget_task_description(self, requirement):
+        """
+        Awaitable variant of get_task_description().
+        :param requirement: A requirement string.
+        :return: A detailed task description generated by the API.
+        """
+        try:
+            self.logger.info("Querying OpenAI API for task refinement...")
+            task_details = await self.llm.acomplete(**self.task_description_request(requirement))
+            self.logger.info("Received detailed task description from OpenAI API.")
+            return task_details
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed: {e}")
+            return placeholder_description(requirement)
+
+    def build_task(self, req, task_description):
+        """
+        Builds a structured task from a requirement and its refined description.
+        :param req: A requirement string.
+        :param task_description: The detailed task description.
+        :return: A structured task dictionary.
+        """
+        task = {
+            "requirement": req,
+            "details": task_description,
+            "priority": "High" if "core" in req.lower() else "Medium",
+            "estimated_time": "2-5 hours" if "unit tests" in req.lower() else "1-2 days"
+        }
+        self.logger.debug("Task created: %s", task)
+        return task
+
+    def batch_request(self, requirements):
+        """
+        Builds a single chat completion request that refines several requirements at once.
+        :param requirements: List of requirement strings.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        numbered = "\n".join(f"{i}. {req}" for i, req in enumerate(requirements))
+        prompt = (
+            "Break down each of the following requirements into actionable development tasks, "
+            "including estimated effort.\n"
+            f"{numbered}\n\n"
+            'Respond with a JSON object of the form {"tasks": [{"index": <requirement number>, '
+            '"details": "<task breakdown>"}]} containing exactly one entry per requirement.'
+        )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert project manager."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 200 * len(requirements),
+            "response_format": {"type": "json_object"},
+            "tag": "PlanningAgent.get_batch_descriptions",
+        }
+
+    def parse_batch_response(self, text, count):
+        """
+        Splits a batched JSON response back into per-requirement descriptions.
+        :param text: The raw response text.
+        :param count: Number of requirements in the batch.
+        :return: A list of length `count` holding each description, or None where it is missing.
+        """
+        descriptions = [None] * count
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.find("\n") + 1:] if "\n" in text else text
+        try:
+            entries = json.loads(text)
+        except json.JSONDecodeError:
+            self.logger.warning("Batched task response is not valid JSON.")
+            return descriptions
+        if isinstance(entries, dict):
+            entries = entries.get("tasks", [])
+        if not isinstance(entries, list):
+            return descriptions
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index, details = entry.get("index"), entry.get("details")
+            if isinstance(index, int) and 0 <= index < count and details:
+                descriptions[index] = details if isinstance(details, str) else json.dumps(details)
+        return descriptions
+
+    def get_batch_descriptions(self, requirements):
+        """
+        Refines a batch of requirements with one request; requirements whose entry is missing
+        or unparsable fall back to an individual request.
+        :param requirements: List of requirement strings.
+        :return: A list of task descriptions, in requirement order.
+        """
+        try:
+            self.logger.info(f"Querying OpenAI API for batched refinement of {len(requirements)} requirements...")
+            descriptions = self.parse_batch_response(self.llm.complete(**self.batch_request(requirements)), len(requirements))
+        except Exception as e:
+            self.logger.error(f"Batched OpenAI API call failed: {e}")
+            descriptions = [None] * len(requirements)
+        missing = [i for i, desc in enumerate(descriptions) if desc is None]
+        if missing:
+            self.logger.warning(f"Falling back to single requests for {len(missing)} requirement(s).")
+        for i in missing:
+            descriptions[i] = self.get_task_description(requirements[i])
+        return descriptions
+
+    async def aget_batch_descriptions(self, requirements, semaphore):
+        """
+        Awaitable variant of get_batch_descriptions().
+        :param requirements: List of requirement strings.
+        :param semaphore: asyncio.Semaphore bounding the number of requests in flight.
+        :return: A list of task descriptions, in requirement order.
+        """
+        try:
+            self.logger.info(f"Querying OpenAI API for batched refinement of {len(requirements)} requirements...")
+            async with semaphore:
+                text = await self.llm.acomplete(**self.batch_request(requirements))
+            descriptions = self.parse_batch_response(text, len(requirements))
+        except Exception as e:
+            self.logger.error(f"Batched OpenAI API call failed: {e}")
+            descriptions = [None] * len(requirements)
+        missing = [i for i, desc in enumerate(descriptions) if desc is None]
+        if missing:
+            self.logger.warning(f"Falling back to single requests for {len(missing)} requirement(s).")
+        fallbacks = await asyncio.gather(*(self._bounded(semaphore, self.aget_task_description(requirements[i])) for i in missing))
+        for i, desc in zip(missing, fallbacks):
+            descriptions[i] = desc
+        return descriptions
+
+    @staticmethod
+    async def _bounded(semaphore, coro):
+        async with semaphore:
+            return await coro
+
+    def planning_settings(self):
+        """
+        Reads the decomposition mode, concurrency and batch size from the configuration.
+        :return: Tuple of (mode, concurrency, batch_size).
+        """
+        mode = self.config.get("planning_mode", "concurrent")
+        if mode not in PLANNING_MODES:
+            self.logger.warning(f"Unknown planning mode '{mode}', using 'concurrent'.")
+            mode = "concurrent"
+        concurrency = max(1, self.config.get("planning_concurrency", DEFAULT_PLANNING_CONCURRENCY))
+        batch_size = max(1, self.config.get("planning_batch_size", DEFAULT_PLANNING_BATCH_SIZE))
+        return mode, concurrency, batch_size
 
     def decompose_tasks(self, requirements):
         """
         Decomposes the requirements into structured tasks.
+        The "planning_mode" setting selects one request per requirement issued one after another
+        ("sequential"), or with bounded concurrency ("concurrent"), or K requirements per request
+        ("batched"). Tasks are always returned in requirement order.
         :param requirements: List of requirement strings.
         :return: A list of structured tasks.
         """
         self.logger.info("Decomposing requirements into structured tasks...")
-        tasks = []
-        for req in requirements:
-            task_description = self.get_task_description(req)
-            task = {
-                "requirement": req,
-                "details": task_description,
-                "priority": "High" if "core" in req.lower() else "Medium",
-                "estimated_time": "2-5 hours" if "unit tests" in req.lower() else "1-2 days"
-            }
-            tasks.append(task)
-            self.logger.debug(f"Task created: {task}")
+        mode, concurrency, batch_size = self.planning_settings()
+        if mode == "sequential":
+            descriptions = [self.get_task_description(req) for req in requirements]
+        elif mode == "concurrent":
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                descriptions = list(executor.map(self.get_task_description, requirements))
+        else:
+            batches = [requirements[i:i + batch_size] for i in range(0, len(requirements), batch_size)]
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                descriptions = [desc for batch in executor.map(self.get_batch_descriptions, batches) for desc in batch]
+        tasks = [self.build_task(req, desc) for req, desc in zip(requirements, descriptions)]
+        self.logger.info("Task decomposition completed.")
+        return tasks
+
+    async def adecompose_tasks(self, requirements):
+        """
+        Awaitable variant of decompose_tasks(), honoring the same "planning_mode" setting.
+        :param requirements: List of requirement strings.
+        :return: A list of structured tasks, in requirement order.
+        """
+        self.logger.info("Decomposing requirements into structured tasks...")
+        mode, concurrency, batch_size = self.planning_settings()
+        if mode == "sequential":
+            descriptions = [await self.aget_task_description(req) for req in requirements]
+        elif mode == "concurrent":
+            semaphore = asyncio.Semaphore(concurrency)
+            descriptions = await asyncio.gather(
+                *(self._bounded(semaphore, self.aget_task_description(req)) for req in requirements)
+            )
+        else:
+            semaphore = asyncio.Semaphore(concurrency)
+            batches = [requirements[i:i + batch_size] for i in range(0, len(requirements), batch_size)]
+            results = await asyncio.gather(*(self.aget_batch_descriptions(batch, semaphore) for batch in batches))
+            descriptions = [desc for batch in results for desc in batch]
+        tasks = [self.build_task(req, desc) for req, desc in zip(requirements, descriptions)]
         self.logger.info("Task decomposition completed.")
         return tasks
 
@@ -81,13 +286,23 @@ class PlanningAgent:
         self.logger.info("Plan formulation completed.")
         return tasks
 
-    def generate_plan_script(self, plan):
+    async def aformulate_plan(self):
         """
-        Uses the OpenAI API to generate a complete Python script that prints the project plan.
+        Awaitable variant of formulate_plan().
+        :return: A structured plan (list of tasks).
+        """
+        self.logger.info("Formulating the overall plan...")
+        requirements = self.gather_requirements()
+        tasks = await self.adecompose_tasks(requirements)
+        self.logger.info("Plan formulation completed.")
+        return tasks
+
+    def plan_script_request(self, plan):
+        """
+        Builds the chat completion request used to generate the plan script.
         :param plan: A structured plan (list of tasks).
-        :return: The generated Python script as a string.
+        :return: Keyword arguments for LLMGateway.complete().
         """
-        self.logger.info("Generating plan script using OpenAI API...")
         # Convert the plan to a formatted JSON string for clarity in the prompt
         plan_json = json.dumps(plan, indent=2)
         prompt = (
@@ -95,16 +310,40 @@ class PlanningAgent:
             f"{plan_json}\n\n"
             "The script should be well-commented and use pretty-print formatting for the output."
         )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are a skilled Python developer."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 300,
+            "tag": "PlanningAgent.generate_plan_script",
+        }
+
+    def generate_plan_script(self, plan):
+        """
+        Uses the OpenAI API to generate a complete Python script that prints the project plan.
+        :param plan: A structured plan (list of tasks).
+        :return: The generated Python script as a string.
+        """
+        self.logger.info("Generating plan script using OpenAI API...")
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a skilled Python developer."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300
-            )
-            plan_script = response.choices[0].message.content.strip()
+            plan_script = self.llm.complete(**self.plan_script_request(plan))
+            self.logger.info("Plan script generated successfully.")
+            return plan_script
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for plan script generation: {e}")
+            return "No plan script generated."
+
+    async def agenerate_plan_script(self, plan):
+        """
+        Awaitable variant of generate_plan_script().
+        :param plan: A structured plan (list of tasks).
+        :return: The generated Python script as a string.
+        """
+        self.logger.info("Generating plan script using OpenAI API...")
+        try:
+            plan_script = await self.llm.acomplete(**self.plan_script_request(plan))
             self.logger.info("Plan script generated successfully.")
             return plan_script
         except Exception as e:
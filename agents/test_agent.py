@@ -1,52 +1,256 @@
+import os
+import time
 import logging
-import subprocess
-from openai import OpenAI  # OpenAI v1.x client
-from utils.logger import setup_logger  # Centralized logger from utils
+import asyncio
+from utils.llm_gateway import LLMGateway, DEFAULT_MODEL  # Shared LLM gateway
+from utils.helper_functions import write_stream, stream_command, astream_command
+from utils.test_selection import TestSelector
+from utils.test_sharding import ShardedTestRunner
+from utils.test_result_cache import TestResultCache
+from utils.script_validator import ScriptValidator, strip_artifact, DEFAULT_DRY_RUN_TIMEOUT
+from utils.logger import setup_logger, truncated  # Centralized logger from utils
+
+def select_test_targets(config, full=False, logger=None):
+    """
+    Decides which tests to run. Module-level so it can be submitted to a process pool.
+    :param config: The test agent configuration dictionary.
+    :param full: If True, always run the entire test suite.
+    :param logger: Optional logger; the module logger is used if omitted.
+    :return: Tuple of (selector, targets); targets is None when no test needs to run and
+             an empty list when the whole suite must run.
+    """
+    logger = logger or setup_logger(__name__)
+    if full or not config.get("test_selection", True):
+        return None, []
+    selector = TestSelector(
+        config.get("project_dir", "."),
+        state_dir=config.get("state_dir", ".devautomator"),
+        logger=logger,
+    )
+    selected = selector.select()
+    if selected is not None and not selected:
+        logger.info("No test modules are affected by the changes; skipping pytest.")
+        return selector, None
+    return selector, selected or []
 
 class TestAgent:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None, executor=None):
         """
         Initializes the Test Agent with the given configuration.
         :param config: A configuration object/dictionary containing test settings.
+        :param gateway: Optional shared LLMGateway; a private one is created if omitted.
+        :param executor: Optional process pool the test selection (import graph parsing) runs in.
         """
         self.config = config
         self.logger = setup_logger(__name__)
         self.logger.info("TestAgent initialized with configuration.")
 
-        # Initialize OpenAI Client
-        self.client = OpenAI(api_key=self.config.get("openai_api_key", ""))
+        # Shared LLM gateway (pooled OpenAI client)
+        self.llm = gateway or LLMGateway.from_config(self.config)
+        self.executor = executor
+
+    def pytest_command(self, targets=()):
+        """
+        Builds the pytest command line.
+        :param targets: Optional test files to restrict the run to.
+        :return: The command as a list of arguments.
+        """
+        return ["pytest", "--maxfail=1", "--disable-warnings", "-q", *targets]
+
+    def test_selector(self):
+        """
+        Returns the change-aware test selector for the project directory.
+        """
+        return TestSelector(
+            self.config.get("project_dir", "."),
+            state_dir=self.config.get("state_dir", ".devautomator"),
+            logger=self.logger,
+        )
+
+    def sharded_runner(self, workers):
+        """
+        Returns a runner that spreads the suite over `workers` pytest processes using the
+        durations stored by previous runs.
+        """
+        return ShardedTestRunner(
+            self.pytest_command(),
+            cwd=self.config.get("project_dir", "."),
+            workers=workers,
+            state_dir=self.config.get("state_dir", ".devautomator"),
+            fail_fast=self.config.get("test_fail_fast", True),
+            logger=self.logger,
+            timeout=self.config.get("test_timeout"),
+            idle_timeout=self.config.get("test_idle_timeout"),
+        )
+
+    def test_result_cache(self):
+        """
+        Returns the cache of passing test runs, or None when the "test_result_cache" setting is False.
+        """
+        if not self.config.get("test_result_cache", True):
+            return None
+        return TestResultCache(
+            self.config.get("project_dir", "."),
+            state_dir=self.config.get("state_dir", ".devautomator"),
+        )
+
+    def cached_test_result(self, full=False):
+        """
+        Looks up a passing full-suite run of the current sources, tests, interpreter and pytest command.
+        :param full: If True, a full run was requested: the key is computed so a passing run can
+                     be stored, but no stored run is returned.
+        :return: Tuple of (cache key or None, stored run or None).
+        """
+        cache = self.test_result_cache()
+        if cache is None:
+            return None, None
+        try:
+            key = cache.key(self.pytest_command())
+            return key, None if full else cache.get(key)
+        except OSError as e:
+            self.logger.warning(f"Test result cache unavailable: {e}")
+            return None, None
+
+    def store_test_result(self, cache_key, passed, output, duration=None):
+        if cache_key is None:
+            return
+        try:
+            self.test_result_cache().put(cache_key, passed, output, duration)
+        except OSError as e:
+            self.logger.warning(f"Failed to store the test result: {e}")
+
+    def reuse_test_result(self, cached):
+        """
+        Reports a run answered from the test result cache.
+        :return: The stored passed flag.
+        """
+        self.logger.info(
+            "Sources, tests and pytest settings are unchanged since a passing run "
+            f"({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cached['created']))}); skipping pytest."
+        )
+        self.logger.debug("Stored test output:\n%s", cached["output"])
+        return cached["passed"]
 
-    def run_unit_tests(self):
+    def select_targets(self, full=False):
+        """
+        Decides which tests to run, in the process pool if the agent was given one.
+        :param full: If True, always run the entire test suite.
+        :return: Tuple of (selector, targets); targets is None when no test needs to run and
+                 an empty list when the whole suite must run.
+        """
+        if self.executor is not None:
+            return self.executor.submit(select_test_targets, self.config, full).result()
+        return select_test_targets(self.config, full, self.logger)
+
+    def finish_unit_tests(self, passed, selector, output="", started=None, cache_key=None):
+        """
+        Logs the outcome of a unit test run and, on success, records a green baseline and
+        stores the run in the test result cache.
+        :return: The passed flag.
+        """
+        if passed:
+            self.logger.info("Unit tests passed successfully.")
+            (selector or self.test_selector()).record_green()
+            duration = round(time.monotonic() - started, 3) if started is not None else None
+            self.store_test_result(cache_key, True, output, duration)
+            return True
+        self.logger.error("Unit tests failed.")
+        return False
+
+    def run_pytest(self, targets):
+        """
+        Runs pytest in a single process, streaming its output to the logger.
+        :return: Tuple of (passed, output).
+        """
+        result = stream_command(
+            self.pytest_command(targets),
+            self.logger,
+            cwd=self.config.get("project_dir", "."),
+            timeout=self.config.get("test_timeout"),
+            idle_timeout=self.config.get("test_idle_timeout"),
+            prefix="[pytest] ",
+        )
+        return result.returncode == 0, result.output
+
+    def run_unit_tests(self, full=False, cache_key=None):
         """
         Executes unit tests for the project.
+        Unless a full run is requested (or the "test_selection" setting is disabled), only the
+        test modules affected by files changed since the last green run are executed. With
+        "test_workers" above 1 the tests are split into duration-balanced shards run in parallel.
+        :param full: If True, always run the entire test suite.
+        :param cache_key: Optional test result cache key a passing run of the whole suite is
+                          stored under; runs of a selected subset are never stored.
         :return: Boolean indicating whether the tests passed.
         """
         self.logger.info("Running unit tests...")
+        started = time.monotonic()
         try:
-            # Running pytest with safer subprocess handling
-            result = subprocess.run(
-                ["pytest", "--maxfail=1", "--disable-warnings", "-q"],
-                capture_output=True,
-                text=True,
-                check=False  # Allow failures without crashing
-            )
-            self.logger.info("Unit test output:\n" + result.stdout.strip())
-            if result.stderr:
-                self.logger.warning("Unit test errors:\n" + result.stderr.strip())
-
-            if result.returncode == 0:
-                self.logger.info("Unit tests passed successfully.")
+            selector, targets = self.select_targets(full)
+            if targets is None:
                 return True
+            if targets:
+                cache_key = None
+            workers = self.config.get("test_workers", 1)
+            if workers > 1:
+                passed, output, _ = self.sharded_runner(workers).run(targets)
             else:
-                self.logger.error("Unit tests failed.")
-                return False
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Unit test execution failed: {e}")
+                passed, output = self.run_pytest(targets)
+            return self.finish_unit_tests(passed, selector, output, started, cache_key)
+        except Exception as e:
+            self.logger.error(f"Unexpected error while running tests: {e}")
             return False
+
+    async def arun_unit_tests(self, full=False, cache_key=None):
+        """
+        Awaitable variant of run_unit_tests(); pytest runs as an asyncio subprocess.
+        :param full: If True, always run the entire test suite.
+        :param cache_key: Optional test result cache key a passing run of the whole suite is
+                          stored under; runs of a selected subset are never stored.
+        :return: Boolean indicating whether the tests passed.
+        """
+        self.logger.info("Running unit tests...")
+        started = time.monotonic()
+        try:
+            selector, targets = await asyncio.to_thread(self.select_targets, full)
+            if targets is None:
+                return True
+            if targets:
+                cache_key = None
+            workers = self.config.get("test_workers", 1)
+            if workers > 1:
+                passed, output, _ = await self.sharded_runner(workers).arun(targets)
+            else:
+                result = await astream_command(
+                    self.pytest_command(targets),
+                    self.logger,
+                    cwd=self.config.get("project_dir", "."),
+                    timeout=self.config.get("test_timeout"),
+                    idle_timeout=self.config.get("test_idle_timeout"),
+                    prefix="[pytest] ",
+                )
+                passed, output = result.returncode == 0, result.output
+            return await asyncio.to_thread(self.finish_unit_tests, passed, selector, output, started, cache_key)
         except Exception as e:
             self.logger.error(f"Unexpected error while running tests: {e}")
             return False
 
+    def test_suggestions_request(self, project_details):
+        """
+        Builds the chat completion request used for test suggestions.
+        :param project_details: A description of the project or tests.
+        :return: Keyword arguments for LLMGateway.complete().
+        """
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert software testing engineer."},
+                {"role": "user", "content": f"Based on the following project details, provide test suggestions to ensure thorough coverage: {project_details}"}
+            ],
+            "max_tokens": 150,
+            "tag": "TestAgent.get_test_suggestions",
+        }
+
     def get_test_suggestions(self, project_details):
         """
         Uses the OpenAI API to generate test suggestions or validate test coverage.
@@ -55,61 +259,149 @@ class TestAgent:
         """
         try:
             self.logger.info("Querying OpenAI API for test suggestions...")
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert software testing engineer."},
-                    {"role": "user", "content": f"Based on the following project details, provide test suggestions to ensure thorough coverage: {project_details}"}
-                ],
-                max_tokens=150
-            )
-            suggestions = response.choices[0].message.content.strip()
+            suggestions = self.llm.complete(**self.test_suggestions_request(project_details))
             self.logger.info("Received test suggestions from OpenAI API.")
             return suggestions
         except Exception as e:
             self.logger.error(f"OpenAI API call failed for test suggestions: {e}")
             return "No suggestions available."
 
-    def generate_test_suite_script(self, project_details):
+    async def aget_test_suggestions(self, project_details):
         """
-        Uses the OpenAI API to generate a complete Python test suite script using pytest.
+        Awaitable variant of get_test_suggestions().
+        :param project_details: A description of the project or tests.
+        :return: Suggestions as a string.
+        """
+        try:
+            self.logger.info("Querying OpenAI API for test suggestions...")
+            suggestions = await self.llm.acomplete(**self.test_suggestions_request(project_details))
+            self.logger.info("Received test suggestions from OpenAI API.")
+            return suggestions
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for test suggestions: {e}")
+            return "No suggestions available."
+
+    def test_suite_request(self, project_details):
+        """
+        Builds the chat completion request used for test suite generation.
         :param project_details: A description of the project including test coverage details.
-        :return: The generated test suite script as a string.
+        :return: Keyword arguments for LLMGateway.complete().
         """
-        self.logger.info("Generating test suite script using OpenAI API...")
         prompt = (
             "Generate a complete and well-commented Python test suite script using pytest for a software project. "
             "The test suite should include unit tests for core functionalities, setup and teardown methods, "
             "and sample test cases. Project Details: " + project_details
         )
+        return {
+            "model": self.config.get("model", DEFAULT_MODEL),
+            "messages": [
+                {"role": "system", "content": "You are an expert in software testing and Python scripting."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 300,  # Adjust token limit as needed
+            "tag": "TestAgent.generate_test_suite_script",
+        }
+
+    def stream_test_suite_script(self, project_details):
+        """
+        Streams the generated test suite script from the OpenAI API as it arrives.
+        :param project_details: A description of the project including test coverage details.
+        :return: Generator of text chunks.
+        """
+        return self.llm.stream(**self.test_suite_request(project_details))
+
+    def checked_test_suite_script(self, script, output_path=None):
+        """
+        Strips the markdown fences of a generated test suite (rewriting `output_path` with the
+        bare code) and, unless the "validate_artifacts" setting is False, validates it.
+        :return: The code, or a placeholder if it is invalid.
+        """
+        script = strip_artifact(script, output_path)
+        if not self.config.get("validate_artifacts", True):
+            return script
+        state_dir = os.path.join(self.config.get("project_dir", "."), self.config.get("state_dir", ".devautomator"))
+        validator = ScriptValidator(
+            cache_path=os.path.join(state_dir, "validation_cache.json"),
+            dry_run=self.config.get("artifact_dry_run", False),
+            timeout=self.config.get("artifact_dry_run_timeout", DEFAULT_DRY_RUN_TIMEOUT),
+        )
+        result = validator.validate("test_suite.py", script)
+        if not result["ok"]:
+            self.logger.error(f"Generated test suite script is invalid ({result['stage']}): {result['error']}")
+            return "No valid test suite script generated."
+        return script
+
+    def generate_test_suite_script(self, project_details, output_path=None):
+        """
+        Uses the OpenAI API to generate a complete Python test suite script using pytest.
+        :param project_details: A description of the project including test coverage details.
+        :param output_path: Optional file the script is streamed to as it is generated.
+        :return: The generated test suite script (code only) as a string.
+        """
+        self.logger.info("Generating test suite script using OpenAI API...")
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert in software testing and Python scripting."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300  # Adjust token limit as needed
-            )
-            script = response.choices[0].message.content.strip()
+            if output_path:
+                script = write_stream(self.stream_test_suite_script(project_details), output_path).strip()
+            else:
+                script = self.llm.complete(**self.test_suite_request(project_details))
             self.logger.info("Test suite script generated successfully.")
-            return script
+            return self.checked_test_suite_script(script, output_path)
         except Exception as e:
             self.logger.error(f"OpenAI API call failed for generating test suite script: {e}")
             return "No test suite script generated."
 
-    def run_tests(self):
+    async def agenerate_test_suite_script(self, project_details):
+        """
+        Awaitable variant of generate_test_suite_script().
+        :param project_details: A description of the project including test coverage details.
+        :return: The generated test suite script as a string.
+        """
+        self.logger.info("Generating test suite script using OpenAI API...")
+        try:
+            script = await self.llm.acomplete(**self.test_suite_request(project_details))
+            self.logger.info("Test suite script generated successfully.")
+            return await asyncio.to_thread(self.checked_test_suite_script, script)
+        except Exception as e:
+            self.logger.error(f"OpenAI API call failed for generating test suite script: {e}")
+            return "No test suite script generated."
+
+    def run_tests(self, full=False):
         """
         Executes the full test suite including unit tests and optionally integration tests.
+        Unless a full run is requested, when nothing the tests depend on changed since a passing
+        run of the whole suite, its result is reused and neither pytest nor the suggestion request runs.
+        :param full: If True, run every unit test instead of only those affected by changes.
         :return: True if all tests pass, False otherwise.
         """
         self.logger.info("Running complete test suite...")
-        unit_test_result = self.run_unit_tests()
+        cache_key, cached = self.cached_test_result(full)
+        if cached is not None:
+            # Nothing the tests depend on changed, so neither do the results or the suggestions
+            return self.reuse_test_result(cached)
+        unit_test_result = self.run_unit_tests(full, cache_key)
 
         # Optionally: Use OpenAI API to suggest improvements or additional tests
         project_details = "Project setup and current test coverage details."
         suggestions = self.get_test_suggestions(project_details)
-        self.logger.info(f"Test suggestions: {suggestions}")
+        self.logger.info("Test suggestions: %s", truncated(suggestions))
+        return unit_test_result
+
+    async def arun_tests(self, full=False):
+        """
+        Awaitable variant of run_tests(); the unit tests and the suggestion request overlap.
+        :param full: If True, run every unit test instead of only those affected by changes.
+        :return: True if all tests pass, False otherwise.
+        """
+        self.logger.info("Running complete test suite...")
+        cache_key, cached = await asyncio.to_thread(self.cached_test_result, full)
+        if cached is not None:
+            return self.reuse_test_result(cached)
+        project_details = "Project setup and current test coverage details."
+        unit_test_result, suggestions = await asyncio.gather(
+            self.arun_unit_tests(full, cache_key),
+            self.aget_test_suggestions(project_details),
+        )
+        self.logger.info("Test suggestions: %s", truncated(suggestions))
         return unit_test_result
 
 # Example usage (for standalone testing)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Runs the development flow over many projects from a single process.
+
+Every flow shares one LLM gateway (pooled HTTP client, response cache and rate limiter) and
+one process pool for the CPU-bound work (tree walking, test selection), at most
+"max_concurrent_projects" flows run at once, and the outcome of all of them is written to
+one aggregated results file.
+
+Manifest (JSON):
+    {
+        "defaults": {"openai_api_key": "...", "max_parallel_phases": 4},
+        "projects": [
+            {"name": "api", "project_dir": "../api", "project_summary": "REST backend"},
+            {"project_dir": "../worker", "test_workers": 2}
+        ],
+        "max_concurrent_projects": 4,
+        "process_workers": 4,
+        "results_file": "batch_results.json"
+    }
+
+Usage:
+    python3 batch_runner.py manifest.json --max-concurrent 8
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from devflow_manager import DevFlowManager, parse_phases
+from utils.llm_gateway import LLMGateway
+from utils.helper_functions import atomic_write
+from utils.logger import configure_logging_from_config, setup_logger
+
+DEFAULT_MAX_CONCURRENT_PROJECTS = 4
+DEFAULT_RESULTS_FILE = "batch_results.json"
+# Settings that belong to the shared gateway (client, cache, limiter, model router) and logging
+# pipeline; only the manifest defaults apply.
+SHARED_PREFIXES = ("openai_", "llm_", "log_", "model_")
+
+
+def load_manifest(path):
+    """
+    Reads a batch manifest; a plain list is read as the list of projects.
+    :param path: Path of the JSON manifest.
+    :return: The manifest dictionary.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"projects": manifest}
+    return manifest
+
+
+class BatchRunner:
+    """
+    Runs the development flows of the projects listed in a manifest concurrently.
+    """
+
+    def __init__(self, manifest, base_dir="."):
+        """
+        :param manifest: Manifest dictionary with "defaults", "projects" and the batch settings.
+        :param base_dir: Directory relative project paths are resolved against (the manifest's).
+        """
+        self.manifest = manifest
+        self.base_dir = os.path.abspath(base_dir)
+        self.defaults = dict(manifest.get("defaults", {}))
+        configure_logging_from_config(self.defaults)
+        self.logger = setup_logger(__name__)
+        self.max_concurrent = manifest.get("max_concurrent_projects", DEFAULT_MAX_CONCURRENT_PROJECTS)
+        self.process_workers = manifest.get("process_workers") or os.cpu_count() or 1
+        self.results_file = os.path.join(self.base_dir, manifest.get("results_file", DEFAULT_RESULTS_FILE))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Builds a runner from a manifest file; relative paths in it are relative to the file.
+        """
+        return cls(load_manifest(path), base_dir=os.path.dirname(os.path.abspath(path)))
+
+    def project_configs(self):
+        """
+        Merges every project entry over the manifest defaults.
+        :return: List of (name, config) pairs; names are unique and also stored as "project_name".
+        """
+        configs = []
+        names = set()
+        for index, project in enumerate(self.manifest.get("projects", [])):
+            ignored = sorted(key for key in project
+                             if key.startswith(SHARED_PREFIXES) and project[key] != self.defaults.get(key))
+            config = dict(self.defaults)
+            config.update({key: value for key, value in project.items() if key not in ignored and key != "name"})
+            config["project_dir"] = os.path.normpath(os.path.join(self.base_dir, config.get("project_dir", ".")))
+            if config.get("artifact_dir") and not os.path.isabs(config["artifact_dir"]):
+                config["artifact_dir"] = os.path.join(config["project_dir"], config["artifact_dir"])
+
+            name = project.get("name") or os.path.basename(config["project_dir"]) or f"project-{index + 1}"
+            if name in names:
+                name = f"{name}-{index + 1}"
+            names.add(name)
+            config["project_name"] = name
+            if ignored:
+                self.logger.warning(
+                    f"{name}: {', '.join(ignored)} ignored; the shared gateway and logging use the manifest defaults."
+                )
+            configs.append((name, config))
+        return configs
+
+    async def run_project(self, name, config, gateway, executor, semaphore, resume, phases):
+        """
+        Runs the flow of one project once a concurrency slot is free. Errors are reported in
+        the returned entry instead of aborting the batch.
+        """
+        async with semaphore:
+            self.logger.info(f"Starting the flow of {name} ({config['project_dir']})")
+            entry = {"name": name, "project_dir": config["project_dir"], "status": "Error", "results": None,
+                     "error": None, "metrics_report": None}
+            started = time.time()
+            try:
+                manager = DevFlowManager(config, gateway, executor)
+                results = await manager.arun_development_flow(resume, phases)
+                statuses = [status for phase, status in results.items() if phase != "timestamps"]
+                entry["status"] = "Success" if all(status == "Success" for status in statuses) else "Failed"
+                entry["results"] = results
+                entry["metrics_report"] = manager.last_metrics_report
+            except Exception as e:
+                self.logger.error(f"The flow of {name} failed: {e}")
+                entry["error"] = str(e)
+            entry["duration"] = round(time.time() - started, 3)
+            self.logger.info(f"{name}: {entry['status']} in {entry['duration']}s")
+            return entry
+
+    async def arun(self, resume=None, phases=None):
+        """
+        Runs every project of the manifest and writes the aggregated results file.
+        :param resume: Passed to each flow; defaults to each project's "resume" setting.
+        :param phases: Optional phases to run in each flow; defaults to each project's "phases" setting.
+        :return: The aggregated results dictionary.
+        """
+        projects = self.project_configs()
+        gateway = LLMGateway.from_config(self.defaults)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        started = time.time()
+        self.logger.info(
+            f"Running {len(projects)} project(s), {self.max_concurrent} at a time, "
+            f"with {self.process_workers} worker process(es)."
+        )
+        # Worker processes are spawned rather than forked: the parent runs threads (logging,
+        # HTTP clients) that a fork would copy in an inconsistent state.
+        executor = ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=configure_logging_from_config,
+            initargs=(self.defaults,),
+        )
+        try:
+            entries = await asyncio.gather(*(
+                self.run_project(name, config, gateway, executor, semaphore, resume, phases)
+                for name, config in projects
+            ))
+            summary = self.aggregate(entries, gateway, started)
+        finally:
+            executor.shutdown()
+            await gateway.aclose()
+            gateway.close()
+        self.write_results(summary)
+        return summary
+
+    def run(self, resume=None, phases=None):
+        return asyncio.run(self.arun(resume, phases))
+
+    def aggregate(self, entries, gateway, started):
+        """
+        Builds the aggregated results: per-project outcomes plus batch-wide LLM statistics.
+        """
+        finished = time.time()
+        report = gateway.metrics.report()
+        return {
+            "started": started,
+            "finished": finished,
+            "duration": round(finished - started, 3),
+            "max_concurrent_projects": self.max_concurrent,
+            "projects": entries,
+            "summary": {
+                "total": len(entries),
+                "succeeded": sum(1 for entry in entries if entry["status"] == "Success"),
+                "failed": sum(1 for entry in entries if entry["status"] == "Failed"),
+                "errors": sum(1 for entry in entries if entry["status"] == "Error"),
+            },
+            "llm": {
+                "calls": len(report["calls"]),
+                "cache": gateway.cache_stats(),
+                "methods": report["methods"],
+            },
+        }
+
+    def write_results(self, summary):
+        try:
+            atomic_write(self.results_file, json.dumps(summary, indent=2, default=str))
+        except OSError as e:
+            self.logger.error(f"Failed to write the batch results: {e}")
+            return
+        counts = summary["summary"]
+        self.logger.info(
+            f"Batch completed: {counts['succeeded']}/{counts['total']} succeeded, {counts['failed']} failed, "
+            f"{counts['errors']} errors. Results written to {self.results_file}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the development flow over several projects")
+    parser.add_argument('manifest', type=str, help="JSON manifest listing the projects")
+    parser.add_argument('--max-concurrent', type=int, default=None, help="Maximum number of flows running at once")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--output', type=str, default=None, help="Aggregated results file")
+    parser.add_argument('--resume', action='store_true', help="Resume unchanged phases from their checkpoints")
+    parser.add_argument('--phases', type=str, default=None, help="Comma-separated phases to run in every project")
+    args = parser.parse_args()
+
+    runner = BatchRunner.from_file(args.manifest)
+    if args.max_concurrent:
+        runner.max_concurrent = args.max_concurrent
+    if args.workers:
+        runner.process_workers = args.workers
+    if args.output:
+        runner.results_file = os.path.abspath(args.output)
+    summary = runner.run(resume=True if args.resume else None, phases=parse_phases(args.phases))
+    return 0 if summary["summary"]["succeeded"] == summary["summary"]["total"] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
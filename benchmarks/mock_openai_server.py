@@ -0,0 +1,271 @@
+import re
+import json
+import math
+import time
+import random
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+WORDS = ("the agent builds a plan and tests each module before the deployment script "
+         "documents every phase of the project with concise steps").split()
+NUMBERED_LINE = re.compile(r"^(\d+)\. ", re.M)
+# System prompts of the agents that ask for a Python script (build, deployment, test suite, plan).
+SCRIPT_REQUEST = re.compile(r"Python (scripting|developer)")
+
+
+class MockSettings:
+    """
+    Behavior of the mock chat completions endpoint.
+    """
+
+    def __init__(self, latency="lognormal", latency_mean=0.2, latency_spread=0.5, token_interval=0.005,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=0.05, output_tokens=80, canned=None, seed=None):
+        """
+        :param latency: Latency distribution: "fixed", "uniform", "exponential" or "lognormal".
+        :param latency_mean: Mean time to the first byte, in seconds.
+        :param latency_spread: Spread of the distribution (relative width for "uniform", sigma for "lognormal").
+        :param token_interval: Delay between two streamed chunks, in seconds.
+        :param error_rate: Fraction of requests answered with a 500 error.
+        :param rate_limit_rate: Fraction of requests answered with a 429 and a retry-after header.
+        :param retry_after: Retry delay advertised on 429 responses, in seconds.
+        :param output_tokens: Completion length in words (capped by the request's max_tokens).
+        :param canned: Optional list of responses returned in rotation instead of generated text.
+        :param seed: Optional random seed for reproducible runs.
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency}'")
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_spread = latency_spread
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.output_tokens = output_tokens
+        self.canned = list(canned or [])
+        self.random = random.Random(seed)
+
+    def sample_latency(self):
+        mean, spread = self.latency_mean, self.latency_spread
+        if self.latency == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if self.latency == "uniform":
+            return self.random.uniform(mean * (1 - spread), mean * (1 + spread))
+        if self.latency == "exponential":
+            return self.random.expovariate(1.0 / mean)
+        # lognormal with the requested mean
+        return self.random.lognormvariate(0, spread) * mean / math.exp(spread * spread / 2)
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.streamed = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "completed": self.completed, "rate_limited": self.rate_limited,
+                    "errors": self.errors, "streamed": self.streamed}
+
+
+def script_text(settings, body):
+    """
+    Produces the answer to a script request: a fenced Python script of `output_tokens` words,
+    cut after max_tokens space-separated tokens, so a small limit leaves an unterminated fence
+    and line (an invalid artifact), as a real model would. The script only depends on the
+    request's prompt, so a continuation request (the partial answer as the last assistant
+    message) receives the rest of it.
+    :return: Tuple of (text, finish_reason).
+    """
+    messages = body["messages"]
+    prompt = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    offset = zlib.crc32(prompt.encode("utf-8"))
+    words = [WORDS[(offset + i) % len(WORDS)] for i in range(max(1, settings.output_tokens))]
+    lines = [f"print({' '.join(words[i:i + 8])!r})" for i in range(0, len(words), 8)]
+    text = "```python\n" + "\n".join(lines) + "\n```"
+    if len(messages) >= 2 and messages[-2].get("role") == "assistant":
+        partial = messages[-2].get("content") or ""
+        if text.startswith(partial):
+            text = text[len(partial):]
+    tokens = text.split(" ")
+    max_tokens = body.get("max_tokens")
+    if max_tokens and len(tokens) > max_tokens:
+        return " ".join(tokens[:max_tokens]), "length"
+    return text, "stop"
+
+
+def completion_text(settings, body, counter):
+    """
+    Produces the response text: a canned answer, a JSON object for JSON-mode requests (one
+    task per numbered requirement, as the batched planner expects), a fenced Python script for
+    script requests (see script_text()) or generated words.
+    :return: Tuple of (text, finish_reason); the reason is "length" when max_tokens cut the text short.
+    """
+    if settings.canned:
+        return settings.canned[counter % len(settings.canned)], "stop"
+    length = min(settings.output_tokens, body.get("max_tokens") or settings.output_tokens)
+    finish_reason = "length" if length < settings.output_tokens else "stop"
+    words = [WORDS[(counter + i) % len(WORDS)] for i in range(max(1, length))]
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        prompt = body["messages"][-1]["content"]
+        indexes = [int(number) for number in NUMBERED_LINE.findall(prompt)] or [0]
+        per_task = max(1, len(words) // len(indexes))
+        tasks = [{"index": index, "details": " ".join(words[:per_task])} for index in indexes]
+        return json.dumps({"tasks": tasks}), "stop"
+    if SCRIPT_REQUEST.search(body["messages"][0].get("content") or ""):
+        return script_text(settings, body)
+    return " ".join(words), finish_reason
+
+
+def make_handler(settings, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, headers=()):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def write_chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+            with stats.lock:
+                stats.requests += 1
+                counter = stats.requests
+                roll = settings.random.random()
+                latency = settings.sample_latency()
+            if roll < settings.rate_limit_rate:
+                with stats.lock:
+                    stats.rate_limited += 1
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                               [("retry-after-ms", str(int(settings.retry_after * 1000)))])
+                return
+            time.sleep(latency)
+            if roll < settings.rate_limit_rate + settings.error_rate:
+                with stats.lock:
+                    stats.errors += 1
+                self.send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            text, finish_reason = completion_text(settings, body, counter)
+            usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in body["messages"]) // 4,
+                     "completion_tokens": len(text.split())}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            base = {"id": f"chatcmpl-mock-{counter}", "created": int(time.time()), "model": body.get("model", "mock")}
+            if body.get("stream"):
+                self.stream(base, text, finish_reason, usage, (body.get("stream_options") or {}).get("include_usage"))
+            else:
+                self.send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                    "index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason,
+                }]))
+            with stats.lock:
+                stats.completed += 1
+
+        def stream(self, base, text, finish_reason, usage, include_usage):
+            with stats.lock:
+                stats.streamed += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def event(choices, **extra):
+                chunk = dict(base, object="chat.completion.chunk", choices=choices, **extra)
+                self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+            for i, word in enumerate(text.split(" ")):
+                if i and settings.token_interval:
+                    time.sleep(settings.token_interval)
+                event([{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}])
+            event([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            if include_usage:
+                event([], usage=usage)
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+
+    return Handler
+
+
+class MockOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions endpoint (plain and SSE-streamed), with
+    configurable latency, error and 429 injection, run on a background thread.
+
+    Usage:
+        with MockOpenAIServer(MockSettings(latency_mean=0.1)) as server:
+            config["openai_base_url"] = server.base_url
+    """
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.settings, self.stats))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on")
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="Latency distribution")
+    parser.add_argument('--latency-mean', type=float, default=0.2, help="Mean time to first byte in seconds")
+    parser.add_argument('--latency-spread', type=float, default=0.5, help="Spread of the latency distribution")
+    parser.add_argument('--token-interval', type=float, default=0.005, help="Delay between streamed chunks")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument('--output-tokens', type=int, default=80, help="Completion length in words")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.latency_mean, args.latency_spread, args.token_interval,
+                            args.error_rate, args.rate_limit_rate, output_tokens=args.output_tokens, seed=args.seed)
+    server = MockOpenAIServer(settings, port=args.port)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
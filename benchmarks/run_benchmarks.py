@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Offline performance benchmarks for DevAutomator.
+
+Starts a local mock of the chat completions endpoint and drives the planning agent, the
+agent collaboration simulation and the full development flow against it at several sizes
+and concurrency levels, after an untimed warm-up per scenario. Results (throughput and latency
+percentiles) are printed and appended to a JSON-lines history file so they can be compared
+over time.
+
+Usage:
+    python3 -m benchmarks.run_benchmarks --scenarios plan,simulate,flow --latency-mean 0.05
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import importlib
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_openai_server import MockOpenAIServer, MockSettings, LATENCY_DISTRIBUTIONS
+from utils.logger import configure_logging
+from utils.metrics import MetricsRecorder, percentile
+
+SCENARIOS = ("plan", "simulate", "flow", "startup")
+API_KEY = "sk-benchmark"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules a scenario loads lazily; the start-up scenario measures a cold start and is not warmed up.
+WARM_UP_IMPORTS = {"plan": ("agents.planning_agent",), "simulate": ("main",), "flow": ("devflow_manager",)}
+
+
+def base_config(base_url, state_dir):
+    return {
+        "openai_api_key": API_KEY,
+        "openai_base_url": base_url,
+        "state_dir": state_dir,
+        "llm_cache": False,
+        "llm_requests_per_minute": 100000,
+        "llm_tokens_per_minute": None,
+        "llm_backoff_base": 0.05,
+        "log_file": None,
+        "log_level": "WARNING",
+        "metrics": False,
+    }
+
+
+def warm_up(server, scenario):
+    """
+    Pays the one-off costs of a scenario before its timed cases: imports its modules and the
+    openai client, and sends one untimed request through a sync and an async client.
+    """
+    from utils.llm_gateway import LLMGateway, DEFAULT_MODEL
+    for module in WARM_UP_IMPORTS[scenario]:
+        importlib.import_module(module)
+    messages = [{"role": "user", "content": "warm-up"}]
+    with tempfile.TemporaryDirectory() as state_dir:
+        gateway = LLMGateway.from_config(base_config(server.base_url, state_dir))
+
+        async def arequest():
+            try:
+                await gateway.acomplete(DEFAULT_MODEL, messages, max_tokens=8, tag="warm_up", use_cache=False)
+            finally:
+                await gateway.aclose()
+
+        try:
+            gateway.complete(DEFAULT_MODEL, messages, max_tokens=8, tag="warm_up", use_cache=False)
+            asyncio.run(arequest())
+        except Exception as e:
+            print(f"Warm-up request for {scenario} failed: {e}", file=sys.stderr)
+        finally:
+            gateway.close()
+
+
+def summarize(name, params, wall, metrics, server_before, server_after):
+    """
+    Turns the measurements of one benchmark case into a result row.
+    """
+    calls = [call for call in metrics.calls if not call.cache_hit]
+    latencies = [call.latency for call in calls]
+    ttfbs = [call.ttfb for call in calls if call.ttfb is not None]
+    return {
+        "scenario": name,
+        "params": params,
+        "wall_seconds": round(wall, 4),
+        "llm_calls": len(calls),
+        "throughput_calls_per_second": round(len(calls) / wall, 3) if wall > 0 else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "ttfb_p50": percentile(ttfbs, 0.5),
+        "ttfb_p95": percentile(ttfbs, 0.95),
+        "retries": sum(call.retries for call in calls),
+        "errors": sum(1 for call in calls if call.error),
+        "server": {key: server_after[key] - server_before[key] for key in server_after},
+    }
+
+
+def bench_plan(server, sizes, concurrency_levels, modes):
+    from agents.planning_agent import PlanningAgent
+    for size in sizes:
+        for mode in modes:
+            for concurrency in concurrency_levels if mode != "sequential" else (1,):
+                with tempfile.TemporaryDirectory() as state_dir:
+                    config = dict(base_config(server.base_url, state_dir),
+                                  task_notes=[f"Requirement {i}: implement feature {i}" for i in range(size)],
+                                  planning_mode=mode, planning_concurrency=concurrency)
+                    agent = PlanningAgent(config)
+                    before = server.stats.snapshot()
+                    started = time.perf_counter()
+                    agent.formulate_plan()
+                    wall = time.perf_counter() - started
+                    agent.llm.close()
+                    yield summarize("plan", {"requirements": size, "mode": mode, "concurrency": concurrency},
+                                    wall, agent.llm.metrics, before, server.stats.snapshot())
+
+
+def bench_simulate(server, sizes, concurrency_levels, iterations):
+    from main import simulate_agents
+    for agents in sizes:
+        for concurrency in concurrency_levels:
+            metrics = MetricsRecorder()
+            before = server.stats.snapshot()
+            started = time.perf_counter()
+            # The mock's generated texts are near-duplicates of each other, so evaluation reuse and
+            # early stopping are disabled to keep the workload at agents x agents x iterations.
+            simulate_agents(API_KEY, "gpt-4o", "benchmark topic", iterations=iterations, num_agents=agents,
+                            concurrency=concurrency, base_url=server.base_url, metrics=metrics,
+                            reuse_threshold=2.0, delta_threshold=2.0, convergence_threshold=2.0)
+            wall = time.perf_counter() - started
+            yield summarize("simulate", {"agents": agents, "iterations": iterations, "concurrency": concurrency},
+                            wall, metrics, before, server.stats.snapshot())
+
+
+def make_project(root, modules):
+    """
+    Writes a synthetic project with `modules` modules and a test module for every fifth one.
+    """
+    os.makedirs(os.path.join(root, "pkg"))
+    os.makedirs(os.path.join(root, "tests"))
+    with open(os.path.join(root, "conftest.py"), "w") as f:
+        f.write("")
+    with open(os.path.join(root, "pkg", "__init__.py"), "w") as f:
+        f.write('"""Synthetic benchmark package."""\n')
+    for i in range(modules):
+        with open(os.path.join(root, "pkg", f"mod_{i}.py"), "w") as f:
+            f.write(f'"""Module {i}."""\n\n\nclass Widget{i}:\n    """A widget."""\n\n'
+                    f'    def scale(self, value: int) -> int:\n        return value * {i + 1}\n\n\n'
+                    f'def build_{i}(count=1):\n    """Builds widgets."""\n    return [Widget{i}() for _ in range(count)]\n')
+        if i % 5 == 0:
+            with open(os.path.join(root, "tests", f"test_mod_{i}.py"), "w") as f:
+                f.write(f"from pkg.mod_{i} import Widget{i}\n\n\ndef test_scale():\n"
+                        f"    assert Widget{i}().scale(2) == {2 * (i + 1)}\n")
+
+
+def bench_flow(server, sizes, concurrency_levels):
+    from devflow_manager import DevFlowManager
+    from utils.llm_gateway import LLMGateway
+    for modules in sizes:
+        for parallel in concurrency_levels:
+            with tempfile.TemporaryDirectory() as root:
+                make_project(root, modules)
+                config = dict(base_config(server.base_url, os.path.join(root, ".devautomator")),
+                              project_dir=root, artifact_dir=os.path.join(root, "artifacts"),
+                              max_parallel_phases=parallel,
+                              task_notes=[f"Requirement {i}" for i in range(5)])
+                gateway = LLMGateway.from_config(config)
+                manager = DevFlowManager(config, gateway)
+                before = server.stats.snapshot()
+                started = time.perf_counter()
+                results = manager.run_development_flow()
+                wall = time.perf_counter() - started
+                gateway.close()
+                row = summarize("flow", {"modules": modules, "max_parallel_phases": parallel},
+                                wall, gateway.metrics, before, server.stats.snapshot())
+                row["phases"] = {name: status for name, status in results.items() if name != "timestamps"}
+                row["phase_seconds"] = {name: stamps["duration"] for name, stamps in results["timestamps"].items()}
+                row["artifacts_valid"] = {name[:-len("_validation")]: value["ok"]
+                                          for name, value in manager.last_run.values.items()
+                                          if name.endswith("_validation") and value}
+                yield row
+
+
+def startup_cases(server, root):
+    """
+    Short invocations whose wall time is dominated by interpreter start-up, imports and
+    object construction.
+    """
+    config_path = os.path.join(root, "startup_config.json")
+    with open(config_path, "w") as f:
+        json.dump(dict(base_config(server.base_url, ".devautomator"), project_dir=root,
+                       project_summary="Synthetic project"), f)
+    flow = [sys.executable, os.path.join(ROOT, "devflow_manager.py"), "--config", config_path]
+    return [
+        ("import devflow_manager", [sys.executable, "-c", "import devflow_manager"]),
+        ("main.py --help", [sys.executable, os.path.join(ROOT, "main.py"), "--help"]),
+        ("devflow_manager.py --help", flow[:2] + ["--help"]),
+        ("construct DevFlowManager", [sys.executable, "-c",
+                                      "import json, sys; from devflow_manager import DevFlowManager; "
+                                      "DevFlowManager(json.load(open(sys.argv[1])))", config_path]),
+        ("flow --phases structure", flow + ["--phases", "structure"]),
+        ("flow --phases documentation", flow + ["--phases", "documentation"]),
+    ]
+
+
+def bench_startup(server, repeats):
+    with tempfile.TemporaryDirectory() as root:
+        make_project(root, 20)
+        for name, command in startup_cases(server, root):
+            samples, errors = [], 0
+            for _ in range(repeats):
+                started = time.perf_counter()
+                result = subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                samples.append(time.perf_counter() - started)
+                errors += result.returncode != 0
+            yield {
+                "scenario": "startup",
+                "params": {"command": name, "repeats": repeats},
+                "wall_seconds": round(sum(samples), 4),
+                "llm_calls": 0,
+                "throughput_calls_per_second": None,
+                "latency_p50": percentile(samples, 0.5),
+                "latency_p95": percentile(samples, 0.95),
+                "ttfb_p50": None,
+                "ttfb_p95": None,
+                "retries": 0,
+                "errors": errors,
+                "server": {},
+            }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def format_row(row):
+    params = ", ".join(f"{key}={value}" for key, value in row["params"].items())
+    p50 = f"{row['latency_p50']:.3f}" if row["latency_p50"] is not None else "-"
+    p95 = f"{row['latency_p95']:.3f}" if row["latency_p95"] is not None else "-"
+    return (f"{row['scenario']:<9} {params:<52} {row['wall_seconds']:>8.2f}s {row['llm_calls']:>5} calls "
+            f"{row['throughput_calls_per_second'] or 0:>7.2f}/s  p50 {p50}s  p95 {p95}s  "
+            f"retries {row['retries']}  errors {row['errors']}")
+
+
+def parse_list(text, cast=int):
+    return [cast(item) for item in text.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DevAutomator offline benchmarks")
+    parser.add_argument('--scenarios', type=str, default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument('--plan-sizes', type=str, default="10,50", help="Numbers of requirements to plan")
+    parser.add_argument('--plan-modes', type=str, default="sequential,concurrent,batched", help="Planning modes")
+    parser.add_argument('--simulate-agents', type=str, default="2,8", help="Numbers of collaborating agents")
+    parser.add_argument('--simulate-iterations', type=int, default=2, help="Collaboration rounds per simulation")
+    parser.add_argument('--flow-modules', type=str, default="5,40", help="Module counts of the synthetic projects")
+    parser.add_argument('--concurrency', type=str, default="1,8", help="Concurrency levels (parallel phases for the flow)")
+    parser.add_argument('--startup-repeats', type=int, default=5, help="Runs of each start-up command")
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="Mock latency distribution")
+    parser.add_argument('--latency-mean', type=float, default=0.05, help="Mean mock latency in seconds")
+    parser.add_argument('--latency-spread', type=float, default=0.5, help="Spread of the latency distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument('--output-tokens', type=int, default=80,
+                        help="Mock completion length in words; above the agents' max_tokens (150-300), generated "
+                             "scripts are truncated mid-fence and exercise continuation and validation")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the mock server")
+    parser.add_argument('--output', type=str, default=os.path.join(".devautomator", "benchmarks.jsonl"),
+                        help="JSON-lines file the results are appended to")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None, console_level=logging.WARNING)
+    settings = MockSettings(args.latency, args.latency_mean, args.latency_spread, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate, output_tokens=args.output_tokens, seed=args.seed)
+    concurrency = parse_list(args.concurrency)
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    rows = []
+    with MockOpenAIServer(settings) as server:
+        cases = {
+            "plan": lambda: bench_plan(server, parse_list(args.plan_sizes), concurrency, parse_list(args.plan_modes, str)),
+            "simulate": lambda: bench_simulate(server, parse_list(args.simulate_agents), concurrency,
+                                               args.simulate_iterations),
+            "flow": lambda: bench_flow(server, parse_list(args.flow_modules), concurrency),
+            "startup": lambda: bench_startup(server, args.startup_repeats),
+        }
+        for name in scenarios:
+            if name in WARM_UP_IMPORTS:
+                warm_up(server, name)
+            for row in cases[name]():
+                print(format_row(row), flush=True)
+                rows.append(row)
+
+    record = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "mock": {key: value for key, value in vars(settings).items() if key not in ("random", "canned")},
+        "results": rows,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {args.output}")
+
+if __name__ == '__main__':
+    main()
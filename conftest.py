@@ -0,0 +1 @@
+# Marks the repository root for pytest, so tests import `utils` and `agents` from here.
@@ -1,64 +1,429 @@
 import os
-import logging
-from agents.planning_agent import PlanningAgent
-from agents.build_agent import BuildAgent
-from agents.test_agent import TestAgent
-from agents.deployment_agent import DeploymentAgent
-from agents.documentation_agent import DocumentationAgent
-
-def setup_logger(name):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    handler = logging.StreamHandler()
-    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - [%(name)s] %(message)s"))
-    logger.addHandler(handler)
-    return logger
+import re
+import time
+import json
+import asyncio
+import argparse
+from utils.agent_registry import AgentRegistry
+from utils.llm_gateway import LLMGateway
+from utils.phase_graph import Phase, PhaseGraph
+from utils.checkpoints import CheckpointStore
+from utils.tree_index import TreeIndex, tree_summary, tree_fingerprint
+from utils.script_validator import ScriptValidator, strip_artifact, DEFAULT_DRY_RUN_TIMEOUT
+from utils.helper_functions import atomic_write
+from utils.metrics import current_scope
+from utils.logger import configure_logging_from_config, setup_logger, truncated
 
 class DevFlowManager:
-    def __init__(self, config):
+    def __init__(self, config, gateway=None, executor=None):
+        """
+        :param config: Configuration dictionary of the project.
+        :param gateway: Optional LLMGateway, e.g. one shared by several projects; a private one is created if omitted.
+        :param executor: Optional process pool running the CPU-bound work (tree walking, test selection).
+        """
         self.config = config
+        configure_logging_from_config(config)
         self.logger = setup_logger(__name__)
         self.logger.info("DevFlowManager initialized.")
 
-        self.agents = {
-            "planning": PlanningAgent(config),
-            "build": BuildAgent(config),
-            "test": TestAgent(config),
-            "deployment": DeploymentAgent(config),
-            "documentation": DocumentationAgent(config)
+        # One gateway (and one pooled HTTP client) shared by every agent
+        self.llm = gateway or LLMGateway.from_config(config)
+        self.executor = executor
+        # Tags this project's measurements when the gateway's metrics recorder is shared
+        self.scope = config.get("project_name")
+        # Agents (and their modules) are only built once a phase needs them
+        self.agents = AgentRegistry(config, self.llm, options={"test": {"executor": executor}})
+        self.last_run = None
+        self.last_metrics_report = None
+        self.tree_indexes = {}
+        self.validator = self.script_validator()
+
+    def script_validator(self):
+        """
+        Returns the validator deciding whether generated scripts are usable, or None when the
+        "validate_artifacts" setting is False (any non-empty script then counts as a success).
+        """
+        if not self.config.get("validate_artifacts", True):
+            return None
+        return ScriptValidator(
+            cache_path=os.path.join(self.state_dir(), "validation_cache.json"),
+            dry_run=self.config.get("artifact_dry_run", False),
+            timeout=self.config.get("artifact_dry_run_timeout", DEFAULT_DRY_RUN_TIMEOUT),
+            executor=self.executor,
+        )
+
+    def state_dir(self):
+        state_dir = self.config.get("state_dir", ".devautomator")
+        if not os.path.isabs(state_dir):
+            state_dir = os.path.join(self.config.get("project_dir", "."), state_dir)
+        return state_dir
+
+    def checkpoint_store(self):
+        """
+        Returns the store persisting phase outputs (in the "run_dir" setting, by default `runs/`
+        under the state directory), or None when the "checkpoints" setting is False.
+        """
+        if not self.config.get("checkpoints", True):
+            return None
+        run_dir = self.config.get("run_dir") or os.path.join(self.state_dir(), "runs")
+        return CheckpointStore(run_dir, self.config, self.logger)
+
+    def source_fingerprint(self):
+        """
+        Cheap fingerprint of the project sources (path, mtime and size of every Python file and
+        global test setting), so phases that read the sources are not resumed after they change.
+        The flow's own outputs (the documentation file, logs, the artifact directory) are left
+        out, so a phase writing them does not invalidate the checkpoints of the others.
+        """
+        base_dir = self.config.get("project_dir", ".")
+        exclude = []
+        artifact_dir = self.config.get("artifact_dir")
+        if artifact_dir:
+            relpath = os.path.relpath(os.path.abspath(artifact_dir), os.path.abspath(base_dir))
+            if relpath != "." and not relpath.startswith(".."):
+                exclude.append(relpath.replace(os.sep, "/"))
+        if self.executor is not None:
+            return self.executor.submit(tree_fingerprint, base_dir, self.config.get("state_dir", ".devautomator"),
+                                        True, exclude).result()
+        return self.tree_index(base_dir).fingerprint(sources_only=True, exclude=exclude)
+
+    def validated(self, output, filename, script):
+        """
+        Strips the markdown fences of a generated script, rewriting its artifact file with the
+        bare code, validates that code and returns the phase outputs: the code plus its
+        validation result under `<output>_validation`.
+        """
+        script = strip_artifact(script, self.artifact_path(filename))
+        outputs = {output: script}
+        if self.validator is not None and script:
+            result = self.validator.validate(filename, script)
+            if not result["ok"]:
+                self.logger.error(f"Generated {filename} is invalid ({result['stage']}): {result['error']}")
+            outputs[f"{output}_validation"] = result
+        return outputs
+
+    async def avalidated(self, coro, output, filename):
+        """
+        Awaitable variant of validated(); the checks run in a worker thread.
+        """
+        script = await coro
+        return await asyncio.to_thread(self.validated, output, filename, script)
+
+    @staticmethod
+    def plan_check(outputs):
+        """
+        Success predicate of the planning phase: a plan in which no requirement could be refined
+        (every task holds the fallback placeholder) fails, so it is never checkpointed and resumed.
+        """
+        from agents.planning_agent import is_placeholder_plan  # already loaded by the phase
+        return not is_placeholder_plan(outputs.get("plan") or [])
+
+    @staticmethod
+    def documentation_check(outputs):
+        """
+        Success predicate of the documentation phase: fails when the documentation or one of its
+        sections could not be generated, so the phase is not checkpointed and is retried.
+        """
+        from agents.documentation_agent import DOCUMENTATION_FAILED  # already loaded by the phase
+        return outputs.get("documentation") not in (None, "", DOCUMENTATION_FAILED)
+
+    @staticmethod
+    def script_check(output):
+        """
+        Returns the success predicate of a phase producing a script: the script is non-empty
+        and, when it was validated, valid.
+        """
+        def check(outputs):
+            validation = outputs.get(f"{output}_validation")
+            return bool(outputs.get(output)) and (validation is None or validation["ok"])
+        return check
+
+    def restore_artifact(self, filename, content):
+        """
+        Rewrites an artifact of a resumed phase if the file is missing.
+        """
+        path = self.artifact_path(filename)
+        if path and content and not os.path.exists(path):
+            atomic_write(path, content + "\n")
+
+    def build_phase_graph(self, resume=False, phases=None):
+        """
+        Declares the development flow as a dependency graph of phases with explicit inputs and
+        outputs. Phases that do not consume each other's outputs run concurrently.
+        :param resume: If True, phases whose inputs, settings and sources are unchanged since a
+                       stored checkpoint are completed from it instead of running again.
+        :param phases: Optional names of the phases to run; the phases they depend on are added.
+        :return: A PhaseGraph instance.
+        """
+        agents = self.agents
+        graph = PhaseGraph([
+            Phase(
+                "planning",
+                run=lambda inputs: {"plan": agents["planning"].formulate_plan()},
+                arun=lambda inputs: self._wrap(agents["planning"].aformulate_plan(), "plan"),
+                outputs=("plan",),
+                check=self.plan_check,
+            ),
+            Phase(
+                "build",
+                run=lambda inputs: self.validated(
+                    "build_script", "build_script.py", agents["build"].run_build(self.artifact_path("build_script.py"))),
+                # Streaming to an artifact file runs in a worker thread
+                arun=None if self.artifact_path("build_script.py") else
+                lambda inputs: self.avalidated(agents["build"].arun_build(), "build_script", "build_script.py"),
+                outputs=("build_script", "build_script_validation"),
+                check=self.script_check("build_script"),
+                restore=lambda outputs: self.restore_artifact("build_script.py", outputs.get("build_script")),
+            ),
+            Phase(
+                "test",
+                run=lambda inputs: {"tests_passed": agents["test"].run_tests()},
+                arun=lambda inputs: self._wrap(agents["test"].arun_tests(), "tests_passed"),
+                outputs=("tests_passed",),
+                fingerprint=self.source_fingerprint,
+            ),
+            Phase(
+                "deployment",
+                run=lambda inputs: self.validated("deployment_script", "deployment_script.py",
+                                                  agents["deployment"].run_deployment(
+                                                      self.artifact_path("deployment_script.py"))),
+                arun=None if self.artifact_path("deployment_script.py") else
+                lambda inputs: self.avalidated(agents["deployment"].arun_deployment(), "deployment_script",
+                                               "deployment_script.py"),
+                outputs=("deployment_script", "deployment_script_validation"),
+                check=self.script_check("deployment_script"),
+                restore=lambda outputs: self.restore_artifact("deployment_script.py", outputs.get("deployment_script")),
+            ),
+            Phase(
+                "structure",
+                run=lambda inputs: {"code_structure": self.get_code_structure_summary(inputs["project_dir"])},
+                inputs=("project_dir",),
+                outputs=("code_structure",),
+                checkpoint=False,
+            ),
+            Phase(
+                "documentation",
+                run=lambda inputs: {"documentation": agents["documentation"].generate_and_update_documentation(
+                    inputs["project_summary"], inputs["code_structure"], self.documentation_path())},
+                arun=lambda inputs: self._wrap(agents["documentation"].agenerate_and_update_documentation(
+                    inputs["project_summary"], inputs["code_structure"], self.documentation_path()), "documentation"),
+                inputs=("project_summary", "code_structure"),
+                outputs=("documentation",),
+                check=self.documentation_check,
+                fingerprint=self.source_fingerprint,
+            ),
+        ], logger=self.logger, checkpoints=self.checkpoint_store(), resume=resume)
+        return graph.select(phases) if phases else graph
+
+    @staticmethod
+    async def _wrap(coro, output):
+        return {output: await coro}
+
+    def artifact_path(self, filename):
+        """
+        Returns where a generated artifact is streamed to, or None when the "artifact_dir"
+        setting is not configured (the artifact is then only returned in memory).
+        """
+        artifact_dir = self.config.get("artifact_dir")
+        return os.path.join(artifact_dir, filename) if artifact_dir else None
+
+    def documentation_path(self):
+        """
+        Returns the documentation file kept up to date by the documentation phase ("doc_file"
+        setting, by default README.md in the project directory). With the "doc_incremental"
+        setting on, only the sections of changed modules are regenerated and spliced into it.
+        """
+        return self.config.get("doc_file") or os.path.join(self.config.get("project_dir", "."), "README.md")
+
+    def seed_values(self):
+        """
+        Returns the flow inputs that come from the configuration rather than from a phase.
+        """
+        return {
+            "project_dir": self.config.get("project_dir", "."),
+            "project_summary": self.config.get("project_summary", ""),
         }
 
-    def run_development_flow(self):
-        self.logger.info("Starting development flow...")
-        results = {}
+    def collect_results(self, graph, run):
+        """
+        Converts a GraphRun into the results dictionary returned by the flow.
+        :param graph: The PhaseGraph that was run.
+        :param run: The GraphRun produced by the phase graph.
+        :return: Dictionary mapping each phase to its status, plus per-phase timestamps.
+        """
+        self.last_run = run
+        if "plan" in run.values:
+            self.logger.info("Generated Plan: %s", truncated(run.values["plan"]))
+        if run.resumed:
+            self.logger.info(f"Resumed from checkpoints: {', '.join(run.resumed)}")
+        results = {name: run.statuses[name] for name in graph.phases}
+        results["timestamps"] = {name: run.timestamps[name] for name in graph.phases if name in run.timestamps}
+        for name in graph.phases:
+            self.llm.metrics.record_phase(name, run.statuses[name], **run.timestamps.get(name, {}))
+        return results
 
+    def metrics_dir(self):
+        """
+        Directory receiving the per-run metrics reports ("metrics_dir" setting, by default
+        `metrics/` under the state directory of the project).
+        """
+        return self.config.get("metrics_dir") or os.path.join(self.state_dir(), "metrics")
+
+    def export_metrics(self, results, since):
+        """
+        Writes the LLM call and phase measurements of a run as a JSON report and a Prometheus
+        text file, and logs the per-method latency percentiles.
+        :param results: The results dictionary of the run.
+        :param since: Metrics marker taken when the run started.
+        """
+        if not self.config.get("metrics", True):
+            return
+        run_id = time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        if self.scope:
+            run_id += "-" + re.sub(r"[^\w.-]+", "_", self.scope)
+        try:
+            extra = {}
+            if self.llm.router is not None:
+                extra["routes"] = self.llm.router.summary()
+            if self.llm.budget is not None:
+                extra["token_budgets"] = self.llm.budget.summary()
+            json_path, prom_path = self.llm.metrics.export(self.metrics_dir(), run_id, since, self.scope,
+                                                           results=results, **extra)
+        except OSError as e:
+            self.logger.error(f"Failed to write the metrics report: {e}")
+            return
+        self.last_metrics_report = json_path
+        for tag, stats in self.llm.metrics.report(since, self.scope)["methods"].items():
+            latency = stats["latency"]
+            if latency["count"]:
+                self.logger.info(
+                    f"{tag}: {stats['calls']} call(s), p50 {latency['p50']:.3f}s, p95 {latency['p95']:.3f}s, "
+                    f"{stats['retries']} retries, {stats['cache_hits']} cache hits"
+                )
+        self.logger.info(f"Metrics written to {json_path} and {prom_path}")
+
+    def run_development_flow(self, resume=None, phases=None):
+        """
+        Runs the development flow, executing independent phases concurrently on a thread pool.
+        :param resume: If True, phases with a matching checkpoint are not run again (e.g. after a
+                       partial failure). Defaults to the "resume" setting.
+        :param phases: Optional names of the phases to run (plus their dependencies). Defaults
+                       to the "phases" setting, or every phase.
+        :return: Dictionary mapping each phase to "Success", "Failed" or "Skipped", plus a
+                 "timestamps" entry with the start and end time of every phase.
+        """
+        self.logger.info("Starting development flow...")
+        graph = self.build_phase_graph(self.config.get("resume", False) if resume is None else resume,
+                                       self.config.get("phases") if phases is None else phases)
+        since = self.llm.metrics.mark()
+        token = current_scope.set(self.scope)
         try:
-            plan = self.agents["planning"].formulate_plan()
-            self.logger.info(f"Generated Plan: {plan}")
-            results["planning"] = "Success"
-        except Exception as e:
-            self.logger.error(f"Planning phase failed: {e}")
-            results["planning"] = "Failed"
-
-        for phase in ["build", "test", "deployment", "documentation"]:
-            try:
-                method = "run_tests" if phase == "test" else "generate_documentation" if phase == "documentation" else f"run_{phase}"
-                success = getattr(self.agents[phase], method)()
-                results[phase] = "Success" if success else "Failed"
-            except Exception as e:
-                self.logger.error(f"{phase.capitalize()} phase failed: {e}")
-                results[phase] = "Failed"
+            run = graph.run(self.seed_values(), max_workers=self.config.get("max_parallel_phases", 4))
+            results = self.collect_results(graph, run)
+        finally:
+            current_scope.reset(token)
+        self.log_cache_stats()
+        self.export_metrics(results, since)
+        self.logger.info("Development flow completed.")
+        return results
 
+    async def arun_development_flow(self, resume=None, phases=None):
+        """
+        Awaitable variant of run_development_flow(); independent phases run concurrently
+        on the event loop through the shared gateway.
+        :param resume: If True, phases with a matching checkpoint are not run again.
+        :param phases: Optional names of the phases to run (plus their dependencies).
+        :return: Dictionary mapping each phase to "Success", "Failed" or "Skipped", plus a
+                 "timestamps" entry with the start and end time of every phase.
+        """
+        self.logger.info("Starting development flow...")
+        graph = self.build_phase_graph(self.config.get("resume", False) if resume is None else resume,
+                                       self.config.get("phases") if phases is None else phases)
+        since = self.llm.metrics.mark()
+        token = current_scope.set(self.scope)
+        try:
+            run = await graph.arun(self.seed_values())
+            results = self.collect_results(graph, run)
+        finally:
+            current_scope.reset(token)
+        self.log_cache_stats()
+        self.export_metrics(results, since)
         self.logger.info("Development flow completed.")
         return results
 
-    def get_code_structure_summary(self, base_dir="."):
-        tree_str = ""
-        for root, dirs, files in os.walk(base_dir):
-            level = root.replace(base_dir, "").count(os.sep)
-            indent = " " * (level * 4)
-            tree_str += f"{indent}{os.path.basename(root)}/\n"
-            sub_indent = " " * ((level + 1) * 4)
-            for f in files:
-                tree_str += f"{sub_indent}{f}\n"
-        return tree_str
+    def log_cache_stats(self):
+        """
+        Reports the LLM response cache hit and miss counters of this run.
+        """
+        stats = self.llm.cache_stats()
+        if stats is not None:
+            self.logger.info(
+                f"LLM cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})"
+            )
+
+    def tree_index(self, base_dir):
+        """
+        Returns the persistent TreeIndex of a directory, shared by every use within this manager.
+        """
+        key = os.path.abspath(base_dir)
+        index = self.tree_indexes.get(key)
+        if index is None:
+            index = self.tree_indexes[key] = TreeIndex(base_dir, state_dir=self.config.get("state_dir", ".devautomator"))
+        return index
+
+    def get_code_structure_summary(self, base_dir=".", max_depth=None, max_entries=None):
+        """
+        Summarizes the project tree from a persistent, .gitignore-aware index that only
+        re-lists directories changed since the previous call (in the process pool, if any).
+        :param base_dir: Project root directory.
+        :param max_depth: Optional maximum directory depth (defaults to the "tree_max_depth" setting).
+        :param max_entries: Optional maximum number of lines (defaults to the "tree_max_entries" setting).
+        :return: The tree as an indented string.
+        """
+        max_depth = self.config.get("tree_max_depth") if max_depth is None else max_depth
+        max_entries = self.config.get("tree_max_entries") if max_entries is None else max_entries
+        if self.executor is not None:
+            return self.executor.submit(tree_summary, base_dir, self.config.get("state_dir", ".devautomator"),
+                                        max_depth, max_entries).result()
+        return self.tree_index(base_dir).summary(max_depth=max_depth, max_entries=max_entries)
+
+
+def parse_phases(text):
+    return [name.strip() for name in text.split(",") if name.strip()] if text else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the DevAutomator development flow on a project")
+    parser.add_argument('--config', type=str, default=None, help="JSON file with the flow settings")
+    parser.add_argument('--api-key', type=str, default=None, help="OpenAI API key (overrides the config file)")
+    parser.add_argument('--project-dir', type=str, default=None, help="Project directory (overrides the config file)")
+    parser.add_argument('--phases', type=str, default=None,
+                        help="Comma-separated phases to run, e.g. test or documentation (their dependencies are added)")
+    parser.add_argument('--resume', action='store_true', help="Resume unchanged phases from their checkpoints")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="Run the phases on an event loop")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    if args.api_key:
+        config["openai_api_key"] = args.api_key
+    if args.project_dir:
+        config["project_dir"] = args.project_dir
+    manager = DevFlowManager(config)
+    resume = True if args.resume else None
+    try:
+        if args.use_async:
+            results = asyncio.run(manager.arun_development_flow(resume, parse_phases(args.phases)))
+        else:
+            results = manager.run_development_flow(resume, parse_phases(args.phases))
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        manager.llm.close()
+    print(json.dumps({name: status for name, status in results.items() if name != "timestamps"}, indent=2))
+    return 0 if all(status == "Success" for name, status in results.items() if name != "timestamps") else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -8,75 +8,222 @@ Research Topic: YOUR DEVELOPING IDEA
 This project simulates a collaboration between two agents (Alpha and Beta) that:
 • Generate innovative ideas related to the research topic.
 • Evaluate each other’s ideas.
-• Refine the collaborative output over multiple iterations (5 rounds).
-• Ultimately produce the final project code.
+• Refine the collaborative output over multiple iterations (up to 5 rounds, fewer once the ideas converge).
+• Ultimately produce the final project code from the converged ideas.
 
 Usage:
     python3 main.py --api-key "YOUR_OPENAI_API_KEY" --model "gpt-3.5-turbo" --research-topic "YOUR DEVELOPING IDEA"
 """
 
+import os
+import pprint
 import argparse
-from openai import OpenAI
+import asyncio
+from utils.llm_gateway import LLMGateway, DEFAULT_MAX_CONNECTIONS
+from utils.rate_limiter import get_rate_limiter
+from utils.model_router import ModelRouter
+from utils.logger import setup_logger
+
+AGENT_NAMES = ["Alpha", "Beta", "Gamma", "Delta", "Epsilon", "Zeta", "Eta", "Theta"]
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REUSE_THRESHOLD = 0.85  # estimated Jaccard similarity above which an evaluation is reused as is
+DEFAULT_DELTA_THRESHOLD = 0.6  # ... above which only the differences to the earlier idea are evaluated
+DEFAULT_CONVERGENCE_THRESHOLD = 0.9  # similarity of consecutive rounds' ideas from which the loop stops
+
+def agent_name(index):
+    return AGENT_NAMES[index] if index < len(AGENT_NAMES) else f"Agent-{index + 1}"
+
+async def gather_bounded(semaphore, coros):
+    """
+    Runs the coroutines concurrently, never more than the semaphore allows at once,
+    and returns their results in order.
+    """
+    return await asyncio.gather(*(bounded(semaphore, coro) for coro in coros))
+
+async def bounded(semaphore, coro):
+    async with semaphore:
+        return await coro
 
 class Agent:
-    def __init__(self, name, client, model, research_topic):
+    def __init__(self, name, llm, model, research_topic):
         self.name = name
-        self.client = client
+        self.llm = llm
         self.model = model
         self.research_topic = research_topic
 
-    def generate_idea(self, iteration):
-        prompt = (
+    def idea_prompt(self, iteration):
+        return (
             f"Iteration {iteration}: As Agent {self.name}, propose an innovative idea "
             f"related to the research topic: '{self.research_topic}'."
         )
-        response = self.call_openai_api(prompt)
-        return response.strip()
 
-    def evaluate_idea(self, idea, iteration):
-        prompt = (
+    def evaluation_prompt(self, idea, iteration):
+        return (
             f"Iteration {iteration}: As Agent {self.name}, critically evaluate the idea: '{idea}'. "
             "Suggest improvements if necessary."
         )
-        response = self.call_openai_api(prompt)
+
+    def delta_evaluation_prompt(self, previous_idea, previous_evaluation, idea, iteration):
+        return (
+            f"Iteration {iteration}: As Agent {self.name}, you evaluated this idea before: '{previous_idea}'. "
+            f"Your evaluation was: '{previous_evaluation}'. A very similar idea was proposed: '{idea}'. "
+            "Briefly state only what changes in your evaluation because of the differences."
+        )
+
+    def generate_idea(self, iteration):
+        response = self.call_openai_api(self.idea_prompt(iteration))
         return response.strip()
 
-    def call_openai_api(self, prompt):
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+    async def agenerate_idea(self, iteration):
+        response = await self.acall_openai_api(self.idea_prompt(iteration))
+        return response.strip()
+
+    def evaluate_idea(self, idea, iteration):
+        response = self.call_openai_api(self.evaluation_prompt(idea, iteration))
+        return response.strip()
+
+    async def aevaluate_idea(self, idea, iteration):
+        response = await self.acall_openai_api(self.evaluation_prompt(idea, iteration))
+        return response.strip()
+
+    async def aevaluate_delta(self, previous_idea, previous_evaluation, idea, iteration):
+        prompt = self.delta_evaluation_prompt(previous_idea, previous_evaluation, idea, iteration)
+        response = await self.llm.acomplete(**self.request(prompt, max_tokens=120, tag="Agent.evaluate_delta"))
+        return response.strip()
+
+    def request(self, prompt, max_tokens=300, tag="Agent.call_openai_api"):
+        return {
+            "model": self.model,
+            "messages": [
                 {"role": "system", "content": f"You are Agent {self.name}."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=300,
-            n=1,
-            stop=None,
-            temperature=0.7,
-        )
-        return response.choices[0].message.content.strip()
-
-def simulate_agents(api_key, model, research_topic, iterations=5):
-    client = OpenAI(api_key=api_key)
-    agents = [
-        Agent("Alpha", client, model, research_topic),
-        Agent("Beta", client, model, research_topic)
-    ]
-
-    for i in range(1, iterations + 1):
-        ideas = [agent.generate_idea(i) for agent in agents]
-        for agent in agents:
-            for idea in ideas:
-                agent.evaluate_idea(idea, i)
-
-    final_project_code = f'''#!/usr/bin/env python3
+            "max_tokens": max_tokens,
+            "n": 1,
+            "stop": None,
+            "temperature": 0.7,
+            "tag": tag,
+        }
+
+    def call_openai_api(self, prompt):
+        return self.llm.complete(**self.request(prompt))
+
+    async def acall_openai_api(self, prompt):
+        return await self.llm.acomplete(**self.request(prompt))
+
+class EvaluationMemo:
+    """
+    Evaluations made so far, indexed by the idea they evaluate in a MinHash/LSH index. An
+    agent asked to evaluate a near-duplicate of an idea it already evaluated reuses that
+    evaluation, or only evaluates the differences when the ideas are merely similar.
+    """
+
+    def __init__(self, reuse_threshold=DEFAULT_REUSE_THRESHOLD, delta_threshold=DEFAULT_DELTA_THRESHOLD):
+        """
+        :param reuse_threshold: Similarity from which a stored evaluation is reused as is.
+        :param delta_threshold: Similarity from which a short delta evaluation replaces a full one.
+        """
+        self.reuse_threshold = reuse_threshold
+        self.delta_threshold = delta_threshold
+        from utils.similarity_index import MinHashIndex  # numpy is only loaded by simulations
+        self.index = MinHashIndex(threshold=min(reuse_threshold, delta_threshold))
+        self.counts = {"full": 0, "reused": 0, "delta": 0}
+
+    def lookup(self, idea):
+        """
+        Finds the stored idea most similar to `idea`, indexing `idea` if none is similar enough.
+        :return: Tuple of (entry payload, similarity).
+        """
+        signature = self.index.signature(idea)
+        entry, similarity = self.index.query(idea, signature)
+        if entry is None:
+            entry = self.index.add(idea, {"idea": idea, "evaluations": {}}, signature)
+            similarity = 1.0
+        return self.index.payloads[entry], similarity
+
+    def evaluate(self, agent, idea, iteration, semaphore):
+        """
+        Schedules the evaluation of an idea by an agent. The lookup happens immediately, so
+        near-duplicates proposed in the same round share one evaluation.
+        :return: An awaitable of the evaluation text.
+        """
+        entry, similarity = self.lookup(idea)
+        previous = entry["evaluations"].get(agent.name)
+        if previous is None:
+            self.counts["full"] += 1
+            task = asyncio.ensure_future(bounded(semaphore, agent.aevaluate_idea(idea, iteration)))
+            entry["evaluations"][agent.name] = task
+            return task
+        if similarity >= self.reuse_threshold:
+            self.counts["reused"] += 1
+            return previous
+        self.counts["delta"] += 1
+        return self.evaluate_delta(agent, entry["idea"], previous, idea, iteration, semaphore)
+
+    async def evaluate_delta(self, agent, previous_idea, previous, idea, iteration, semaphore):
+        previous_evaluation = await previous
+        return await bounded(semaphore, agent.aevaluate_delta(previous_idea, previous_evaluation, idea, iteration))
+
+class RoundRecord:
+    """
+    Outputs of one collaboration round: the idea of every agent, the evaluations of each idea
+    (one per agent, in agent order), the MinHash signatures of the ideas and the convergence
+    score against the previous round.
+    """
+
+    __slots__ = ("iteration", "ideas", "evaluations", "signatures", "convergence")
+
+    def __init__(self, iteration, ideas, evaluations, signatures, convergence=None):
+        self.iteration = iteration
+        self.ideas = tuple(ideas)
+        self.evaluations = tuple(tuple(texts) for texts in evaluations)
+        self.signatures = signatures
+        self.convergence = convergence
+
+    def converged_ideas(self, threshold=DEFAULT_REUSE_THRESHOLD):
+        """
+        Returns the distinct ideas of the round with their evaluations; an idea whose
+        similarity to an earlier one reaches `threshold` is left out.
+        :return: List of {"agent", "idea", "evaluations"} dictionaries.
+        """
+        from utils.similarity_index import signature_similarity
+        kept = []
+        for index, idea in enumerate(self.ideas):
+            if any(signature_similarity(self.signatures[index], self.signatures[other]) >= threshold for other in kept):
+                continue
+            kept.append(index)
+        return [{"agent": agent_name(index), "idea": self.ideas[index], "evaluations": list(self.evaluations[index])}
+                for index in kept]
+
+def convergence_score(previous, signatures):
+    """
+    Mean estimated similarity between every agent's idea and its idea of the previous round.
+    :param previous: RoundRecord of the previous round, or None.
+    :param signatures: Signatures of this round's ideas, in agent order.
+    :return: The score between 0 and 1, or None for the first round.
+    """
+    if previous is None:
+        return None
+    from utils.similarity_index import signature_similarity
+    return signature_similarity(previous.signatures, signatures)
+
+def render_project_code(research_topic, ideas):
+    """
+    Renders the final project code around the converged ideas.
+    """
+    return f'''#!/usr/bin/env python3
 """
 Final Project Code generated via Agent Collaboration
 
 Research Topic: {research_topic}
 """
 
+IDEAS = {pprint.pformat(ideas, width=100, sort_dicts=False)}
+
 def final_feature():
     print("This is the final project feature based on the research topic: {research_topic}")
+    for entry in IDEAS:
+        print(f"- {{entry['idea']}} (proposed by {{entry['agent']}})")
 
 def main():
     final_feature()
@@ -84,16 +231,128 @@ def main():
 if __name__ == '__main__':
     main()
 '''
-    return final_project_code
+
+async def asimulate_agents(api_key, model, research_topic, iterations=5, num_agents=2, concurrency=DEFAULT_CONCURRENCY,
+                           base_url=None, metrics=None, router=None, reuse_threshold=DEFAULT_REUSE_THRESHOLD,
+                           delta_threshold=DEFAULT_DELTA_THRESHOLD, convergence_threshold=DEFAULT_CONVERGENCE_THRESHOLD,
+                           transcript=None):
+    """
+    Runs the collaboration loop. Within each iteration every agent generates its idea
+    concurrently, then every (agent, idea) evaluation runs concurrently, with at most
+    `concurrency` requests in flight. Evaluations of ideas that nearly duplicate an earlier
+    one are reused or replaced by a short delta evaluation (see EvaluationMemo). The loop
+    stops before `iterations` once the ideas of two consecutive rounds are similar enough,
+    and the final code is built from the ideas of the last round.
+    :param base_url: Optional base URL of an OpenAI-compatible endpoint.
+    :param metrics: Optional MetricsRecorder receiving a record of every call.
+    :param router: Optional ModelRouter trying cheaper models before `model`.
+    :param reuse_threshold: Similarity from which an evaluation is reused (above 1 disables reuse).
+    :param delta_threshold: Similarity from which a delta evaluation is used (above 1 disables deltas).
+    :param convergence_threshold: Convergence score from which the loop stops (above 1 disables early stopping).
+    :param transcript: Optional list receiving the RoundRecord of every round.
+    :return: The final project code.
+    """
+    import numpy as np
+    from utils.similarity_index import MinHashIndex
+
+    if num_agents < 1:
+        raise ValueError("At least one agent is needed")
+    llm = LLMGateway(
+        api_key=api_key,
+        base_url=base_url,
+        max_connections=max(concurrency, DEFAULT_MAX_CONNECTIONS),
+        rate_limiter=get_rate_limiter(api_key, base_url),
+        metrics=metrics,
+        router=router,
+    )
+    agents = [Agent(agent_name(i), llm, model, research_topic) for i in range(num_agents)]
+    semaphore = asyncio.Semaphore(concurrency)
+    memo = EvaluationMemo(reuse_threshold, delta_threshold) if min(reuse_threshold, delta_threshold) <= 1 else None
+    signer = memo.index if memo is not None else MinHashIndex()
+    logger = setup_logger(__name__)
+    rounds = transcript if transcript is not None else []
+    last = None
+
+    try:
+        for i in range(1, iterations + 1):
+            ideas = await gather_bounded(semaphore, [agent.agenerate_idea(i) for agent in agents])
+            if memo is None:
+                evaluations = await gather_bounded(
+                    semaphore,
+                    [agent.aevaluate_idea(idea, i) for agent in agents for idea in ideas]
+                )
+            else:
+                evaluations = await asyncio.gather(
+                    *(memo.evaluate(agent, idea, i, semaphore) for agent in agents for idea in ideas)
+                )
+            # Evaluations come agent by agent; regroup them idea by idea.
+            per_idea = [evaluations[index::len(ideas)] for index in range(len(ideas))]
+            signatures = np.stack([signer.signature(idea) for idea in ideas])
+            last = RoundRecord(i, ideas, per_idea, signatures, convergence_score(last, signatures))
+            rounds.append(last)
+            if last.convergence is not None and last.convergence >= convergence_threshold:
+                logger.info(f"Ideas converged after {i} of {iterations} rounds (score {last.convergence:.2f})")
+                break
+    finally:
+        await llm.aclose()
+        llm.close()
+    if memo is not None:
+        counts = memo.counts
+        logger.info(f"Evaluations: {counts['full']} full, {counts['reused']} reused, {counts['delta']} delta")
+
+    ideas = last.converged_ideas(min(reuse_threshold, 1.0)) if last is not None else []
+    return render_project_code(research_topic, ideas)
+
+def simulate_agents(api_key, model, research_topic, iterations=5, num_agents=2, concurrency=DEFAULT_CONCURRENCY,
+                    base_url=None, metrics=None, router=None, reuse_threshold=DEFAULT_REUSE_THRESHOLD,
+                    delta_threshold=DEFAULT_DELTA_THRESHOLD, convergence_threshold=DEFAULT_CONVERGENCE_THRESHOLD,
+                    transcript=None):
+    return asyncio.run(asimulate_agents(api_key, model, research_topic, iterations, num_agents, concurrency,
+                                        base_url, metrics, router, reuse_threshold, delta_threshold,
+                                        convergence_threshold, transcript))
+
+def model_router(models, stats_path=os.path.join(".devautomator", "model_routes.json")):
+    """
+    Builds the router of an escalation chain given on the command line (e.g. "gpt-4o-mini,gpt-4o").
+    :return: Tuple of (final model, ModelRouter or None for a single model).
+    """
+    if len(models) == 1:
+        return models[0], None
+    route = {"models": models[:-1], "validators": ["nonempty"]}
+    return models[-1], ModelRouter({"Agent": route}, stats_path=stats_path)
 
 def main():
     parser = argparse.ArgumentParser(description="Agent Collaboration Code Generator")
     parser.add_argument('--api-key', type=str, required=True, help="Your OpenAI API key")
-    parser.add_argument('--model', type=str, required=True, choices=['gpt-3.5-turbo', 'gpt-4o'], help="OpenAI model to use")
+    parser.add_argument('--model', type=str, required=True,
+                        help="OpenAI model to use, or a comma-separated chain tried in order (e.g. gpt-4o-mini,gpt-4o); "
+                             "a later model is only asked when the previous one's answer is empty or truncated")
     parser.add_argument('--research-topic', type=str, required=True, help="Research topic or developing idea")
+    parser.add_argument('--agents', type=int, default=2, help="Number of collaborating agents")
+    parser.add_argument('--iterations', type=int, default=5, help="Number of collaboration rounds")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of API requests in flight")
+    parser.add_argument('--base-url', type=str, default=None, help="Base URL of an OpenAI-compatible endpoint")
+    parser.add_argument('--reuse-threshold', type=float, default=DEFAULT_REUSE_THRESHOLD,
+                        help="Similarity (0-1) from which an earlier evaluation of a near-duplicate idea is reused")
+    parser.add_argument('--delta-threshold', type=float, default=DEFAULT_DELTA_THRESHOLD,
+                        help="Similarity (0-1) from which only the differences to an earlier idea are evaluated")
+    parser.add_argument('--convergence-threshold', type=float, default=DEFAULT_CONVERGENCE_THRESHOLD,
+                        help="Similarity (0-1) of two consecutive rounds' ideas from which the remaining rounds are skipped")
     args = parser.parse_args()
+    models = [name.strip() for name in args.model.split(",") if name.strip()]
+    if not models:
+        parser.error("--model needs at least one model name")
+    if args.agents < 1:
+        parser.error("--agents must be at least 1")
+    model, router = model_router(models)
 
-    project_code = simulate_agents(args.api_key, args.model, args.research_topic)
+    project_code = simulate_agents(
+        args.api_key, model, args.research_topic,
+        iterations=args.iterations, num_agents=args.agents, concurrency=args.concurrency,
+        base_url=args.base_url, router=router,
+        reuse_threshold=args.reuse_threshold, delta_threshold=args.delta_threshold,
+        convergence_threshold=args.convergence_threshold
+    )
     print(project_code)
 
 if __name__ == '__main__':
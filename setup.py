@@ -6,6 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "openai>=1.65.1",
+        "numpy>=1.24",
         "pytest>=7.0.0"
     ],
     entry_points={
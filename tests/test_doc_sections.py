@@ -0,0 +1,42 @@
+from utils.doc_sections import (MODULES_HEADING, OVERVIEW_KEY, existing_sections, parse_sections, render_section,
+                                splice_sections)
+
+MODULE_A = "module:pkg/a.py"
+MODULE_B = "module:pkg/b.py"
+
+
+def test_new_document_gets_overview_then_module_reference():
+    text = splice_sections("", {OVERVIEW_KEY: "Overview", MODULE_A: "A docs"}, [OVERVIEW_KEY, MODULE_A])
+    assert text.index(render_section(OVERVIEW_KEY, "Overview")) < text.index(MODULES_HEADING)
+    assert text.index(MODULES_HEADING) < text.index(render_section(MODULE_A, "A docs"))
+    assert existing_sections(text) == {OVERVIEW_KEY, MODULE_A}
+
+
+def test_changed_section_is_replaced_in_place_and_free_text_kept():
+    original = ("# Title\n\nHand-written intro.\n\n" + render_section(OVERVIEW_KEY, "Old overview")
+                + "\nBetween sections.\n\n" + render_section(MODULE_A, "Old A") + "\nFooter.\n")
+    text = splice_sections(original, {MODULE_A: "New A"}, [OVERVIEW_KEY, MODULE_A])
+    assert text == original.replace("Old A", "New A")
+
+
+def test_unchanged_document_is_returned_as_is():
+    original = "Intro\n\n" + render_section(OVERVIEW_KEY, "Overview") + render_section(MODULE_A, "A")
+    assert splice_sections(original, {}, [OVERVIEW_KEY, MODULE_A]) == original
+
+
+def test_new_module_goes_after_the_last_existing_one():
+    original = render_section(OVERVIEW_KEY, "Overview") + render_section(MODULE_A, "A") + "\nFooter.\n"
+    text = splice_sections(original, {MODULE_B: "B"}, [OVERVIEW_KEY, MODULE_A, MODULE_B])
+    assert text.index(render_section(MODULE_A, "A")) < text.index(render_section(MODULE_B, "B"))
+    assert text.index(render_section(MODULE_B, "B")) < text.index("Footer.")
+
+
+def test_sections_no_longer_wanted_are_dropped():
+    original = render_section(MODULE_A, "A") + render_section(MODULE_B, "B")
+    text = splice_sections(original, {}, [MODULE_B])
+    assert existing_sections(text) == {MODULE_B}
+
+
+def test_section_without_end_marker_stays_free_text():
+    text = "<!-- devautomator:section overview -->\nunterminated\n"
+    assert parse_sections(text) == [("text", text)]
@@ -0,0 +1,68 @@
+import pytest
+
+from utils.model_router import (DEFAULT_CHEAP_MODEL, ModelRouter, Route, check_json, check_nonempty, check_python,
+                                strip_code_fences)
+
+
+def test_nonempty_validator():
+    assert check_nonempty("text") is None
+    assert check_nonempty("  \n") == "empty"
+
+
+def test_json_validator():
+    assert check_json('{"tasks": []}') is None
+    assert check_json('{"tasks": [') == "invalid_json"
+
+
+def test_python_validator_reads_fenced_code():
+    assert check_python("print('ok')") is None
+    assert check_python("Here you go:\n```python\nprint('ok')\n```\nEnjoy.") is None
+    assert check_python("```python\ndef broken(:\n```") == "syntax_error"
+
+
+def test_strip_code_fences():
+    assert strip_code_fences("plain") == "plain"
+    assert strip_code_fences("```py\na = 1\n```\ntext\n```\nb = 2\n```") == "a = 1\n\nb = 2\n"
+    assert strip_code_fences("```python\nunterminated = True\n") == "unterminated = True\n"
+
+
+def test_route_rejects_truncated_output_unless_disabled():
+    assert Route(validators=["nonempty"]).check("text", "length") == "truncated"
+    assert Route(validators=["nonempty"], escalate_on_truncation=False).check("text", "length") is None
+    assert Route(validators=["nonempty", "json"]).check("[1]", "stop") is None
+    assert Route(validators=["nonempty", "json"]).check("", "stop") == "empty"
+
+
+def test_route_spec_and_chain():
+    assert Route.from_spec(["cheap"]).chain("big") == ["cheap", "big"]
+    assert Route.from_spec({"models": ["big", "cheap"]}).chain("big") == ["cheap", "big"]
+    with pytest.raises(ValueError):
+        Route(validators=["unknown"])
+
+
+def test_routes_fall_back_to_agent_then_wildcard():
+    router = ModelRouter({"Agent.method": ["a"], "Agent": ["b"], "*": ["c"]})
+    assert router.route("Agent.method").models == ["a"]
+    assert router.route("Agent.other").models == ["b"]
+    assert router.route("Other.method").models == ["c"]
+    assert ModelRouter({}).route("Agent.method") is None
+
+
+def test_rarely_accepted_model_is_skipped_after_enough_samples():
+    router = ModelRouter({"A.m": ["cheap"]}, min_acceptance=0.5, min_samples=4)
+    for _ in range(3):
+        router.record("A.m", "cheap", "empty")
+    assert router.candidates("A.m", "big") == ["cheap", "big"]
+    router.record("A.m", "cheap", "empty")
+    assert router.acceptance("A.m", "cheap") == (4, 0.0)
+    assert router.candidates("A.m", "big") == ["big"]
+
+
+def test_default_cheap_model_only_on_the_openai_api():
+    tag = "TestAgent.get_test_suggestions"
+    assert ModelRouter.from_config({}).route(tag).models == [DEFAULT_CHEAP_MODEL]
+    assert ModelRouter.from_config({"openai_base_url": "http://localhost:8000/v1"}).route(tag).models == []
+    configured = ModelRouter.from_config({"openai_base_url": "http://localhost:8000/v1", "model_cheap": "small"})
+    assert configured.route(tag).models == ["small"]
+    assert ModelRouter.from_config({"model_routing": False}) is None
+    assert ModelRouter.from_config({"model_routes": {tag: None}}).route(tag) is None
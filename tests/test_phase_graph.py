@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.checkpoints import CheckpointStore
+from utils.phase_graph import Phase, PhaseGraph
+
+
+def recording_graph(log, checkpoints=None, resume=False, fail=()):
+    """
+    plan -> build -> test, plus docs depending on plan only.
+    """
+    lock = threading.Lock()
+
+    def phase(name, inputs, output):
+        def run(values):
+            with lock:
+                log.append(name)
+            if name in fail:
+                raise RuntimeError(f"{name} broke")
+            return {output: f"{name}({','.join(str(values[key]) for key in inputs)})"}
+        return Phase(name, run, inputs=inputs, outputs=(output,))
+
+    return PhaseGraph([
+        phase("test", ("build_script",), "tests_passed"),
+        phase("docs", ("plan",), "documentation"),
+        phase("build", ("plan",), "build_script"),
+        phase("plan", ("topic",), "plan"),
+    ], checkpoints=checkpoints, resume=resume)
+
+
+def test_phases_run_after_their_dependencies():
+    log = []
+    run = recording_graph(log).run({"topic": "t"})
+    assert log.index("plan") < log.index("build") < log.index("test")
+    assert log.index("plan") < log.index("docs")
+    assert run.values["tests_passed"] == "test(build(plan(t)))"
+    assert set(run.statuses.values()) == {"Success"}
+
+
+def test_async_run_respects_the_same_order():
+    log = []
+    run = asyncio.run(recording_graph(log).arun({"topic": "t"}))
+    assert log.index("plan") < log.index("build") < log.index("test")
+    assert run.values["documentation"] == "docs(plan(t))"
+
+
+def test_failed_phase_skips_its_dependents_only():
+    log = []
+    run = recording_graph(log, fail=("build",)).run({"topic": "t"})
+    assert run.statuses == {"plan": "Success", "build": "Failed", "test": "Skipped", "docs": "Success"}
+    assert "test" not in log
+
+
+def test_select_adds_dependencies():
+    graph = recording_graph([]).select(["test"])
+    assert set(graph.phases) == {"plan", "build", "test"}
+    with pytest.raises(ValueError):
+        recording_graph([]).select(["missing"])
+
+
+def test_cycles_and_duplicate_outputs_are_rejected():
+    with pytest.raises(ValueError):
+        PhaseGraph([Phase("a", dict, inputs=("y",), outputs=("x",)), Phase("b", dict, inputs=("x",), outputs=("y",))])
+    with pytest.raises(ValueError):
+        PhaseGraph([Phase("a", dict, outputs=("x",)), Phase("b", dict, outputs=("x",))])
+
+
+def test_resume_reuses_checkpoints_of_unchanged_phases(tmp_path):
+    store = CheckpointStore(str(tmp_path), config={"model": "m"})
+    first = []
+    recording_graph(first, checkpoints=store).run({"topic": "t"})
+    assert sorted(first) == ["build", "docs", "plan", "test"]
+
+    second = []
+    run = recording_graph(second, checkpoints=store, resume=True).run({"topic": "t"})
+    assert second == []
+    assert sorted(run.resumed) == ["build", "docs", "plan", "test"]
+    assert run.values["tests_passed"] == "test(build(plan(t)))"
+
+    changed = []
+    run = recording_graph(changed, checkpoints=store, resume=True).run({"topic": "other"})
+    assert sorted(changed) == ["build", "docs", "plan", "test"]
+    assert run.resumed == []
+
+
+def test_failed_phase_is_not_checkpointed(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    recording_graph([], checkpoints=store, fail=("build",)).run({"topic": "t"})
+    log = []
+    run = recording_graph(log, checkpoints=store, resume=True).run({"topic": "t"})
+    assert sorted(run.resumed) == ["docs", "plan"]
+    assert sorted(log) == ["build", "test"]
+
+
+def test_volatile_settings_do_not_change_checkpoint_keys(tmp_path):
+    phase = Phase("plan", dict, inputs=("topic",), outputs=("plan",))
+    quiet = CheckpointStore(str(tmp_path), config={"model": "m", "log_level": "INFO", "llm_cache": True})
+    verbose = CheckpointStore(str(tmp_path), config={"model": "m", "log_level": "DEBUG", "llm_cache": False})
+    other = CheckpointStore(str(tmp_path), config={"model": "n"})
+    assert quiet.key(phase, {"topic": "t"}) == verbose.key(phase, {"topic": "t"})
+    assert quiet.key(phase, {"topic": "t"}) != other.key(phase, {"topic": "t"})
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from utils.response_cache import ResponseCache, make_cache_key
+
+MESSAGES = [{"role": "user", "content": "Plan the build"}]
+
+
+@pytest.fixture
+def cache_factory(tmp_path):
+    caches = []
+
+    def factory(**kwargs):
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield factory
+    for cache in caches:
+        cache.close()
+
+
+def test_cache_key_is_stable_and_covers_every_parameter():
+    key = make_cache_key("gpt-4o", MESSAGES, 100, 0.2)
+    assert key == make_cache_key("gpt-4o", [dict(reversed(list(MESSAGES[0].items())))], 100, 0.2)
+    assert len({
+        key,
+        make_cache_key("gpt-4o-mini", MESSAGES, 100, 0.2),
+        make_cache_key("gpt-4o", MESSAGES + [{"role": "user", "content": "again"}], 100, 0.2),
+        make_cache_key("gpt-4o", MESSAGES, 200, 0.2),
+        make_cache_key("gpt-4o", MESSAGES, 100, None),
+    }) == 5
+
+
+def test_get_and_set_count_hits_and_misses(cache_factory):
+    cache = cache_factory()
+    assert cache.get("k") is None
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_least_recently_used_entry_is_evicted(cache_factory):
+    cache = cache_factory(max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    assert cache.get("a") == "1"  # "b" is now the least recently used entry
+    time.sleep(0.01)
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_byte_limit_evicts_oldest_entries(cache_factory):
+    cache = cache_factory(max_bytes=10)
+    cache.set("a", "12345")
+    time.sleep(0.01)
+    cache.set("b", "67890")
+    time.sleep(0.01)
+    cache.set("c", "x")
+    assert cache.get("a") is None
+    assert cache.get("b") == "67890"
+
+
+def test_expired_entries_are_misses(cache_factory):
+    cache = cache_factory()
+    cache.set("k", "value", ttl=-1)
+    assert cache.get("k") is None
+
+
+def test_memory_front_is_bounded_and_backed_by_the_database(cache_factory):
+    cache = cache_factory(memory_entries=2)
+    for key in "abc":
+        cache.set(key, key.upper())
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "A"
+    assert list(cache._memory) == ["c", "a"]
+
+
+def test_entries_persist_across_instances(cache_factory):
+    cache_factory().set("k", "value")
+    assert cache_factory().get("k") == "value"
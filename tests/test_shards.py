@@ -0,0 +1,46 @@
+from utils.test_sharding import COLLECTION_ERROR, lpt_shards, parse_durations
+
+
+def loads(shards, durations):
+    return sorted(sum(durations[test_id] for test_id in shard) for shard in shards)
+
+
+def test_every_test_lands_in_exactly_one_shard():
+    test_ids = [f"t{i}" for i in range(10)]
+    shards = lpt_shards(test_ids, {}, 3)
+    assert sorted(test_id for shard in shards for test_id in shard) == sorted(test_ids)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+
+
+def test_longest_tests_are_spread_first():
+    durations = {"a": 8.0, "b": 7.0, "c": 6.0, "d": 5.0, "e": 4.0}
+    shards = lpt_shards(list(durations), durations, 2)
+    assert sorted(shards) == [["a", "d", "e"], ["b", "c"]]  # the greedy split, within 4/3 of the optimum
+    assert loads(shards, durations) == [13.0, 17.0]
+
+
+def test_unknown_tests_take_the_median_known_duration():
+    durations = {"slow": 10.0, "fast": 1.0, "mid": 2.0}
+    shards = lpt_shards(["slow", "fast", "mid", "new"], durations, 2)
+    assert ["slow"] in shards
+
+
+def test_no_empty_shards_and_at_least_one_worker():
+    assert lpt_shards(["only"], {}, 4) == [["only"]]
+    assert lpt_shards(["a", "b"], {}, 0) == [["a", "b"]]
+    assert lpt_shards([], {}, 2) == []
+
+
+def test_parse_durations_sums_phases_per_test():
+    output = ("0.50s call     tests/test_a.py::test_x\n"
+              "0.25s setup    tests/test_a.py::test_x\n"
+              "1.00s call     tests/test_b.py::test_y\n"
+              "not a duration line\n")
+    assert parse_durations(output) == {"tests/test_a.py::test_x": 0.75, "tests/test_b.py::test_y": 1.0}
+
+
+def test_collection_errors_are_recognised():
+    assert COLLECTION_ERROR.match("ERROR tests/test_bad.py")
+    assert COLLECTION_ERROR.match("==================================== ERRORS ====================================")
+    assert COLLECTION_ERROR.match("!!!!!!!!!!!!!!!!!!!! Interrupted: 1 error during collection !!!!!!!!!!!!!!!!!!!!")
+    assert not COLLECTION_ERROR.match("tests/test_errors.py::test_error_handling")
@@ -0,0 +1,68 @@
+from utils.tree_index import GitIgnoreRules, TreeIndex, translate_gitignore_pattern
+
+
+def matches(pattern, path):
+    return translate_gitignore_pattern(pattern).match(path) is not None
+
+
+def test_unanchored_pattern_matches_at_any_depth():
+    assert matches("*.pyc", "module.pyc")
+    assert matches("*.pyc", "pkg/sub/module.pyc")
+    assert not matches("*.pyc", "module.pyc.bak")
+
+
+def test_star_and_question_mark_stop_at_slashes():
+    assert not matches("docs/*.md", "docs/api/index.md")
+    assert matches("docs/*.md", "docs/index.md")
+    assert matches("file?.txt", "file1.txt")
+    assert not matches("file?.txt", "file/.txt")
+
+
+def test_slash_anchors_pattern_to_the_gitignore_directory():
+    assert matches("/build", "build")
+    assert not matches("/build", "src/build")
+    assert matches("build", "src/build")
+
+
+def test_double_star_patterns():
+    assert matches("**/cache", "cache")
+    assert matches("**/cache", "a/b/cache")
+    assert matches("logs/**", "logs/2024/app.log")
+    assert not matches("logs/**", "logs")
+    assert matches("a/**/b", "a/b")
+    assert matches("a/**/b", "a/x/y/b")
+
+
+def test_character_classes_and_escapes():
+    assert matches("[abc].txt", "b.txt")
+    assert not matches("[!abc].txt", "b.txt")
+    assert matches("[!abc].txt", "d.txt")
+    assert matches("\\*.txt", "*.txt")
+    assert not matches("\\*.txt", "a.txt")
+    assert matches("[unclosed", "[unclosed")
+
+
+def test_rules_last_match_wins_and_directory_only():
+    rules = GitIgnoreRules().extended("", "*.log\n!keep.log\nbuild/\n# comment\n")
+    assert rules.ignored("app.log", is_dir=False)
+    assert not rules.ignored("keep.log", is_dir=False)
+    assert rules.ignored("build", is_dir=True)
+    assert not rules.ignored("build", is_dir=False)
+
+
+def test_nested_gitignore_applies_below_its_directory():
+    rules = GitIgnoreRules().extended("pkg", "/generated\n")
+    assert rules.ignored("pkg/generated", is_dir=True)
+    assert not rules.ignored("generated", is_dir=True)
+    assert not rules.ignored("pkg/sub/generated", is_dir=True)
+
+
+def test_configured_state_dir_is_skipped(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "mod.py").write_text("x = 1\n")
+    index = TreeIndex(str(tmp_path), state_dir="build/state")
+    before = index.fingerprint()
+    (tmp_path / "build" / "state").mkdir(parents=True, exist_ok=True)
+    (tmp_path / "build" / "state" / "checkpoints.json").write_text("{}")
+    assert index.fingerprint() == before
+    assert "build/state" not in index.refresh()
@@ -0,0 +1,58 @@
+import importlib
+import threading
+from collections.abc import Mapping
+
+# Agent name -> (module, class). Modules are only imported when the agent is first used.
+AGENT_CLASSES = {
+    "planning": ("agents.planning_agent", "PlanningAgent"),
+    "build": ("agents.build_agent", "BuildAgent"),
+    "test": ("agents.test_agent", "TestAgent"),
+    "deployment": ("agents.deployment_agent", "DeploymentAgent"),
+    "documentation": ("agents.documentation_agent", "DocumentationAgent"),
+}
+
+
+class AgentRegistry(Mapping):
+    """
+    Read-only mapping of agent names to agents that imports and constructs each agent the
+    first time it is looked up, so a run that only needs some phases never pays for the others.
+    """
+
+    def __init__(self, config, gateway, options=None, classes=AGENT_CLASSES):
+        """
+        :param config: Configuration dictionary passed to every agent.
+        :param gateway: LLMGateway shared by every agent.
+        :param options: Optional dict mapping an agent name to extra constructor keyword arguments.
+        :param classes: Dict mapping agent names to (module, class) pairs.
+        """
+        self.config = config
+        self.gateway = gateway
+        self.options = options or {}
+        self.classes = classes
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self.classes:
+            raise KeyError(name)
+        with self._lock:  # phases running concurrently may ask for the same agent
+            if name not in self._agents:
+                module, cls = self.classes[name]
+                agent_class = getattr(importlib.import_module(module), cls)
+                self._agents[name] = agent_class(self.config, self.gateway, **self.options.get(name, {}))
+            return self._agents[name]
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def built(self):
+        """
+        Returns the names of the agents constructed so far.
+        """
+        return [name for name in self.classes if name in self._agents]
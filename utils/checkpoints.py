@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import hashlib
+from utils.helper_functions import atomic_write
+
+# Settings that never change what a phase produces (credentials, the endpoint, logging,
+# transport tuning, parallelism), so they are left out of the checkpoint keys.
+VOLATILE_PREFIXES = ("openai_api_key", "openai_base_url", "log_", "metrics", "checkpoint", "resume",
+                     "max_parallel_phases", "llm_", "project_name", "phases")
+
+
+def config_fingerprint(config):
+    """
+    Returns the part of a configuration that can influence phase outputs.
+    """
+    return {key: value for key, value in config.items() if not key.startswith(VOLATILE_PREFIXES)}
+
+
+def digest(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Persists the outputs of successful phases under `<directory>/<phase>/<key>.json`, where
+    the key hashes the phase name, its input values, the relevant configuration and the
+    phase's own fingerprint (e.g. the state of the sources it reads).
+    """
+
+    def __init__(self, directory, config=None, logger=None):
+        """
+        :param directory: Run directory holding the checkpoints.
+        :param config: Configuration dictionary; its volatile settings are ignored.
+        :param logger: Optional logger.
+        """
+        self.directory = directory
+        self.config = config_fingerprint(config or {})
+        self.logger = logger
+
+    def key(self, phase, inputs):
+        """
+        :param phase: The Phase about to run.
+        :param inputs: Its input values.
+        :return: The checkpoint key of this phase execution.
+        """
+        return digest({
+            "phase": phase.name,
+            "inputs": inputs,
+            "config": self.config,
+            "fingerprint": phase.fingerprint() if phase.fingerprint else None,
+        })
+
+    def _path(self, name, key):
+        return os.path.join(self.directory, name, f"{key}.json")
+
+    def load(self, name, key):
+        """
+        :return: The stored outputs of the phase execution, or None if there is no checkpoint.
+        """
+        try:
+            with open(self._path(name, key)) as f:
+                return json.load(f)["outputs"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, name, key, outputs):
+        """
+        Stores the outputs of a successful phase execution. Outputs that cannot be serialized
+        to JSON are not checkpointed.
+        """
+        path = self._path(name, key)
+        try:
+            data = json.dumps({"phase": name, "key": key, "created": time.time(), "outputs": outputs})
+        except (TypeError, ValueError) as e:
+            if self.logger:
+                self.logger.warning(f"Outputs of the {name} phase cannot be checkpointed: {e}")
+            return
+        atomic_write(path, data)
@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import hashlib
+from utils.helper_functions import atomic_write
+
+OVERVIEW_KEY = "overview"
+MODULES_HEADING = "## Module Reference"
+SECTION_START = re.compile(r"^<!-- devautomator:section (\S+) -->\n", re.M)
+MANIFEST_VERSION = 1
+
+
+def section_end(key):
+    return f"<!-- /devautomator:section {key} -->"
+
+
+def render_section(key, body):
+    return f"<!-- devautomator:section {key} -->\n{body.strip()}\n{section_end(key)}\n"
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def parse_sections(text):
+    """
+    Splits a document into free text and generated sections.
+    :return: List of segments, each ("text", str) or ("section", key, body). Sections whose end
+             marker is missing are kept as free text.
+    """
+    segments = []
+    pos = 0
+    while True:
+        match = SECTION_START.search(text, pos)
+        if not match:
+            break
+        key = match.group(1)
+        end = text.find(section_end(key), match.end())
+        if end == -1:
+            break
+        if match.start() > pos:
+            segments.append(("text", text[pos:match.start()]))
+        segments.append(("section", key, text[match.end():end]))
+        pos = end + len(section_end(key))
+        if text.startswith("\n", pos):
+            pos += 1
+    if pos < len(text):
+        segments.append(("text", text[pos:]))
+    return segments
+
+
+def splice_sections(text, sections, order):
+    """
+    Rewrites a document with updated sections, leaving everything else untouched.
+
+    Existing sections are replaced in place; sections missing from `order` are dropped.
+    A new overview goes before the first existing section, and new module sections after
+    the last existing one; without existing sections both are appended to the document
+    (modules under a "Module Reference" heading).
+
+    :param text: Current document text ("" for a new document).
+    :param sections: Dict mapping section key to its new body (only changed sections).
+    :param order: Keys of every section the document should contain, in document order.
+    :return: The new document text.
+    """
+    wanted = set(order)
+    segments = parse_sections(text)
+    present = {segment[1] for segment in segments if segment[0] == "section"}
+    missing = [key for key in order if key not in present and key in sections]
+
+    overview = render_section(OVERVIEW_KEY, sections[OVERVIEW_KEY]) if OVERVIEW_KEY in missing else None
+    modules = [render_section(key, sections[key]) for key in missing if key != OVERVIEW_KEY]
+    section_indexes = [i for i, segment in enumerate(segments) if segment[0] == "section"]
+    module_indexes = [i for i in section_indexes if segments[i][1] != OVERVIEW_KEY]
+
+    out = []
+    for i, segment in enumerate(segments):
+        if overview and section_indexes and i == section_indexes[0]:
+            out.append(overview)
+            overview = None
+        if segment[0] == "text":
+            out.append(segment[1])
+        elif segment[1] in wanted:
+            key = segment[1]
+            out.append(render_section(key, sections.get(key, segment[2])))
+        if modules and module_indexes and i == module_indexes[-1]:
+            out.extend(modules)
+            modules = []
+    for block in ([overview] if overview else []) + ([MODULES_HEADING + "\n\n"] + modules if modules else []):
+        tail = "".join(out)
+        if tail and not tail.endswith("\n\n"):
+            out.append("\n" if tail.endswith("\n") else "\n\n")
+        out.append(block)
+    return "".join(out)
+
+
+def existing_sections(text):
+    return {segment[1] for segment in parse_sections(text) if segment[0] == "section"}
+
+
+class DocManifest:
+    """
+    Source hashes of the sections generated into each documentation file, stored under the
+    state directory so a run can tell which sections are stale.
+    """
+
+    def __init__(self, state_dir=".devautomator"):
+        self.path = os.path.join(state_dir, "doc_manifest.json")
+
+    def load(self, filepath):
+        """
+        :return: Dict mapping section key to the hash of the source it was generated from.
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {}).get(os.path.abspath(filepath), {})
+
+    def save(self, filepath, hashes):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != MANIFEST_VERSION:
+            data = {"version": MANIFEST_VERSION, "files": {}}
+        data["files"][os.path.abspath(filepath)] = hashes
+        atomic_write(self.path, json.dumps(data, indent=1, sort_keys=True))
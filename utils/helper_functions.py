@@ -1,7 +1,18 @@
 import os
-import subprocess
+import time
+import queue
 import shlex
+import signal
+import asyncio
 import logging
+import threading
+import subprocess
+from collections import deque
+from utils.logger import truncated
+
+DEFAULT_BUFFER_LINES = 1000
+STREAM_LINE_LIMIT = 1 << 20  # longest output line stream_command()/astream_command() keep, in bytes
+KILL_GRACE_PERIOD = 5.0
 
 def run_command(command, logger=None):
     """
@@ -23,9 +34,9 @@ def run_command(command, logger=None):
 
         # Log command output
         if logger:
-            logger.info(f"Command output:\n{result.stdout.strip()}")
+            logger.info("Command output:\n%s", truncated(result.stdout.strip(), 2000))
             if result.stderr:
-                logger.warning(f"Command error:\n{result.stderr.strip()}")
+                logger.warning("Command error:\n%s", truncated(result.stderr.strip(), 2000))
 
         return result.stdout.strip(), result.stderr.strip(), result.returncode
 
@@ -41,6 +52,288 @@ def run_command(command, logger=None):
             logger.error(error_message)
         return None, error_message, 1
 
+class CommandResult:
+    """
+    Outcome of stream_command()/astream_command().
+
+    :ivar returncode: Exit code of the process (negative if killed by a signal).
+    :ivar lines: The last output lines (stdout and stderr interleaved), bounded by the ring buffer.
+    :ivar timed_out: "wall" or "idle" if the process was killed for exceeding a timeout, else None.
+    :ivar duration: Wall-clock run time in seconds.
+    """
+
+    def __init__(self, returncode, lines, timed_out=None, duration=0.0):
+        self.returncode = returncode
+        self.lines = lines
+        self.timed_out = timed_out
+        self.duration = duration
+
+    @property
+    def output(self):
+        return "\n".join(self.lines)
+
+def _command_list(command):
+    return shlex.split(command) if isinstance(command, str) else list(command)
+
+def kill_process_group(process, grace=KILL_GRACE_PERIOD):
+    """
+    Terminates the process group of a process started with start_new_session=True,
+    escalating to SIGKILL if it does not exit within the grace period.
+    """
+    try:
+        pgid = os.getpgid(process.pid)
+        os.killpg(pgid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+def _read_lines(stream):
+    """
+    Yields the lines of a text stream, replacing any line longer than STREAM_LINE_LIMIT by a
+    marker line so a single runaway line cannot exhaust memory.
+    """
+    dropped = False
+    while True:
+        line = stream.readline(STREAM_LINE_LIMIT)
+        if not line:
+            if dropped:
+                yield f"[output line longer than {STREAM_LINE_LIMIT} bytes dropped]\n"
+            return
+        if dropped or (len(line) == STREAM_LINE_LIMIT and not line.endswith("\n")):
+            dropped = not line.endswith("\n")
+            if not dropped:
+                yield f"[output line longer than {STREAM_LINE_LIMIT} bytes dropped]\n"
+            continue
+        yield line
+
+def stream_command(command, logger=None, cwd=None, timeout=None, idle_timeout=None,
+                   buffer_lines=DEFAULT_BUFFER_LINES, prefix="", line_callback=None, env=None):
+    """
+    Runs a command without a shell, streaming its output line by line to the logger and
+    into a bounded ring buffer instead of holding the whole output in memory.
+
+    :param command: The command as a string (split with shlex) or a list of arguments.
+    :param logger: Optional logger receiving every output line at INFO level.
+    :param cwd: Optional working directory.
+    :param timeout: Optional wall-clock limit in seconds.
+    :param idle_timeout: Optional limit in seconds on the time between two output lines.
+    :param buffer_lines: Number of trailing output lines kept in the result.
+    :param prefix: Optional prefix for logged lines.
+    :param line_callback: Optional callable invoked with every output line.
+    :param env: Optional environment for the process.
+    :return: CommandResult. On a timeout, an interrupt or an exception raised by line_callback
+        the whole process group is killed; a line longer than STREAM_LINE_LIMIT is dropped
+        and replaced by a marker line.
+    """
+    command_list = _command_list(command)
+    if logger:
+        logger.info(f"Executing command: {shlex.join(command_list)}")
+    lines = deque(maxlen=buffer_lines)
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            command_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            cwd=cwd, env=env, start_new_session=True,
+        )
+    except FileNotFoundError:
+        error_message = "Command not found. Please check if the required tools are installed."
+        if logger:
+            logger.error(error_message)
+        return CommandResult(127, deque([error_message]))
+
+    # A reader thread feeds lines through a queue so timeouts can be enforced while waiting.
+    pipe = queue.Queue()
+
+    def reader():
+        for line in _read_lines(process.stdout):
+            pipe.put(line)
+        pipe.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    timed_out = None
+    last_output = started
+    try:
+        while True:
+            now = time.monotonic()
+            waits = [1.0]
+            if timeout is not None:
+                waits.append(started + timeout - now)
+            if idle_timeout is not None:
+                waits.append(last_output + idle_timeout - now)
+            try:
+                line = pipe.get(timeout=max(0.0, min(waits)))
+            except queue.Empty:
+                now = time.monotonic()
+                if timeout is not None and now - started >= timeout:
+                    timed_out = "wall"
+                elif idle_timeout is not None and now - last_output >= idle_timeout:
+                    timed_out = "idle"
+                if timed_out:
+                    if logger:
+                        logger.error(f"Command exceeded its {timed_out} timeout; killing its process group.")
+                    kill_process_group(process)
+                    break
+                continue
+            if line is None:
+                break
+            last_output = time.monotonic()
+            line = line.rstrip("\n")
+            lines.append(line)
+            if logger:
+                logger.info("%s%s", prefix, line)
+            if line_callback:
+                line_callback(line)
+    except BaseException:
+        kill_process_group(process)
+        raise
+
+    returncode = process.wait()
+    process.stdout.close()
+    return CommandResult(returncode, lines, timed_out, time.monotonic() - started)
+
+async def _kill_async_group(process, grace=KILL_GRACE_PERIOD):
+    try:
+        pgid = os.getpgid(process.pid)
+        os.killpg(pgid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+async def _read_line(stream):
+    """
+    Reads one line like StreamReader.readline(), except that a line longer than the stream's
+    limit does not raise: it is consumed chunk by chunk and replaced by a marker line.
+    :return: The line in bytes; empty at the end of the stream.
+    """
+    dropped = False
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            await stream.readexactly(e.consumed)
+            dropped = True
+            continue
+        if dropped:
+            return f"[output line longer than {STREAM_LINE_LIMIT} bytes dropped]\n".encode()
+        return line
+
+async def astream_command(command, logger=None, cwd=None, timeout=None, idle_timeout=None,
+                          buffer_lines=DEFAULT_BUFFER_LINES, prefix="", line_callback=None, env=None):
+    """
+    Awaitable variant of stream_command(), so many commands can run at once on one event loop.
+    Cancelling the awaiting task kills the command's process group. An output line longer than
+    STREAM_LINE_LIMIT is dropped and replaced by a marker line.
+
+    :return: CommandResult.
+    """
+    command_list = _command_list(command)
+    if logger:
+        logger.info(f"Executing command: {shlex.join(command_list)}")
+    lines = deque(maxlen=buffer_lines)
+    started = time.monotonic()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command_list, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            cwd=cwd, env=env, start_new_session=True, limit=STREAM_LINE_LIMIT,
+        )
+    except FileNotFoundError:
+        error_message = "Command not found. Please check if the required tools are installed."
+        if logger:
+            logger.error(error_message)
+        return CommandResult(127, deque([error_message]))
+
+    timed_out = None
+    try:
+        while True:
+            waits = []
+            if timeout is not None:
+                waits.append(started + timeout - time.monotonic())
+            if idle_timeout is not None:
+                waits.append(idle_timeout)
+            try:
+                raw = await asyncio.wait_for(_read_line(process.stdout), max(0.0, min(waits)) if waits else None)
+            except asyncio.TimeoutError:
+                timed_out = "wall" if timeout is not None and time.monotonic() - started >= timeout else "idle"
+                if logger:
+                    logger.error(f"Command exceeded its {timed_out} timeout; killing its process group.")
+                await _kill_async_group(process)
+                break
+            if not raw:
+                break
+            line = raw.decode(errors="replace").rstrip("\n")
+            lines.append(line)
+            if logger:
+                logger.info("%s%s", prefix, line)
+            if line_callback:
+                line_callback(line)
+        returncode = await process.wait()
+    except BaseException:  # cancellation, or a failing line_callback
+        await _kill_async_group(process)
+        raise
+    return CommandResult(returncode, lines, timed_out, time.monotonic() - started)
+
+def write_stream(chunks, filepath, append=False, separator=""):
+    """
+    Writes text chunks to a file as they arrive, flushing after each one so the
+    artifact grows while it is being generated.
+
+    :param chunks: Iterable of text chunks.
+    :param filepath: Path to the output file.
+    :param append: If True, append to the existing file instead of overwriting.
+    :param separator: Text written before the first chunk (e.g. a blank line when appending).
+    :return: The complete text that was written, without the separator.
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    parts = []
+    with open(filepath, "a" if append else "w") as f:
+        for chunk in chunks:
+            if not parts and separator:
+                f.write(separator)
+            f.write(chunk)
+            f.flush()
+            parts.append(chunk)
+    return "".join(parts)
+
+def atomic_write(filepath, text):
+    """
+    Replaces a file's contents in one step: the text is written to a temporary file in the
+    same directory, which is then renamed over the target, so readers never see a partial file.
+    The temporary name is unique per process and thread, so concurrent writers never share it.
+
+    :param filepath: Path to the output file.
+    :param text: The complete new contents.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(filepath)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 def file_exists(filepath):
     """
     Checks if a given file exists.
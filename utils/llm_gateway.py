@@ -0,0 +1,726 @@
+import time
+import asyncio
+import threading
+import contextvars
+from utils.logger import setup_logger  # Centralized logger from utils
+from utils.response_cache import ResponseCache, make_cache_key
+from utils.metrics import MetricsRecorder
+from utils.model_router import ModelRouter
+from utils.token_budget import TokenBudget
+from utils.rate_limiter import (
+    get_rate_limiter, backoff_delay, estimate_tokens,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_BACKOFF_BASE, DEFAULT_BACKOFF_MAX,
+)
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_CONTINUATIONS = 2
+CONTINUATION_PROMPT = (
+    "Your previous answer was cut off. Continue exactly where it stopped, without repeating "
+    "anything or adding any commentary."
+)
+
+# CallRecord of the request in flight in the current thread or task, for the response hooks.
+_current_call = contextvars.ContextVar("llm_current_call", default=None)
+
+
+def _on_response(response):
+    call = _current_call.get()
+    if call is not None:
+        call.ttfb = time.perf_counter() - call.sent
+
+
+async def _aon_response(response):
+    _on_response(response)
+
+
+def is_retryable(error):
+    """
+    Returns True for errors worth retrying: rate limits, server errors and transport failures.
+    """
+    import openai  # already loaded once a request has been made
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def retry_after_seconds(error):
+    """
+    Extracts the server-requested retry delay from an API error, if any.
+    :return: Delay in seconds, or None.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+class LLMGateway:
+    """
+    Shared entry point for every chat completion issued by the agents.
+
+    A single pooled keep-alive HTTP client backs the synchronous API so that sequential
+    calls reuse connections, and an asyncio client backs the awaitable API so that
+    independent calls can overlap instead of waiting in line.
+    """
+
+    def __init__(self, api_key="", base_url=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS, timeout=DEFAULT_TIMEOUT,
+                 cache=None, cache_bypass=False, rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX, metrics=None,
+                 stream_usage=True, router=None, budget=None, max_continuations=DEFAULT_MAX_CONTINUATIONS):
+        """
+        Initializes the gateway and its pooled synchronous client.
+        :param api_key: OpenAI API key.
+        :param base_url: Optional base URL of an OpenAI-compatible endpoint.
+        :param max_connections: Maximum number of concurrent HTTP connections.
+        :param max_keepalive_connections: Maximum number of idle connections kept open.
+        :param timeout: Request timeout in seconds.
+        :param cache: Optional ResponseCache consulted before every request.
+        :param cache_bypass: If True, cached responses are ignored (fresh responses are still stored).
+        :param rate_limiter: Optional shared RateLimiter every request must pass through.
+        :param max_retries: Number of retries on rate-limit, 5xx and connection errors.
+        :param backoff_base: Delay of the first retry in seconds.
+        :param backoff_max: Upper bound of a retry delay in seconds.
+        :param metrics: Optional MetricsRecorder receiving a record of every call; a new one is created if omitted.
+        :param stream_usage: If True, streamed requests ask for token usage in the final chunk.
+        :param router: Optional ModelRouter choosing the models of completed (non-streamed) requests.
+        :param budget: Optional TokenBudget choosing the max_tokens of completed (non-streamed) requests.
+        :param max_continuations: Continuation requests sent at most when a completion is cut short by max_tokens.
+        """
+        self.logger = setup_logger(__name__)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_bypass = cache_bypass
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.ttft_samples = []  # (tag, seconds to first token) of streamed requests
+        self.metrics = metrics or MetricsRecorder()
+        self.stream_usage = stream_usage
+        self.router = router
+        self.budget = budget
+        self.max_continuations = max_continuations
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+
+        # The openai package (slow to import) is only loaded, and the clients only built, on first
+        # use. The async client is bound to the event loop it was first used on.
+        self._client = None
+        self._limits = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self._async_loop = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds a gateway from an agent configuration dictionary.
+        :param config: A configuration object/dictionary containing the OpenAI settings.
+        :return: A new LLMGateway instance.
+        """
+        api_key = config.get("openai_api_key", "")
+        base_url = config.get("openai_base_url")
+        return cls(
+            api_key=api_key,
+            base_url=base_url,
+            max_connections=config.get("llm_max_connections", DEFAULT_MAX_CONNECTIONS),
+            max_keepalive_connections=config.get("llm_max_keepalive_connections", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+            timeout=config.get("llm_timeout", DEFAULT_TIMEOUT),
+            cache=ResponseCache.from_config(config),
+            cache_bypass=config.get("llm_cache_bypass", False),
+            rate_limiter=get_rate_limiter(
+                api_key, base_url,
+                requests_per_minute=config.get("llm_requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE),
+                tokens_per_minute=config.get("llm_tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE),
+            ),
+            max_retries=config.get("llm_max_retries", DEFAULT_MAX_RETRIES),
+            backoff_base=config.get("llm_backoff_base", DEFAULT_BACKOFF_BASE),
+            backoff_max=config.get("llm_backoff_max", DEFAULT_BACKOFF_MAX),
+            stream_usage=config.get("llm_stream_usage", True),
+            router=ModelRouter.from_config(config),
+            budget=TokenBudget.from_config(config),
+            max_continuations=config.get("llm_max_continuations", DEFAULT_MAX_CONTINUATIONS),
+        )
+
+    @property
+    def limits(self):
+        if self._limits is None:
+            import httpx
+            self._limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+            )
+        return self._limits
+
+    @property
+    def client(self):
+        """
+        Returns the pooled synchronous OpenAI client, creating it on first use.
+        """
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI, DefaultHttpxClient
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    max_retries=0,  # Retries are handled by the gateway so they pass through the rate limiter
+                    http_client=DefaultHttpxClient(limits=self.limits, timeout=self.timeout,
+                                                   event_hooks={"response": [_on_response]}),
+                )
+            return self._client
+
+    @property
+    def async_client(self):
+        """
+        Returns the AsyncOpenAI client for the running event loop, creating it on first use.
+        """
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            if self._async_client is None or self._async_loop is not loop:
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                self._async_client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout,
+                                                        event_hooks={"response": [_aon_response]}),
+                )
+                self._async_loop = loop
+            return self._async_client
+
+    @staticmethod
+    def _request_params(model, messages, max_tokens, extra):
+        """
+        Assembles the keyword arguments of a chat completion request.
+        """
+        params = {"model": model, "messages": messages}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        params.update(extra)
+        return params
+
+    def _cache_key(self, params, use_cache):
+        if self.cache is None or not use_cache:
+            return None
+        return make_cache_key(params["model"], params["messages"], params.get("max_tokens"), params.get("temperature"))
+
+    def _cached(self, key):
+        if key is None or self.cache_bypass:
+            return None
+        return self.cache.get(key)
+
+    def _retry_delay(self, error, attempt, tag):
+        """
+        Decides whether a failed request is retried.
+        :return: Delay in seconds before the next attempt, or None to give up.
+        """
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        retry_after = retry_after_seconds(error)
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+        if getattr(error, "status_code", None) == 429 and self.rate_limiter is not None:
+            # Hold back every caller sharing the quota, not just this one.
+            self.rate_limiter.pause(delay)
+        self.logger.warning(f"Retrying {tag} in {delay:.2f}s after error: {error}")
+        return delay
+
+    def _settle(self, estimated, usage):
+        if self.rate_limiter is not None:
+            self.rate_limiter.reconcile(estimated, usage.total_tokens if usage else None)
+
+    def _stream_params(self, params):
+        params = dict(params, stream=True)
+        if self.stream_usage:
+            params["stream_options"] = {"include_usage": True}
+        return params
+
+    def _create(self, params, tag, call):
+        """
+        Issues a chat completion through the rate limiter, retrying with jittered exponential
+        backoff on rate-limit, 5xx and connection errors.
+        :param call: CallRecord receiving the rate-limit wait, retries and time to first byte.
+        :return: The ChatCompletion response.
+        """
+        estimated = estimate_tokens(params["messages"], params.get("max_tokens"))
+        while True:
+            if self.rate_limiter is not None:
+                waited = time.perf_counter()
+                self.rate_limiter.acquire(estimated)
+                call.wait += time.perf_counter() - waited
+            call.sent = time.perf_counter()
+            token = _current_call.set(call)
+            try:
+                response = self.client.chat.completions.create(**params)
+                if not params.get("stream"):
+                    self._settle(estimated, response.usage)
+                return response
+            except Exception as e:
+                delay = self._retry_delay(e, call.retries, tag)
+                if delay is None:
+                    raise
+                call.retries += 1
+                time.sleep(delay)
+            finally:
+                _current_call.reset(token)
+
+    async def _acreate(self, params, tag, call):
+        """
+        Awaitable variant of _create().
+        :return: The ChatCompletion response.
+        """
+        estimated = estimate_tokens(params["messages"], params.get("max_tokens"))
+        while True:
+            if self.rate_limiter is not None:
+                waited = time.perf_counter()
+                await self.rate_limiter.aacquire(estimated)
+                call.wait += time.perf_counter() - waited
+            call.sent = time.perf_counter()
+            token = _current_call.set(call)
+            try:
+                response = await self.async_client.chat.completions.create(**params)
+                if not params.get("stream"):
+                    self._settle(estimated, response.usage)
+                return response
+            except Exception as e:
+                delay = self._retry_delay(e, call.retries, tag)
+                if delay is None:
+                    raise
+                call.retries += 1
+                await asyncio.sleep(delay)
+            finally:
+                _current_call.reset(token)
+
+    def _cache_hit(self, tag, model, streamed=False):
+        call = self.metrics.start_call(tag, model, streamed)
+        call.cache_hit = True
+        self.metrics.finish_call(call)
+        return call
+
+    def _store(self, key, text, finish_reason):
+        """
+        Caches a completion unless it is still truncated (a cache hit would skip the truncation
+        check); `key` is None for cache hits and uncached requests.
+        """
+        if key is not None and finish_reason != "length":
+            self.cache.set(key, text)
+
+    def _accepted(self, route, tag, model, text, finish_reason, call, last, key=None):
+        """
+        Validates the output of one model of a route, records the outcome and caches the
+        output if it passed, so a rejected answer is never served from the cache.
+        :return: True if the output is returned, False if the request escalates to the next model.
+        """
+        reason = route.check(text, finish_reason)
+        self.router.record(tag, model, reason or "accepted", call)
+        if reason is None:
+            self._store(key, text, finish_reason)
+        if reason is None or last:
+            return True
+        self.logger.info(f"Escalating {tag} from {model}: {reason}")
+        return False
+
+    def complete(self, model, messages, max_tokens=None, tag=None, use_cache=True, **kwargs):
+        """
+        Sends a chat completion request and returns the stripped message content.
+        With a router, the request goes through the route of its tag: cheaper models first,
+        escalating to the next one (and finally to `model`) when the output is rejected.
+        An answer cut short by max_tokens is completed by continuation requests.
+        :param model: Model name.
+        :param messages: List of chat messages.
+        :param max_tokens: Optional completion token limit; superseded by the token budget once it
+                           has learned the output lengths of `tag`.
+        :param tag: Optional label of the calling agent method, used in log lines.
+        :param use_cache: If False, the response cache is neither read nor written.
+        :return: The generated text as a string.
+        """
+        tag = tag or model
+        route = self.router.route(tag) if self.router is not None else None
+        if route is None:
+            text, finish_reason, _, key = self._complete(model, messages, max_tokens, tag, use_cache, kwargs)
+            self._store(key, text, finish_reason)
+            return text
+        candidates = self.router.candidates(tag, model)
+        for i, candidate in enumerate(candidates):
+            last = i == len(candidates) - 1
+            try:
+                text, finish_reason, call, key = self._complete(candidate, messages, max_tokens, tag, use_cache,
+                                                                kwargs)
+            except Exception as e:
+                self.router.record(tag, candidate, "error")
+                if last:
+                    raise
+                self.logger.info(f"Escalating {tag} from {candidate} after error: {e}")
+                continue
+            if self._accepted(route, tag, candidate, text, finish_reason, call, last, key):
+                return text
+
+    def _complete(self, model, messages, max_tokens, tag, use_cache, kwargs):
+        """
+        Produces the completion of a request by one model: from the cache, or from a request
+        whose max_tokens comes from the token budget, continued while it is cut short.
+        The cache key holds the requested max_tokens, so learned budgets do not invalidate it.
+        :return: Tuple of (text, finish_reason, CallRecord of the first request, cache key); the
+                 reason and the key are None for cache hits.
+        """
+        key = self._cache_key(self._request_params(model, messages, max_tokens, kwargs), use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            self.logger.debug("Cache hit (%s)", tag)
+            return cached, None, self._cache_hit(tag, model), None
+
+        budget = self.budget.max_tokens(tag, max_tokens) if self.budget is not None else max_tokens
+        content, finish_reason, call = self._send(model, messages, budget, tag, kwargs)
+        parts, calls, continuations = [content], [call], 0
+        while self._continues(finish_reason, continuations, budget, kwargs):
+            continuations += 1
+            if "response_format" in kwargs:
+                # Pieces of a structured (JSON) answer cannot be joined: ask again with twice the budget
+                budget *= 2
+                self.logger.debug("Retrying truncated structured completion with max_tokens=%d (%s)", budget, tag)
+                content, finish_reason, continued = self._send(model, messages, budget, tag, kwargs)
+                parts, calls = [content], [continued]
+            else:
+                self.logger.debug("Continuing truncated completion (%s)", tag)
+                content, finish_reason, continued = self._send(
+                    model, self._continuation_messages(messages, parts), budget, tag, kwargs
+                )
+                parts.append(content)
+                calls.append(continued)
+        return self._finish_completion(tag, parts, calls, finish_reason, continuations), finish_reason, call, key
+
+    def _send(self, model, messages, max_tokens, tag, kwargs):
+        """
+        Sends one chat completion request to one model.
+        :return: Tuple of (unstripped text, finish_reason, CallRecord).
+        """
+        params = self._request_params(model, messages, max_tokens, kwargs)
+        self.logger.debug("Chat completion request (%s)", tag)
+        call = self.metrics.start_call(tag, model)
+        try:
+            response = self._create(params, tag, call)
+        except Exception as e:
+            self.metrics.finish_call(call, error=e)
+            raise
+        self.metrics.finish_call(call, response.usage)
+        return response.choices[0].message.content or "", response.choices[0].finish_reason, call
+
+    def _continues(self, finish_reason, continuations, budget, kwargs):
+        """
+        Decides whether a completion cut short by max_tokens gets another request: a
+        continuation, or for structured output a retry with a larger budget.
+        """
+        if finish_reason != "length" or continuations >= self.max_continuations:
+            return False
+        return "response_format" not in kwargs or bool(budget)
+
+    @staticmethod
+    def _continuation_messages(messages, parts):
+        """
+        Builds the request resuming a truncated completion: the original conversation, the
+        partial answer so far and the request to go on from there.
+        """
+        return list(messages) + [
+            {"role": "assistant", "content": "".join(parts)},
+            {"role": "user", "content": CONTINUATION_PROMPT},
+        ]
+
+    def _finish_completion(self, tag, parts, calls, finish_reason, continuations):
+        """
+        Joins the parts of a completion and feeds its length to the token budget. Caching is
+        left to the caller, which knows whether the answer is accepted.
+        :return: The stripped text.
+        """
+        content = "".join(parts).strip()
+        if self.budget is not None:
+            tokens = sum(call.completion_tokens or len(part) // 4 for call, part in zip(calls, parts))
+            self.budget.observe(tag, tokens, finish_reason == "length", continuations)
+        return content
+
+    async def acomplete(self, model, messages, max_tokens=None, tag=None, use_cache=True, **kwargs):
+        """
+        Awaitable variant of complete().
+        :return: The generated text as a string.
+        """
+        tag = tag or model
+        route = self.router.route(tag) if self.router is not None else None
+        if route is None:
+            text, finish_reason, _, key = await self._acomplete(model, messages, max_tokens, tag, use_cache, kwargs)
+            self._store(key, text, finish_reason)
+            return text
+        candidates = self.router.candidates(tag, model)
+        for i, candidate in enumerate(candidates):
+            last = i == len(candidates) - 1
+            try:
+                text, finish_reason, call, key = await self._acomplete(candidate, messages, max_tokens, tag,
+                                                                       use_cache, kwargs)
+            except Exception as e:
+                self.router.record(tag, candidate, "error")
+                if last:
+                    raise
+                self.logger.info(f"Escalating {tag} from {candidate} after error: {e}")
+                continue
+            if self._accepted(route, tag, candidate, text, finish_reason, call, last, key):
+                return text
+
+    async def _acomplete(self, model, messages, max_tokens, tag, use_cache, kwargs):
+        """
+        Awaitable variant of _complete().
+        :return: Tuple of (text, finish_reason, CallRecord, cache key).
+        """
+        key = self._cache_key(self._request_params(model, messages, max_tokens, kwargs), use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            self.logger.debug("Cache hit (%s)", tag)
+            return cached, None, self._cache_hit(tag, model), None
+
+        budget = self.budget.max_tokens(tag, max_tokens) if self.budget is not None else max_tokens
+        content, finish_reason, call = await self._asend(model, messages, budget, tag, kwargs)
+        parts, calls, continuations = [content], [call], 0
+        while self._continues(finish_reason, continuations, budget, kwargs):
+            continuations += 1
+            if "response_format" in kwargs:
+                # Pieces of a structured (JSON) answer cannot be joined: ask again with twice the budget
+                budget *= 2
+                self.logger.debug("Retrying truncated structured completion with max_tokens=%d (%s)", budget, tag)
+                content, finish_reason, continued = await self._asend(model, messages, budget, tag, kwargs)
+                parts, calls = [content], [continued]
+            else:
+                self.logger.debug("Continuing truncated completion (%s)", tag)
+                content, finish_reason, continued = await self._asend(
+                    model, self._continuation_messages(messages, parts), budget, tag, kwargs
+                )
+                parts.append(content)
+                calls.append(continued)
+        return self._finish_completion(tag, parts, calls, finish_reason, continuations), finish_reason, call, key
+
+    async def _asend(self, model, messages, max_tokens, tag, kwargs):
+        """
+        Awaitable variant of _send().
+        :return: Tuple of (unstripped text, finish_reason, CallRecord).
+        """
+        params = self._request_params(model, messages, max_tokens, kwargs)
+        self.logger.debug("Async chat completion request (%s)", tag)
+        call = self.metrics.start_call(tag, model)
+        try:
+            response = await self._acreate(params, tag, call)
+        except Exception as e:
+            self.metrics.finish_call(call, error=e)
+            raise
+        self.metrics.finish_call(call, response.usage)
+        return response.choices[0].message.content or "", response.choices[0].finish_reason, call
+
+    def _record_ttft(self, call):
+        call.ttft = time.perf_counter() - call.started
+        self.ttft_samples.append((call.tag, call.ttft))
+        self.logger.info(f"First token for {call.tag} after {call.ttft:.3f}s")
+
+    def stream(self, model, messages, max_tokens=None, tag=None, use_cache=True, **kwargs):
+        """
+        Sends a streaming chat completion request and yields text chunks as they arrive.
+        Like complete(), the request's max_tokens comes from the token budget and an answer cut
+        short by it is continued (in further streamed requests; structured output is not
+        continued). The complete response is cached once the stream finishes unless it is still
+        truncated; a cache hit is yielded as one chunk.
+        :param model: Model name.
+        :param messages: List of chat messages.
+        :param max_tokens: Optional completion token limit.
+        :param tag: Optional label of the calling agent method, used in log lines.
+        :param use_cache: If False, the response cache is neither read nor written.
+        :return: Generator of text chunks.
+        """
+        tag = tag or model
+        key = self._cache_key(self._request_params(model, messages, max_tokens, kwargs), use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            self.logger.debug("Cache hit (%s)", tag)
+            self._cache_hit(tag, model, streamed=True)
+            yield cached
+            return
+
+        budget = self.budget.max_tokens(tag, max_tokens) if self.budget is not None else max_tokens
+        parts, calls, continuations = [], [], 0
+        request_messages = messages
+        while True:
+            outcome = {}
+            texts = []
+            for text in self._stream_request(model, request_messages, budget, tag, kwargs, not parts, outcome):
+                texts.append(text)
+                yield text
+            parts.append("".join(texts))
+            calls.append(outcome["call"])
+            if not self._stream_continues(outcome, continuations, budget, kwargs):
+                break
+            continuations += 1
+            self.logger.debug("Continuing truncated streamed completion (%s)", tag)
+            request_messages = self._continuation_messages(messages, parts)
+        content = self._finish_completion(tag, parts, calls, outcome.get("finish_reason"), continuations)
+        if content:
+            self._store(key, content, outcome.get("finish_reason"))
+
+    def _stream_continues(self, outcome, continuations, budget, kwargs):
+        """
+        Decides whether a streamed completion cut short by max_tokens is continued. Structured
+        output is not: its chunks were already yielded, so it cannot be asked for again whole.
+        """
+        return "response_format" not in kwargs and self._continues(outcome.get("finish_reason"), continuations,
+                                                                   budget, kwargs)
+
+    def _stream_request(self, model, messages, max_tokens, tag, kwargs, first, outcome):
+        """
+        Sends one streaming request and yields its text chunks. `outcome` receives the
+        "finish_reason" of the stream and its "call" record.
+        :param first: True for the first request of a completion, whose leading whitespace is
+                      dropped and whose first chunk sets the time to first token.
+        """
+        params = self._request_params(model, messages, max_tokens, kwargs)
+        self.logger.debug("Streaming chat completion request (%s)", tag)
+        call = outcome["call"] = self.metrics.start_call(tag, model, streamed=True)
+        try:
+            response = self._create(self._stream_params(params), tag, call)
+        except Exception as e:
+            self.metrics.finish_call(call, error=e)
+            raise
+        started = not first
+        usage = None
+        error = None
+        try:
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    outcome["finish_reason"] = chunk.choices[0].finish_reason
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not text:
+                    continue
+                if not started:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                    self._record_ttft(call)
+                    started = True
+                yield text
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            response.close()
+            self._settle(estimate_tokens(params["messages"], params.get("max_tokens")), usage)
+            self.metrics.finish_call(call, usage, error)
+
+    async def astream(self, model, messages, max_tokens=None, tag=None, use_cache=True, **kwargs):
+        """
+        Awaitable variant of stream(); an async generator of text chunks.
+        """
+        tag = tag or model
+        key = self._cache_key(self._request_params(model, messages, max_tokens, kwargs), use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            self.logger.debug("Cache hit (%s)", tag)
+            self._cache_hit(tag, model, streamed=True)
+            yield cached
+            return
+
+        budget = self.budget.max_tokens(tag, max_tokens) if self.budget is not None else max_tokens
+        parts, calls, continuations = [], [], 0
+        request_messages = messages
+        while True:
+            outcome = {}
+            texts = []
+            async for text in self._astream_request(model, request_messages, budget, tag, kwargs, not parts,
+                                                    outcome):
+                texts.append(text)
+                yield text
+            parts.append("".join(texts))
+            calls.append(outcome["call"])
+            if not self._stream_continues(outcome, continuations, budget, kwargs):
+                break
+            continuations += 1
+            self.logger.debug("Continuing truncated streamed completion (%s)", tag)
+            request_messages = self._continuation_messages(messages, parts)
+        content = self._finish_completion(tag, parts, calls, outcome.get("finish_reason"), continuations)
+        if content:
+            self._store(key, content, outcome.get("finish_reason"))
+
+    async def _astream_request(self, model, messages, max_tokens, tag, kwargs, first, outcome):
+        """
+        Awaitable variant of _stream_request().
+        """
+        params = self._request_params(model, messages, max_tokens, kwargs)
+        self.logger.debug("Async streaming chat completion request (%s)", tag)
+        call = outcome["call"] = self.metrics.start_call(tag, model, streamed=True)
+        try:
+            response = await self._acreate(self._stream_params(params), tag, call)
+        except Exception as e:
+            self.metrics.finish_call(call, error=e)
+            raise
+        started = not first
+        usage = None
+        error = None
+        try:
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    outcome["finish_reason"] = chunk.choices[0].finish_reason
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not text:
+                    continue
+                if not started:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                    self._record_ttft(call)
+                    started = True
+                yield text
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await response.close()
+            self._settle(estimate_tokens(params["messages"], params.get("max_tokens")), usage)
+            self.metrics.finish_call(call, usage, error)
+
+    def cache_stats(self):
+        """
+        Returns the response cache hit and miss counters.
+        :return: Dictionary of counters, or None if caching is disabled.
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    def close(self):
+        """
+        Closes the pooled synchronous client and the response cache, and saves the routing and
+        completion length statistics.
+        """
+        if self._client is not None:
+            self._client.close()
+        if self.router is not None:
+            self.router.save()
+        if self.budget is not None:
+            self.budget.save()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def aclose(self):
+        """
+        Closes the async client bound to the running event loop, if any.
+        """
+        with self._client_lock:
+            client, self._async_client, self._async_loop = self._async_client, None, None
+        if client is not None:
+            await client.close()
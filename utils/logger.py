@@ -1,35 +1,244 @@
-import logging
+import os
 import sys
-from logging.handlers import RotatingFileHandler
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation falls back to the standard, single-process behavior
+    fcntl = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_MAX_MESSAGE_CHARS = 4000
+DEFAULT_PAYLOAD_CHARS = 500
+
+_state = {"listener": None, "queue": None, "handler": None, "settings": None}
+_lock = threading.Lock()
+
+
+class Truncated:
+    """
+    Log argument that renders a (possibly large) payload only when the record is formatted,
+    which happens on the listener thread, and cuts it to `limit` characters.
+
+    Usage: logger.info("Generated plan: %s", truncated(plan))
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=DEFAULT_PAYLOAD_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        return truncate_text(str(self.value), self.limit)
+
+
+def truncated(value, limit=DEFAULT_PAYLOAD_CHARS):
+    return Truncated(value, limit)
+
+
+def truncate_text(text, limit):
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class TruncatingFormatter(logging.Formatter):
+    """
+    Standard text formatter that caps the length of the rendered message.
+    """
+
+    def __init__(self, fmt=LOG_FORMAT, max_message_chars=DEFAULT_MAX_MESSAGE_CHARS):
+        super().__init__(fmt)
+        self.max_message_chars = max_message_chars
+
+    def formatMessage(self, record):
+        record.message = truncate_text(record.message, self.max_message_chars)
+        return super().formatMessage(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line.
+    """
+
+    def __init__(self, max_message_chars=DEFAULT_MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_message_chars = max_message_chars
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate_text(record.getMessage(), self.max_message_chars),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ProcessSafeRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that can be shared by several processes writing the same file.
+
+    Each write holds an exclusive lock on a sidecar `.lock` file, so only one process checks
+    the size and rotates at a time, and a process whose file was rotated away by another
+    one reopens the new file before writing instead of appending to the renamed backup.
+    """
+
+    def __init__(self, filename, max_bytes=1e6, backup_count=3, encoding="utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self._lock_file = open(self.baseFilename + ".lock", "a") if fcntl else None
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = None  # reopened lazily by emit()
+
+    def emit(self, record):
+        if self._lock_file is None:
+            return super().emit(record)
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records unformatted: message interpolation (including lazy
+    payload arguments) and all I/O happen on the listener thread, not in the caller.
+    """
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+
+def _stop_listener():
+    listener = _state["listener"]
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        _state["listener"] = None
+
+
+def configure_logging(log_file='app.log', console_level=logging.INFO, file_level=logging.DEBUG,
+                      json_log_file=None, max_bytes=1e6, backup_count=3,
+                      max_message_chars=DEFAULT_MAX_MESSAGE_CHARS):
+    """
+    (Re)configures the process-wide logging pipeline: loggers enqueue records and a single
+    background listener writes them to the console, one shared rotating log file and,
+    optionally, a JSON-lines file.
+
+    :param log_file: The log file path, or None to disable the text log file.
+    :param console_level: Logging level for console output.
+    :param file_level: Logging level for the log files.
+    :param json_log_file: Optional path of a JSON-lines log file.
+    :param max_bytes: Size at which log files are rotated.
+    :param backup_count: Number of rotated files kept.
+    :param max_message_chars: Messages longer than this are truncated.
+    """
+    settings = (log_file, console_level, file_level, json_log_file, max_bytes, backup_count, max_message_chars)
+    with _lock:
+        if _state["settings"] == settings:
+            return
+        _stop_listener()
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(TruncatingFormatter(LOG_FORMAT, max_message_chars))
+        handlers = [console_handler]
+        if log_file:
+            file_handler = ProcessSafeRotatingFileHandler(log_file, max_bytes, backup_count)
+            file_handler.setLevel(file_level)
+            file_handler.setFormatter(TruncatingFormatter(LOG_FORMAT, max_message_chars))
+            handlers.append(file_handler)
+        if json_log_file:
+            json_handler = ProcessSafeRotatingFileHandler(json_log_file, max_bytes, backup_count)
+            json_handler.setLevel(file_level)
+            json_handler.setFormatter(JsonLinesFormatter(max_message_chars))
+            handlers.append(json_handler)
+
+        if _state["queue"] is None:
+            _state["queue"] = queue.SimpleQueue()
+            _state["handler"] = LazyQueueHandler(_state["queue"])
+            atexit.register(shutdown_logging)
+        listener = QueueListener(_state["queue"], *handlers, respect_handler_level=True)
+        listener.start()
+        _state["listener"] = listener
+        _state["settings"] = settings
+
+
+def configure_logging_from_config(config):
+    """
+    Configures logging from the "log_file", "log_json_file", "log_level", "log_max_bytes",
+    "log_backup_count" and "log_max_message_chars" settings.
+    """
+    configure_logging(
+        log_file=config.get("log_file", 'app.log'),
+        console_level=logging.getLevelName(str(config.get("log_level", "INFO")).upper()),
+        json_log_file=config.get("log_json_file"),
+        max_bytes=config.get("log_max_bytes", 1e6),
+        backup_count=config.get("log_backup_count", 3),
+        max_message_chars=config.get("log_max_message_chars", DEFAULT_MAX_MESSAGE_CHARS),
+    )
+
+
+def shutdown_logging():
+    """
+    Drains the queue and closes the log files. Called automatically at interpreter exit.
+    """
+    with _lock:
+        _stop_listener()
+        _state["settings"] = None
+
 
 def setup_logger(name, console_level=logging.INFO, file_level=logging.DEBUG, log_file='app.log'):
     """
     Sets up and returns a logger with specified name, console logging level, and file logging level.
 
+    The logger only enqueues records; the shared background listener does the formatting and
+    I/O. The levels and file apply when this call starts the listener (configure_logging()
+    was not called yet).
+
     :param name: The name of the logger.
     :param console_level: Logging level for console output (default is logging.INFO).
     :param file_level: Logging level for file output (default is logging.DEBUG).
     :param log_file: The log file path (default is 'app.log').
     :return: Configured logger instance.
     """
+    if _state["settings"] is None:
+        configure_logging(log_file, console_level, file_level)
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)  # Capture all levels; handlers will filter levels appropriately.
 
-    # Check if handlers are already added to avoid duplication.
-    if not logger.handlers:
-        # Console handler for stdout.
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(console_level)
-        console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
-
-        # File handler with rotation.
-        file_handler = RotatingFileHandler(log_file, maxBytes=1e6, backupCount=3)
-        file_handler.setLevel(file_level)
-        file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+    # Check if the queue handler is already attached to avoid duplication.
+    if _state["handler"] not in logger.handlers:
+        logger.addHandler(_state["handler"])
 
     return logger
 
@@ -41,3 +250,4 @@ if __name__ == "__main__":
     log.warning("Warning message")
     log.error("Error message")
     log.critical("Critical message")
+    log.info("Large payload: %s", truncated("x" * 10000))
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import threading
+from contextvars import ContextVar
+from utils.helper_functions import atomic_write
+
+METRIC_PREFIX = "devautomator"
+QUANTILES = (0.5, 0.95)
+
+# Label of the run the current task belongs to (e.g. the project of a batch run); every call
+# and phase recorded while it is set is tagged with it so runs sharing a recorder can be told apart.
+current_scope = ContextVar("metrics_scope", default=None)
+
+
+def percentile(values, q):
+    """
+    Linear-interpolated percentile of a list of numbers.
+    :param values: The samples.
+    :param q: Quantile between 0 and 1.
+    :return: The percentile, or None without samples.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def distribution(values):
+    """
+    Summarizes samples as count, sum, p50, p95 and max.
+    """
+    return {
+        "count": len(values),
+        "sum": sum(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values) if values else None,
+    }
+
+
+class CallRecord:
+    """
+    Measurements of one LLM call, filled in by the gateway while the call is in flight.
+    """
+
+    def __init__(self, tag, model, streamed=False):
+        self.tag = tag
+        self.model = model
+        self.streamed = streamed
+        self.scope = current_scope.get()
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.sent = self.started  # start of the current attempt
+        self.latency = None  # seconds from the call until the full response (or the error)
+        self.ttfb = None  # seconds from sending the last attempt until its response headers
+        self.ttft = None  # seconds until the first streamed token
+        self.wait = 0.0  # seconds spent waiting for the rate limiter
+        self.retries = 0
+        self.cache_hit = False
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.error = None
+
+    def to_dict(self):
+        return {name: value for name, value in vars(self).items() if name not in ("started", "sent")}
+
+
+class MetricsRecorder:
+    """
+    Thread-safe collector of per-call and per-phase measurements, exported per run as a JSON
+    report and as a Prometheus text-format file.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def start_call(self, tag, model, streamed=False):
+        return CallRecord(tag, model, streamed)
+
+    def finish_call(self, call, usage=None, error=None):
+        """
+        Completes a call record and stores it.
+        :param call: The CallRecord returned by start_call().
+        :param usage: Optional `usage` object of the response.
+        :param error: Optional exception that ended the call.
+        """
+        call.latency = time.perf_counter() - call.started
+        if usage is not None:
+            call.prompt_tokens = getattr(usage, "prompt_tokens", None)
+            call.completion_tokens = getattr(usage, "completion_tokens", None)
+        if error is not None:
+            call.error = type(error).__name__
+        with self._lock:
+            self.calls.append(call)
+
+    def record_phase(self, name, status, start=None, end=None, duration=None, resumed=False):
+        with self._lock:
+            self.phases.append({"phase": name, "status": status, "start": start, "end": end, "duration": duration,
+                                "resumed": resumed, "scope": current_scope.get()})
+
+    def mark(self):
+        """
+        Returns a position marker; report(since=marker) then covers only later measurements.
+        """
+        with self._lock:
+            return len(self.calls), len(self.phases)
+
+    def report(self, since=(0, 0), scope=None, **extra):
+        """
+        Builds the run report: raw calls and phases plus per-agent-method summaries.
+        :param since: Marker from mark() delimiting the run.
+        :param scope: Optional scope label; only the measurements recorded under it are reported.
+        :param extra: Additional top-level fields (e.g. run id, results).
+        :return: The report dictionary.
+        """
+        with self._lock:
+            calls = self.calls[since[0]:]
+            phases = self.phases[since[1]:]
+        if scope is not None:
+            calls = [call for call in calls if call.scope == scope]
+            phases = [phase for phase in phases if phase["scope"] == scope]
+        methods = {}
+        for call in calls:
+            methods.setdefault(call.tag, []).append(call)
+        summary = {}
+        for tag, group in sorted(methods.items()):
+            fetched = [call for call in group if not call.cache_hit]
+            summary[tag] = {
+                "calls": len(group),
+                "cache_hits": len(group) - len(fetched),
+                "errors": sum(1 for call in group if call.error),
+                "retries": sum(call.retries for call in group),
+                "prompt_tokens": sum(call.prompt_tokens or 0 for call in group),
+                "completion_tokens": sum(call.completion_tokens or 0 for call in group),
+                "rate_limit_wait": sum(call.wait for call in group),
+                "latency": distribution([call.latency for call in fetched]),
+                "ttfb": distribution([call.ttfb for call in fetched if call.ttfb is not None]),
+                "ttft": distribution([call.ttft for call in fetched if call.ttft is not None]),
+            }
+        return dict(extra, generated_at=time.time(), methods=summary, phases=phases,
+                    calls=[call.to_dict() for call in calls])
+
+    def export(self, directory, run_id, since=(0, 0), scope=None, **extra):
+        """
+        Writes the run report as `<run_id>.json` and the Prometheus metrics as `<run_id>.prom`
+        plus `latest.prom` (for a node-exporter textfile collector) in the given directory.
+        :return: Tuple of (json_path, prom_path).
+        """
+        report = self.report(since, scope, run_id=run_id, **extra)
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{run_id}.json")
+        prom_path = os.path.join(directory, f"{run_id}.prom")
+        atomic_write(json_path, json.dumps(report, indent=2, default=str))
+        text = prometheus_text(report)
+        atomic_write(prom_path, text)
+        atomic_write(os.path.join(directory, "latest.prom"), text)
+        return json_path, prom_path
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(report):
+    """
+    Renders a run report in the Prometheus text exposition format: latency/TTFB summaries
+    with p50/p95 quantiles and token, retry, cache-hit and error counters per agent method,
+    plus phase durations.
+    """
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+
+    for metric, key, help_text in (
+        ("llm_call_latency_seconds", "latency", "Latency of LLM calls (cache hits excluded)."),
+        ("llm_call_ttfb_seconds", "ttfb", "Time from request to response headers of LLM calls."),
+    ):
+        header(metric, "summary", help_text)
+        for tag, stats in report["methods"].items():
+            dist = stats[key]
+            if not dist["count"]:
+                continue
+            labels = f'method="{_label(tag)}"'
+            for q in QUANTILES:
+                lines.append(f'{METRIC_PREFIX}_{metric}{{{labels},quantile="{q}"}} {dist[f"p{round(q * 100)}"]}')
+            lines.append(f"{METRIC_PREFIX}_{metric}_sum{{{labels}}} {dist['sum']}")
+            lines.append(f"{METRIC_PREFIX}_{metric}_count{{{labels}}} {dist['count']}")
+
+    header("llm_tokens_total", "counter", "Tokens reported in response.usage.")
+    for tag, stats in report["methods"].items():
+        for kind in ("prompt", "completion"):
+            lines.append(f'{METRIC_PREFIX}_llm_tokens_total{{method="{_label(tag)}",kind="{kind}"}} '
+                         f'{stats[kind + "_tokens"]}')
+    for metric, key, help_text in (
+        ("llm_calls_total", "calls", "LLM calls, including cache hits."),
+        ("llm_cache_hits_total", "cache_hits", "LLM calls answered from the response cache."),
+        ("llm_retries_total", "retries", "Retried LLM requests."),
+        ("llm_errors_total", "errors", "LLM calls that failed."),
+    ):
+        header(metric, "counter", help_text)
+        for tag, stats in report["methods"].items():
+            lines.append(f'{METRIC_PREFIX}_{metric}{{method="{_label(tag)}"}} {stats[key]}')
+
+    header("phase_duration_seconds", "gauge", "Duration of each development flow phase.")
+    for phase in report["phases"]:
+        if phase["duration"] is not None:
+            lines.append(f'{METRIC_PREFIX}_phase_duration_seconds{{phase="{_label(phase["phase"])}",'
+                         f'status="{_label(phase["status"])}"}} {phase["duration"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,306 @@
+import os
+import re
+import ast
+import json
+import threading
+from utils.helper_functions import atomic_write
+
+DEFAULT_CHEAP_MODEL = "gpt-4o-mini"
+DEFAULT_MIN_ACCEPTANCE = 0.3
+DEFAULT_MIN_SAMPLES = 20
+FENCED_BLOCK = re.compile(r"```[\w+-]*[ \t]*\n(.*?)(?:```|\Z)", re.S)
+
+# USD per million (prompt, completion) tokens, used to estimate the cost of each route.
+DEFAULT_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+# Tags whose requests try a cheap model first, with the validators their output must pass.
+CHEAP_FIRST_ROUTES = {
+    "PlanningAgent.get_task_description": ["nonempty"],
+    "PlanningAgent.get_batch_descriptions": ["json"],
+    "TestAgent.get_test_suggestions": ["nonempty"],
+    "DocumentationAgent.summarize_package": ["nonempty"],
+    "DocumentationAgent.document_module": ["nonempty"],
+}
+# Tags whose output is validated on the requested model only.
+VALIDATED_ROUTES = {
+    "PlanningAgent.generate_plan_script": ["python"],
+    "BuildAgent.get_code_output": ["python"],
+    "TestAgent.generate_test_suite_script": ["python"],
+    "DeploymentAgent.generate_deployment_script": ["python"],
+}
+
+
+def default_routes(cheap_model=None):
+    """
+    Builds the default routes. Requests are sent to the listed models in order and escalate
+    when a validator rejects the output; the model the agent asked for is always the last
+    resort. Routes without models only record how often the requested model's output passes
+    the validators.
+    :param cheap_model: Model tried first on the CHEAP_FIRST_ROUTES tags; None leaves those
+                        routes validating the requested model only.
+    """
+    models = [cheap_model] if cheap_model else []
+    routes = {tag: {"models": models, "validators": validators} for tag, validators in CHEAP_FIRST_ROUTES.items()}
+    routes.update({tag: {"validators": validators} for tag, validators in VALIDATED_ROUTES.items()})
+    return routes
+
+
+def strip_code_fences(text):
+    """
+    Returns the code of a response: the contents of its fenced blocks if it has any
+    (an unterminated last block included), otherwise the text itself.
+    """
+    blocks = FENCED_BLOCK.findall(text)
+    return "\n".join(blocks) if blocks else text
+
+
+def check_nonempty(text):
+    return None if text.strip() else "empty"
+
+
+def check_json(text):
+    try:
+        json.loads(text)
+    except ValueError:
+        return "invalid_json"
+    return None
+
+
+def check_python(text):
+    try:
+        ast.parse(strip_code_fences(text))
+    except (SyntaxError, ValueError):
+        return "syntax_error"
+    return None
+
+
+# Validators take the response text and return None if it is acceptable, otherwise a reason.
+VALIDATORS = {
+    "nonempty": check_nonempty,
+    "json": check_json,
+    "python": check_python,
+}
+
+
+class Route:
+    """
+    Escalation chain of one agent method: the models to try in order and the checks an
+    output must pass to be accepted.
+    """
+
+    def __init__(self, models=(), validators=(), escalate_on_truncation=True):
+        """
+        :param models: Models tried before the requested one, cheapest first.
+        :param validators: Names of VALIDATORS entries the output must pass.
+        :param escalate_on_truncation: If True, an output cut short by max_tokens is rejected.
+        """
+        unknown = [name for name in validators if name not in VALIDATORS]
+        if unknown:
+            raise ValueError(f"Unknown validators: {', '.join(unknown)}")
+        self.models = list(models)
+        self.validators = list(validators)
+        self.escalate_on_truncation = escalate_on_truncation
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Builds a route from its configuration: a list of models or a dict with "models",
+        "validators" and "escalate_on_truncation".
+        """
+        if isinstance(spec, (list, tuple)):
+            return cls(spec)
+        return cls(spec.get("models", ()), spec.get("validators", ()), spec.get("escalate_on_truncation", True))
+
+    def chain(self, requested):
+        return [model for model in self.models if model != requested] + [requested]
+
+    def check(self, text, finish_reason=None):
+        """
+        :return: None if the output is accepted, otherwise the reason it is rejected.
+        """
+        if self.escalate_on_truncation and finish_reason == "length":
+            return "truncated"
+        for name in self.validators:
+            reason = VALIDATORS[name](text)
+            if reason:
+                return reason
+        return None
+
+
+class ModelRouter:
+    """
+    Per-agent, per-method model routing with validator-driven escalation.
+
+    Routes are looked up by the request tag ("Agent.method"), then by the agent name, then
+    under "*". Every attempt is recorded per (tag, model) with its outcome, latency, tokens and
+    estimated cost; the statistics accumulate across runs in a JSON file. A cheap model whose
+    output is accepted too rarely for a route is skipped once enough samples were collected.
+    """
+
+    def __init__(self, routes=None, prices=None, stats_path=None, min_acceptance=DEFAULT_MIN_ACCEPTANCE,
+                 min_samples=DEFAULT_MIN_SAMPLES):
+        """
+        :param routes: Dict mapping a tag, an agent name or "*" to a route specification.
+        :param prices: Dict mapping models to USD per million (prompt, completion) tokens.
+        :param stats_path: Optional JSON file the outcome statistics are accumulated in.
+        :param min_acceptance: Acceptance rate below which a non-final model is skipped.
+        :param min_samples: Attempts needed before a model can be skipped.
+        """
+        self.routes = {key: Route.from_spec(spec) for key, spec in (routes or {}).items() if spec}
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.stats_path = stats_path
+        self.min_acceptance = min_acceptance
+        self.min_samples = min_samples
+        self.stats = {}  # (tag, model) -> counters of this process
+        self.history = self._load()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds the router described by the "model_routing", "model_cheap", "model_routes",
+        "model_prices", "model_route_stats", "model_route_min_acceptance" and
+        "model_route_min_samples" settings.
+        Routes in "model_routes" extend the default routes; a null route removes a default one.
+        The default routes try "model_cheap" first, which is DEFAULT_CHEAP_MODEL on the OpenAI
+        API; with a custom "openai_base_url" there is no cheap model unless it is configured,
+        since that endpoint may not serve it.
+        :return: A ModelRouter, or None when routing is disabled.
+        """
+        if not config.get("model_routing", True):
+            return None
+        cheap_model = config.get("model_cheap", None if config.get("openai_base_url") else DEFAULT_CHEAP_MODEL)
+        routes = default_routes(cheap_model)
+        routes.update(config.get("model_routes") or {})
+        state_dir = config.get("state_dir", ".devautomator")
+        return cls(
+            routes,
+            prices=config.get("model_prices"),
+            stats_path=config.get("model_route_stats", os.path.join(state_dir, "model_routes.json")),
+            min_acceptance=config.get("model_route_min_acceptance", DEFAULT_MIN_ACCEPTANCE),
+            min_samples=config.get("model_route_min_samples", DEFAULT_MIN_SAMPLES),
+        )
+
+    def _load(self):
+        if not self.stats_path:
+            return {}
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f).get("routes", {})
+        except (OSError, ValueError):
+            return {}
+
+    def route(self, tag):
+        """
+        :return: The Route applying to a request tag, or None.
+        """
+        if tag in self.routes:
+            return self.routes[tag]
+        agent = tag.split(".", 1)[0]
+        return self.routes.get(agent) or self.routes.get("*")
+
+    def _counters(self, tag, model):
+        return self.history.get(tag, {}).get(model, {}), self.stats.get((tag, model), {})
+
+    def acceptance(self, tag, model):
+        """
+        :return: Tuple of (attempts, acceptance rate) of a model on a route, across runs.
+        """
+        saved, current = self._counters(tag, model)
+        attempts = saved.get("attempts", 0) + current.get("attempts", 0)
+        accepted = saved.get("accepted", 0) + current.get("accepted", 0)
+        return attempts, (accepted / attempts if attempts else None)
+
+    def candidates(self, tag, requested):
+        """
+        Returns the models to try for a request, in order, leaving out the non-final models
+        whose output this route rejects too often.
+        """
+        route = self.route(tag)
+        if route is None:
+            return [requested]
+        chain = route.chain(requested)
+        kept = []
+        for model in chain[:-1]:
+            attempts, rate = self.acceptance(tag, model)
+            if attempts >= self.min_samples and rate < self.min_acceptance:
+                continue
+            kept.append(model)
+        return kept + chain[-1:]
+
+    def cost(self, model, prompt_tokens, completion_tokens):
+        prices = self.prices.get(model)
+        if prices is None:
+            return None
+        return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1e6
+
+    def record(self, tag, model, outcome, call=None):
+        """
+        Records one attempt.
+        :param tag: Request tag.
+        :param model: Model that was tried.
+        :param outcome: "accepted", "error" or the rejection reason.
+        :param call: Optional CallRecord with the latency and token usage of the attempt.
+        """
+        with self._lock:
+            counters = self.stats.setdefault((tag, model), {})
+            counters["attempts"] = counters.get("attempts", 0) + 1
+            key = outcome if outcome in ("accepted", "error") else f"rejected_{outcome}"
+            counters[key] = counters.get(key, 0) + 1
+            if call is not None and not call.cache_hit:
+                counters["latency_seconds"] = counters.get("latency_seconds", 0.0) + (call.latency or 0.0)
+                counters["prompt_tokens"] = counters.get("prompt_tokens", 0) + (call.prompt_tokens or 0)
+                counters["completion_tokens"] = counters.get("completion_tokens", 0) + (call.completion_tokens or 0)
+                cost = self.cost(model, call.prompt_tokens, call.completion_tokens)
+                if cost is not None:
+                    counters["cost_usd"] = counters.get("cost_usd", 0.0) + cost
+
+    def summary(self, include_history=False):
+        """
+        Returns the outcome statistics per tag and model, with the acceptance rate and the mean
+        latency and cost per attempt.
+        :param include_history: If True, the statistics of previous runs are included.
+        """
+        with self._lock:
+            merged = {}
+            if include_history:
+                for tag, models in self.history.items():
+                    for model, counters in models.items():
+                        merged[(tag, model)] = dict(counters)
+            for key, counters in self.stats.items():
+                target = merged.setdefault(key, {})
+                for name, value in counters.items():
+                    target[name] = target.get(name, 0) + value
+        summary = {}
+        for (tag, model), counters in sorted(merged.items()):
+            attempts = counters.get("attempts", 0)
+            entry = dict(counters)
+            entry["acceptance_rate"] = round(counters.get("accepted", 0) / attempts, 3) if attempts else None
+            fetched = counters.get("latency_seconds")
+            entry["mean_latency_seconds"] = round(fetched / attempts, 3) if fetched is not None and attempts else None
+            cost = counters.get("cost_usd")
+            entry["mean_cost_usd"] = cost / attempts if cost is not None and attempts else None
+            summary.setdefault(tag, {})[model] = entry
+        return summary
+
+    def save(self):
+        """
+        Adds the statistics of this process to the stats file and resets them.
+        """
+        if not self.stats_path:
+            return
+        with self._lock:
+            current, self.stats = self.stats, {}
+        if not current:
+            return
+        history = self._load()
+        for (tag, model), counters in current.items():
+            target = history.setdefault(tag, {}).setdefault(model, {})
+            for name, value in counters.items():
+                target[name] = target.get(name, 0) + value
+        atomic_write(self.stats_path, json.dumps({"routes": history}, indent=2, sort_keys=True))
+        self.history = history
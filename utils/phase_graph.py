@@ -0,0 +1,286 @@
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Phase:
+    """
+    A node of the development flow: a unit of work with named inputs and outputs.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), arun=None, check=None, checkpoint=True,
+                 fingerprint=None, restore=None):
+        """
+        :param name: Unique phase name, used as the key in the results dictionary.
+        :param run: Callable taking a dict of input values and returning a dict of output values.
+        :param inputs: Names of the values this phase consumes.
+        :param outputs: Names of the values this phase produces.
+        :param arun: Optional coroutine function with the same contract as run, used by PhaseGraph.arun().
+        :param check: Optional predicate on the output dict deciding success; defaults to the
+                      truthiness of the first declared output.
+        :param checkpoint: If False, the phase is never checkpointed or resumed (cheap phases).
+        :param fingerprint: Optional callable returning JSON-serializable data describing state the
+                            phase reads besides its inputs (e.g. source files); part of the checkpoint key.
+        :param restore: Optional callable invoked with the stored outputs when the phase is resumed
+                        from a checkpoint (e.g. to rewrite artifact files).
+        """
+        self.name = name
+        self.run = run
+        self.arun = arun
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.check = check
+        self.checkpoint = checkpoint
+        self.fingerprint = fingerprint
+        self.restore = restore
+
+    def succeeded(self, outputs):
+        if self.check is not None:
+            return bool(self.check(outputs))
+        if not self.outputs:
+            return True
+        return bool(outputs.get(self.outputs[0]))
+
+
+class PhaseGraph:
+    """
+    Dependency graph of phases. A phase becomes ready once every value it consumes has been
+    produced, so independent phases run concurrently and the end-to-end latency is set by
+    the critical path instead of the sum of the phases.
+    """
+
+    def __init__(self, phases, logger=None, checkpoints=None, resume=False):
+        """
+        :param phases: Iterable of Phase objects.
+        :param logger: Optional logger for phase failures.
+        :param checkpoints: Optional CheckpointStore receiving the outputs of successful phases.
+        :param resume: If True, a phase whose checkpoint key matches a stored checkpoint is not
+                       run; its stored outputs are used instead.
+        """
+        self.phases = {phase.name: phase for phase in phases}
+        self.logger = logger
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.producers = {}
+        for phase in self.phases.values():
+            for output in phase.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both '{self.producers[output]}' and '{phase.name}'.")
+                self.producers[output] = phase.name
+        self._check_acyclic()
+
+    def dependencies(self, name):
+        """
+        Returns the names of the phases whose outputs the given phase consumes.
+        """
+        return {self.producers[value] for value in self.phases[name].inputs if value in self.producers}
+
+    def select(self, names):
+        """
+        Returns the subgraph running only the given phases and the phases they depend on.
+        :param names: Names of the phases to run.
+        :return: A new PhaseGraph with the same logger and checkpoint settings.
+        """
+        unknown = [name for name in names if name not in self.phases]
+        if unknown:
+            raise ValueError(f"Unknown phases: {', '.join(unknown)} (available: {', '.join(self.phases)})")
+        selected = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.dependencies(name))
+        return PhaseGraph([phase for name, phase in self.phases.items() if name in selected],
+                          logger=self.logger, checkpoints=self.checkpoints, resume=self.resume)
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Phase graph has a cycle through '{name}'.")
+            visiting.add(name)
+            for dep in self.dependencies(name):
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.phases:
+            visit(name)
+
+    def _ready(self, pending, state):
+        """
+        Splits the pending phases into those that can start now and those that can never run.
+        """
+        ready, blocked = [], []
+        for name in pending:
+            deps = self.dependencies(name)
+            if any(state.statuses.get(dep) in ("Failed", "Skipped") for dep in deps):
+                blocked.append(name)
+            elif all(state.statuses.get(dep) == "Success" for dep in deps):
+                ready.append(name)
+        return ready, blocked
+
+    def _inputs(self, phase, values):
+        missing = [value for value in phase.inputs if value not in values]
+        if missing:
+            raise KeyError(f"Phase '{phase.name}' is missing inputs: {', '.join(missing)}")
+        return {value: values[value] for value in phase.inputs}
+
+    def _finish(self, state, name, outputs, error, start):
+        phase = self.phases[name]
+        end = time.time()
+        state.timestamps[name] = {"start": start, "end": end, "duration": round(end - start, 3)}
+        if error is not None:
+            if self.logger:
+                self.logger.error(f"{name.capitalize()} phase failed: {error}")
+            state.statuses[name] = "Failed"
+            return
+        outputs = outputs or {}
+        state.values.update({key: outputs[key] for key in phase.outputs if key in outputs})
+        state.statuses[name] = "Success" if phase.succeeded(outputs) else "Failed"
+        key = state.keys.get(name)
+        if key is not None and state.statuses[name] == "Success":
+            try:
+                self.checkpoints.save(name, key, {k: outputs[k] for k in phase.outputs if k in outputs})
+            except OSError as e:
+                if self.logger:
+                    self.logger.warning(f"Failed to checkpoint the {name} phase: {e}")
+
+    def _resumed(self, state, name):
+        """
+        Computes the checkpoint key of a phase that is ready to run and, in resume mode, completes
+        the phase from its stored outputs.
+        :return: True if the phase was restored from a checkpoint and must not run.
+        """
+        phase = self.phases[name]
+        if self.checkpoints is None or not phase.checkpoint:
+            return False
+        try:
+            key = self.checkpoints.key(phase, self._inputs(phase, state.values))
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Cannot compute the checkpoint key of the {name} phase: {e}")
+            return False
+        state.keys[name] = key
+        outputs = self.checkpoints.load(name, key) if self.resume else None
+        if outputs is None:
+            return False
+        if phase.restore is not None:
+            phase.restore(outputs)
+        now = time.time()
+        state.values.update(outputs)
+        state.statuses[name] = "Success"
+        state.timestamps[name] = {"start": now, "end": now, "duration": 0.0, "resumed": True}
+        state.resumed.append(name)
+        if self.logger:
+            self.logger.info(f"{name.capitalize()} phase resumed from checkpoint {key[:12]}.")
+        return True
+
+    def _skip(self, state, names):
+        for name in names:
+            if self.logger:
+                self.logger.warning(f"{name.capitalize()} phase skipped: a phase it depends on did not succeed.")
+            state.statuses[name] = "Skipped"
+
+    def run(self, values=None, max_workers=4):
+        """
+        Runs every phase on a thread pool as soon as its inputs are available.
+
+        :param values: Optional dict of seed values available to every phase.
+        :param max_workers: Maximum number of phases running at once.
+        :return: A GraphRun with the produced values, per-phase statuses and timestamps.
+        """
+        state = GraphRun(values)
+        pending = set(self.phases)
+        running = {}
+
+        def call(name, start):
+            phase = self.phases[name]
+            try:
+                return phase.run(self._inputs(phase, state.values)), None, start
+            except Exception as e:
+                return None, e, start
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                ready, blocked = self._ready(pending, state)
+                self._skip(state, blocked)
+                pending.difference_update(blocked)
+                for name in ready:
+                    pending.discard(name)
+                    if not self._resumed(state, name):
+                        # Phases see the caller's context variables (e.g. the metrics scope)
+                        running[executor.submit(contextvars.copy_context().run, call, name, time.time())] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs, error, start = future.result()
+                    self._finish(state, name, outputs, error, start)
+        return state
+
+    async def arun(self, values=None):
+        """
+        Runs every phase on the event loop as soon as its inputs are available. Phases without
+        an async implementation are run in a worker thread.
+
+        :param values: Optional dict of seed values available to every phase.
+        :return: A GraphRun with the produced values, per-phase statuses and timestamps.
+        """
+        state = GraphRun(values)
+        pending = set(self.phases)
+        running = {}
+
+        async def call(name):
+            phase = self.phases[name]
+            start = time.time()
+            try:
+                inputs = self._inputs(phase, state.values)
+                if phase.arun is not None:
+                    outputs = await phase.arun(inputs)
+                else:
+                    outputs = await asyncio.to_thread(phase.run, inputs)
+                return outputs, None, start
+            except Exception as e:
+                return None, e, start
+
+        while pending or running:
+            ready, blocked = self._ready(pending, state)
+            self._skip(state, blocked)
+            pending.difference_update(blocked)
+            for name in ready:
+                pending.discard(name)
+                # Fingerprints may walk the file system, so they are computed off the event loop
+                if self.phases[name].fingerprint is not None and self.checkpoints is not None:
+                    resumed = await asyncio.to_thread(self._resumed, state, name)
+                else:
+                    resumed = self._resumed(state, name)
+                if not resumed:
+                    running[asyncio.ensure_future(call(name))] = name
+            if not running:
+                continue
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                outputs, error, start = task.result()
+                self._finish(state, name, outputs, error, start)
+        return state
+
+
+class GraphRun:
+    """
+    Outcome of a PhaseGraph run.
+    """
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.statuses = {}
+        self.timestamps = {}
+        self.keys = {}  # phase name -> checkpoint key
+        self.resumed = []  # phases completed from a checkpoint
@@ -0,0 +1,163 @@
+import time
+import random
+import asyncio
+import threading
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 150000
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` units and refills continuously so that
+    `capacity` units become available per minute.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Returns how long to wait before `amount` units are available (0 if they are now).
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Process-wide limiter tracking requests-per-minute and tokens-per-minute, shared by every
+    agent that talks to the same API account. A rate-limit response pauses all callers until
+    the server's retry-after has elapsed.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        """
+        :param requests_per_minute: Request quota, or None for no request limit.
+        :param tokens_per_minute: Token quota, or None for no token limit.
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """
+        Reserves capacity for one request if it is available.
+        :return: 0 if the request may proceed, otherwise the number of seconds to wait before retrying.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            if self.requests is not None:
+                delay = max(delay, self.requests.wait_time(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.wait_time(tokens, now))
+            if delay > 0:
+                return delay
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            return 0.0
+
+    def acquire(self, tokens=0):
+        """
+        Blocks until one request of roughly `tokens` tokens fits within the quotas.
+        :param tokens: Estimated prompt plus completion tokens of the request.
+        """
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def aacquire(self, tokens=0):
+        """
+        Awaitable variant of acquire().
+        """
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def reconcile(self, estimated, actual):
+        """
+        Corrects the token bucket once the real usage of a request is known.
+        :param estimated: Tokens reserved by acquire().
+        :param actual: Tokens reported in response.usage.
+        """
+        if self.tokens is None or actual is None:
+            return
+        with self._lock:
+            if actual < estimated:
+                self.tokens.give_back(estimated - actual)
+            else:
+                self.tokens.take(actual - estimated)
+
+    def pause(self, seconds):
+        """
+        Holds back every caller for the given number of seconds.
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def get_rate_limiter(api_key="", base_url=None, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                     tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+    """
+    Returns the process-wide limiter for an API account, creating it on first use.
+    Quotas are per account, so every gateway using the same key and endpoint shares one limiter.
+    """
+    key = (api_key, base_url)
+    with _shared_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _shared_limiters[key] = limiter
+        return limiter
+
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE, cap=DEFAULT_BACKOFF_MAX, retry_after=None):
+    """
+    Computes the delay before a retry: the server's retry-after if given, otherwise
+    exponential backoff with full jitter.
+    :param attempt: Zero-based retry attempt.
+    :param base: Delay of the first retry in seconds.
+    :param cap: Upper bound of the delay in seconds.
+    :param retry_after: Optional delay requested by the server, in seconds.
+    :return: Delay in seconds.
+    """
+    if retry_after is not None:
+        return min(cap, retry_after) + random.uniform(0, base / 2)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Rough token estimate of a chat request (about four characters per token).
+    """
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars // 4 + len(messages) * 4 + (max_tokens or 0)
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_TTL = 7 * 24 * 3600  # One week
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 512
+
+
+def make_cache_key(model, messages, max_tokens=None, temperature=None):
+    """
+    Computes the content address of a chat completion request.
+
+    :param model: Model name.
+    :param messages: List of chat messages.
+    :param max_tokens: Completion token limit.
+    :param temperature: Sampling temperature.
+    :return: Hex SHA-256 digest identifying the request.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of chat completion responses.
+
+    Entries live in a SQLite file with a per-entry expiry and are evicted least-recently-used
+    first once the entry-count or byte limit is exceeded. A small in-memory LRU sits in front
+    of the database so repeated hits within a process never touch the disk.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 memory_entries=DEFAULT_MEMORY_ENTRIES):
+        """
+        Opens (or creates) the cache database.
+
+        :param path: Path of the SQLite database file.
+        :param ttl: Default time-to-live of an entry in seconds.
+        :param max_entries: Maximum number of stored entries.
+        :param max_bytes: Maximum total size of stored responses in bytes.
+        :param memory_entries: Number of entries kept in the in-memory front cache.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._touched = {}  # key -> last access time, flushed to disk lazily
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds the response cache described by an agent configuration dictionary.
+
+        :param config: A configuration object/dictionary.
+        :return: A ResponseCache instance, or None if caching is disabled.
+        """
+        if not config.get("llm_cache", True):
+            return None
+        state_dir = config.get("state_dir", ".devautomator")
+        return cls(
+            config.get("llm_cache_path", os.path.join(state_dir, "llm_cache.sqlite3")),
+            ttl=config.get("llm_cache_ttl", DEFAULT_TTL),
+            max_entries=config.get("llm_cache_max_entries", DEFAULT_MAX_ENTRIES),
+            max_bytes=config.get("llm_cache_max_bytes", DEFAULT_MAX_BYTES),
+        )
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Looks up a cached response.
+
+        :param key: Cache key from make_cache_key().
+        :return: The cached response text, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._touched[key] = now
+                self.hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a response and evicts the least recently used entries if the cache is full.
+
+        :param key: Cache key from make_cache_key().
+        :param value: Response text to store.
+        :param ttl: Optional time-to-live in seconds overriding the cache default.
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._flush_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), expires_at, now),
+            )
+            self._remember(key, value, expires_at)
+            self._evict(now)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        for (key,) in evicted:
+            self._memory.pop(key, None)
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of this cache instance.
+
+        :return: Dictionary with "hits", "misses" and "hit_rate".
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        """
+        Flushes pending access times and closes the database.
+        """
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
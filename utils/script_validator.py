@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from utils.helper_functions import atomic_write
+from utils.model_router import strip_code_fences
+
+DEFAULT_DRY_RUN_TIMEOUT = 10.0
+DEFAULT_CACHE_ENTRIES = 512
+# Runs the script's top level under another module name, so its `if __name__ == '__main__'`
+# block (the actual build or deployment) does not execute.
+DRY_RUN_CODE = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__dry_run__')"
+
+
+def strip_artifact(script, path=None):
+    """
+    Reduces a generated script to its code (markdown fences and surrounding prose removed)
+    and, if it was already written to `path`, rewrites that file with the code, so the file
+    holds exactly what is validated.
+    :return: The code, or `script` itself if it is empty.
+    """
+    if not script:
+        return script
+    code = strip_code_fences(script).strip()
+    if path and code and code != script:
+        atomic_write(path, code + "\n")
+    return code
+
+
+def validate_script(source, filename="<generated>", dry_run=False, timeout=DEFAULT_DRY_RUN_TIMEOUT):
+    """
+    Checks a generated script: markdown fences are stripped, then the code is parsed and
+    compiled and, optionally, imported once in an isolated interpreter. Runs in worker processes.
+    :param source: The generated text.
+    :param filename: Name used in error messages.
+    :param dry_run: If True, the compiled script is also executed (without its main block).
+    :param timeout: Seconds the dry run may take.
+    :return: Dictionary with "ok", the failing "stage" ("empty", "syntax", "dry_run" or None),
+             the "error" message and the number of code "lines".
+    """
+    code = strip_code_fences(source or "").strip()
+    result = {"ok": False, "stage": None, "error": None, "lines": len(code.splitlines())}
+    if not code:
+        result.update(stage="empty", error="no code")
+        return result
+    try:
+        compile(code, filename, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        result.update(stage="syntax", error=f"{e.msg} (line {e.lineno})")
+        return result
+    except ValueError as e:  # e.g. null bytes
+        result.update(stage="syntax", error=str(e))
+        return result
+    if dry_run:
+        error = dry_run_script(code, filename, timeout)
+        if error:
+            result.update(stage="dry_run", error=error)
+            return result
+    result["ok"] = True
+    return result
+
+
+def dry_run_script(code, filename, timeout=DEFAULT_DRY_RUN_TIMEOUT):
+    """
+    Executes the top level of a script in a separate interpreter in isolated mode (no user
+    site-packages or PYTHON* variables), inside an empty temporary working directory.
+    :return: None if it ran cleanly, otherwise the error message.
+    """
+    with tempfile.TemporaryDirectory(prefix="devautomator-dry-run-") as workdir:
+        path = os.path.join(workdir, os.path.basename(filename) if filename.endswith(".py") else "script.py")
+        with open(path, "w") as f:
+            f.write(code)
+        try:
+            completed = subprocess.run([sys.executable, "-I", "-c", DRY_RUN_CODE, path], cwd=workdir,
+                                       stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return f"timed out after {timeout}s"
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return lines[-1] if lines else f"exit status {completed.returncode}"
+    return None
+
+
+class ScriptValidator:
+    """
+    Validation stage for the scripts generated by the agents.
+
+    Results are cached by a hash of the script, the check mode and the interpreter version, so
+    an unchanged artifact is never checked twice; the cache is kept in a small JSON file. Several
+    artifacts are checked in parallel, in the given process pool if there is one.
+    """
+
+    def __init__(self, cache_path=None, dry_run=False, timeout=DEFAULT_DRY_RUN_TIMEOUT, executor=None,
+                 max_entries=DEFAULT_CACHE_ENTRIES):
+        """
+        :param cache_path: Optional JSON file the results are cached in.
+        :param dry_run: If True, scripts are also imported once in an isolated subprocess.
+        :param timeout: Seconds a dry run may take.
+        :param executor: Optional process pool the checks run in.
+        :param max_entries: Number of cached results kept.
+        """
+        self.cache_path = cache_path
+        self.dry_run = dry_run
+        self.timeout = timeout
+        self.executor = executor
+        self.max_entries = max_entries
+        self.results = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f).get("results", {})
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, source):
+        mode = f"dry_run={self.timeout}" if self.dry_run else "compile"
+        payload = f"{sys.version}\0{mode}\0{source or ''}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def validate(self, name, source):
+        """
+        Validates one script.
+        :return: The result dictionary of validate_script().
+        """
+        return self.validate_many({name: source})[name]
+
+    def validate_many(self, scripts):
+        """
+        Validates several scripts at once.
+        :param scripts: Dict mapping artifact names (e.g. "build_script.py") to their text.
+        :return: Dict mapping the same names to their result dictionaries.
+        """
+        keys = {name: self.key(source) for name, source in scripts.items()}
+        with self._lock:
+            results = {name: dict(self.results[key], cached=True) for name, key in keys.items() if key in self.results}
+        missing = [name for name in scripts if name not in results]
+        if not missing:
+            return results
+
+        args = [(scripts[name], name, self.dry_run, self.timeout) for name in missing]
+        if self.executor is not None:
+            futures = [self.executor.submit(validate_script, *arg) for arg in args]
+            fresh = [future.result() for future in futures]
+        elif self.dry_run and len(args) > 1:
+            # Dry runs wait on subprocesses, so threads are enough to overlap them
+            with ThreadPoolExecutor(max_workers=len(args)) as pool:
+                fresh = list(pool.map(lambda arg: validate_script(*arg), args))
+        else:
+            fresh = [validate_script(*arg) for arg in args]
+
+        with self._lock:
+            for name, result in zip(missing, fresh):
+                self.results[keys[name]] = result
+                results[name] = dict(result, cached=False)
+            while len(self.results) > self.max_entries:
+                self.results.pop(next(iter(self.results)))
+            self._save()
+        return results
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            atomic_write(self.cache_path, json.dumps({"results": self.results}, indent=2))
+        except OSError:
+            pass  # the cache only saves work
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate generated Python scripts in parallel")
+    parser.add_argument('files', nargs='+', help="Scripts to check")
+    parser.add_argument('--dry-run', action='store_true', help="Also import each script in an isolated interpreter")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_DRY_RUN_TIMEOUT, help="Seconds a dry run may take")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--cache', type=str, default=None, help="Optional JSON file caching the results")
+    args = parser.parse_args()
+
+    scripts = {}
+    for path in args.files:
+        with open(path) as f:
+            scripts[path] = f.read()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        validator = ScriptValidator(args.cache, args.dry_run, args.timeout, executor)
+        results = validator.validate_many(scripts)
+    for path, result in results.items():
+        print(f"{path}: ok" if result["ok"] else f"{path}: {result['stage']}: {result['error']}")
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
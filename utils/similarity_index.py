@@ -0,0 +1,128 @@
+import re
+import zlib
+import numpy as np
+
+MERSENNE_PRIME = (1 << 31) - 1
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 3
+WORD = re.compile(r"\w+")
+
+
+def shingles(text, size=DEFAULT_SHINGLE_SIZE):
+    """
+    Returns the 32-bit hashes of the word n-grams of a text (case and punctuation ignored).
+    :param text: The text.
+    :param size: Number of words per shingle; shorter texts give a single shingle.
+    :return: NumPy array of unique uint64 hashes.
+    """
+    words = WORD.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def optimal_bands(num_perm, threshold):
+    """
+    Picks the LSH banding (bands x rows = num_perm) whose candidate threshold (1/b)^(1/r) is
+    the highest one still below `threshold`, so pairs above it are found with high probability.
+    :return: Tuple of (bands, rows).
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold * 0.9:
+            best = (bands, rows)
+    return best
+
+
+class MinHashIndex:
+    """
+    In-memory near-duplicate index of texts based on MinHash signatures and locality-sensitive
+    hashing.
+
+    Signatures live in one NumPy matrix that grows geometrically. A query only compares the
+    signature against the entries sharing at least one LSH band with it (vectorized), so its
+    cost stays roughly constant as the index grows to thousands of texts.
+    """
+
+    def __init__(self, threshold=0.5, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        """
+        :param threshold: Lowest estimated Jaccard similarity the index must find.
+        :param num_perm: Number of hash permutations (signature length).
+        :param shingle_size: Number of words per shingle.
+        :param seed: Seed of the hash permutations.
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = optimal_bands(num_perm, threshold)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = np.empty((16, num_perm), dtype=np.uint64)
+        self.payloads = []
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def signature(self, text):
+        """
+        :return: The MinHash signature of a text as a uint64 array of length num_perm.
+        """
+        hashes = shingles(text, self.shingle_size) % MERSENNE_PRIME
+        if not len(hashes):
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        # Universal hashing (a * x + b) mod p for every permutation and shingle at once; with
+        # p = 2^31 - 1 the operands stay below 2^31, so the products fit in 64 bits.
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def add(self, text, payload=None, signature=None):
+        """
+        Indexes a text.
+        :param payload: Any object stored with the text and returned by query().
+        :param signature: Optional precomputed signature of the text.
+        :return: The id of the new entry.
+        """
+        signature = self.signature(text) if signature is None else signature
+        entry = len(self.payloads)
+        if entry == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        self.signatures[entry] = signature
+        self.payloads.append(payload)
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(key, []).append(entry)
+        return entry
+
+    def query(self, text, signature=None):
+        """
+        Finds the most similar indexed text.
+        :param signature: Optional precomputed signature of the text.
+        :return: Tuple of (entry id, estimated Jaccard similarity) of the best match at or above
+                 the threshold, or (None, 0.0).
+        """
+        signature = self.signature(text) if signature is None else signature
+        candidates = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+        if not candidates:
+            return None, 0.0
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self.signatures[ids] == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None, 0.0
+        return int(ids[best]), float(similarities[best])
+
+
+def signature_similarity(first, second):
+    """
+    Estimated Jaccard similarity of two texts from their MinHash signatures.
+    """
+    return float((first == second).mean())
@@ -0,0 +1,231 @@
+import os
+import re
+import ast
+import json
+import threading
+from utils.helper_functions import atomic_write
+from utils.tree_index import TreeIndex
+
+INDEX_VERSION = 1
+KIND_WEIGHTS = {"module": 5.0, "class": 4.0, "function": 3.0, "method": 2.0}
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9]+")
+
+
+def count_tokens(text):
+    """
+    Rough token count of a text (about four characters per token).
+    """
+    return len(text) // 4 + 1
+
+
+def clip_to_budget(text, budget):
+    """
+    Truncates a text to roughly `budget` tokens on a line boundary.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    clipped = text[:budget * 4]
+    clipped = clipped[:clipped.rfind("\n") + 1] or clipped
+    return clipped + "... (truncated)\n"
+
+
+def first_line(docstring):
+    return docstring.strip().splitlines()[0].strip() if docstring and docstring.strip() else ""
+
+
+def signature(node):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def extract_symbols(source, filename="<unknown>"):
+    """
+    Parses a module and lists its classes, functions and methods.
+    :return: Tuple of (module docstring summary, list of symbol dicts).
+    """
+    tree = ast.parse(source, filename=filename)
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(base) for base in node.bases)
+            symbols.append({
+                "kind": "class", "name": node.name, "line": node.lineno,
+                "signature": f"class {node.name}({bases})" if bases else f"class {node.name}",
+                "doc": first_line(ast.get_docstring(node)),
+            })
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append({
+                        "kind": "method", "name": f"{node.name}.{item.name}", "line": item.lineno,
+                        "signature": signature(item), "doc": first_line(ast.get_docstring(item)),
+                    })
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append({
+                "kind": "function", "name": node.name, "line": node.lineno,
+                "signature": signature(node), "doc": first_line(ast.get_docstring(node)),
+            })
+    return first_line(ast.get_docstring(tree)), symbols
+
+
+class SymbolIndex:
+    """
+    Per-file cached index of a project's modules, classes, functions and signatures, parsed
+    with `ast`. Files are re-parsed only when their mtime or size changes.
+    """
+
+    def __init__(self, root=".", state_dir=".devautomator"):
+        """
+        :param root: Project root directory.
+        :param state_dir: Directory holding the persisted index, relative to the root unless absolute.
+        """
+        self.root = os.path.abspath(root)
+        self.tree = TreeIndex(root, state_dir)
+        state_dir = state_dir if os.path.isabs(state_dir) else os.path.join(self.root, state_dir)
+        self.path = os.path.join(state_dir, "symbol_index.json")
+        self.entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return data.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save(self):
+        atomic_write(self.path, json.dumps({"version": INDEX_VERSION, "files": self.entries}))
+
+    def python_files(self):
+        """
+        Lists the project's visible Python files ('/'-separated relative paths).
+        """
+        files = []
+        for relpath, (_, names) in self.tree.refresh().items():
+            files.extend(f"{relpath}/{name}" if relpath else name for name in names if name.endswith(".py"))
+        return sorted(files)
+
+    def build(self):
+        """
+        Brings the index up to date.
+        :return: Dict mapping relative path to {"module", "doc", "symbols", "mtime", "size"}.
+        """
+        with self._lock:
+            if self.entries is None:
+                self.entries = self._load()
+            files = self.python_files()
+            changed = False
+            fresh = {}
+            for relpath in files:
+                full = os.path.join(self.root, relpath)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entry = self.entries.get(relpath)
+                if entry is None or entry["mtime"] != st.st_mtime_ns or entry["size"] != st.st_size:
+                    try:
+                        with open(full, "rb") as f:
+                            doc, symbols = extract_symbols(f.read(), relpath)
+                    except (SyntaxError, ValueError, OSError):
+                        doc, symbols = "", []
+                    module = relpath[:-3].replace("/", ".")
+                    if module.endswith(".__init__"):
+                        module = module[:-len(".__init__")]
+                    entry = {"module": module, "doc": doc, "symbols": symbols,
+                             "mtime": st.st_mtime_ns, "size": st.st_size}
+                    changed = True
+                fresh[relpath] = entry
+            if changed or set(fresh) != set(self.entries):
+                self.entries = fresh
+                self._save()
+            return dict(self.entries)
+
+
+def render_module(relpath, entry, symbols=None):
+    """
+    Renders one module and the given subset of its symbols (all by default) as compact text.
+    """
+    header = f"{relpath}" + (f" — {entry['doc']}" if entry["doc"] else "")
+    lines = [header]
+    for symbol in entry["symbols"] if symbols is None else symbols:
+        indent = "    " if symbol["kind"] == "method" else "  "
+        lines.append(indent + symbol["signature"] + (f"  # {symbol['doc']}" if symbol["doc"] else ""))
+    return "\n".join(lines)
+
+
+def score_symbol(relpath, symbol, terms):
+    """
+    Relevance of a symbol for the documentation prompt: public API, documented symbols and
+    names matching the project summary rank higher; test modules rank lower.
+    """
+    name = symbol["name"].rsplit(".", 1)[-1]
+    score = KIND_WEIGHTS[symbol["kind"]]
+    if not name.startswith("_"):
+        score += 2.0
+    if symbol["doc"]:
+        score += 1.0
+    words = {word.lower() for word in WORD.findall(symbol["name"] + " " + symbol["doc"])}
+    score += 3.0 * len(words & terms)
+    basename = os.path.basename(relpath)
+    if basename.startswith("test_") or basename.endswith("_test.py") or "/tests/" in f"/{relpath}":
+        score *= 0.3
+    return score
+
+
+def pack_symbols(entries, budget, query=""):
+    """
+    Picks the most relevant symbols that fit in a token budget and renders them grouped by module.
+
+    :param entries: Index entries from SymbolIndex.build().
+    :param budget: Token budget for the rendered text.
+    :param query: Text (e.g. the project summary) whose words boost matching symbols.
+    :return: The rendered context string.
+    """
+    terms = {word.lower() for word in WORD.findall(query)}
+    candidates = []
+    for relpath, entry in entries.items():
+        for symbol in entry["symbols"]:
+            candidates.append((score_symbol(relpath, symbol, terms), relpath, symbol))
+    candidates.sort(key=lambda item: item[0], reverse=True)
+
+    chosen = {}
+    used = 0
+    for _, relpath, symbol in candidates:
+        cost = count_tokens(symbol["signature"] + symbol["doc"]) + 1
+        if relpath not in chosen:
+            cost += count_tokens(render_module(relpath, entries[relpath], []))
+        if used + cost > budget:
+            continue
+        chosen.setdefault(relpath, []).append(symbol)
+        used += cost
+
+    blocks = []
+    for relpath in sorted(chosen):
+        symbols = sorted(chosen[relpath], key=lambda symbol: symbol["line"])
+        blocks.append(render_module(relpath, entries[relpath], symbols))
+    omitted = len(candidates) - sum(len(symbols) for symbols in chosen.values())
+    if omitted:
+        blocks.append(f"... ({omitted} less relevant symbols omitted)")
+    return "\n".join(blocks)
+
+
+def group_by_package(entries):
+    """
+    Groups index entries by top-level package; root-level modules form the "(root)" group.
+    """
+    groups = {}
+    for relpath, entry in entries.items():
+        package = relpath.split("/", 1)[0] if "/" in relpath else "(root)"
+        groups.setdefault(package, {})[relpath] = entry
+    return groups
+
+
+def full_size(entries):
+    """
+    Token count of the complete, unpacked rendering of the index.
+    """
+    return sum(count_tokens(render_module(relpath, entry)) for relpath, entry in entries.items())
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from utils.helper_functions import atomic_write
+from utils.test_selection import tracked_files, file_digest
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_OUTPUT_LINES = 200
+
+
+class TestResultCache:
+    """
+    Build-system style cache of passing test runs.
+
+    A run is keyed on the content hashes of the project's Python files and global test
+    settings (conftest.py, pytest.ini, requirements, ...), the interpreter and the pytest
+    command. File hashes are kept with the mtime and size they were computed for, so only
+    files that changed are read again, and those are hashed in parallel. Only passing runs
+    are stored: a failure is always re-run, so a flaky test cannot stick.
+    """
+
+    __test__ = False  # Not a pytest test class
+
+    def __init__(self, root=".", state_dir=".devautomator", workers=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 output_lines=DEFAULT_OUTPUT_LINES):
+        """
+        :param root: Project root directory.
+        :param state_dir: Directory holding the cache, relative to the root unless absolute.
+        :param workers: Number of threads hashing changed files; defaults to the executor's default.
+        :param max_entries: Number of passing runs kept.
+        :param output_lines: Number of trailing output lines stored per run.
+        """
+        self.root = os.path.abspath(root)
+        self.state_dir = state_dir if os.path.isabs(state_dir) else os.path.join(self.root, state_dir)
+        self.hashes_path = os.path.join(self.state_dir, "file_hashes.json")
+        self.results_path = os.path.join(self.state_dir, "test_results.json")
+        self.workers = workers
+        self.max_entries = max_entries
+        self.output_lines = output_lines
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def tracked_files(self):
+        """
+        Lists the files a test run depends on (relative paths): the same set test selection
+        fingerprints (see test_selection.tracked_files).
+        """
+        return tracked_files(self.root)
+
+    def file_hashes(self):
+        """
+        Hashes the tracked files, reusing the stored hash of every file whose mtime and size
+        are unchanged and hashing the others in parallel.
+        :return: Dict mapping relative path to sha256.
+        """
+        previous = self._load(self.hashes_path)
+        current, stale = {}, []
+        for relpath in self.tracked_files():
+            try:
+                st = os.stat(os.path.join(self.root, relpath))
+            except OSError:
+                continue
+            old = previous.get(relpath)
+            if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+                current[relpath] = old
+            else:
+                stale.append((relpath, st.st_mtime_ns, st.st_size))
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                digests = pool.map(lambda item: file_digest(os.path.join(self.root, item[0])), stale)
+                for (relpath, mtime, size), digest in zip(stale, digests):
+                    current[relpath] = [mtime, size, digest]
+        if current != previous:
+            atomic_write(self.hashes_path, json.dumps(current))
+        return {relpath: entry[2] for relpath, entry in current.items()}
+
+    def key(self, command):
+        """
+        Computes the cache key of a test run.
+        :param command: The pytest command (list of arguments) without test targets.
+        :return: Hex sha256 digest.
+        """
+        digest = hashlib.sha256()
+        executable = shutil.which(command[0]) if command else None
+        digest.update(json.dumps([sys.version, sys.executable, executable, list(command)]).encode("utf-8"))
+        for relpath, file_hash in sorted(self.file_hashes().items()):
+            digest.update(f"\0{relpath}\0{file_hash}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        :return: The stored run ({"passed", "output", "duration", "created"}) or None.
+        """
+        return self._load(self.results_path).get("entries", {}).get(key)
+
+    def put(self, key, passed, output="", duration=None):
+        """
+        Stores the outcome of a run under its key; failed runs are not stored.
+        :param output: The run's output; only the trailing lines are kept.
+        """
+        if not passed:
+            return
+        entries = self._load(self.results_path).get("entries", {})
+        entries.pop(key, None)
+        entries[key] = {
+            "passed": True,
+            "output": "\n".join(output.splitlines()[-self.output_lines:]),
+            "duration": duration,
+            "created": time.time(),
+        }
+        while len(entries) > self.max_entries:
+            entries.pop(next(iter(entries)))
+        atomic_write(self.results_path, json.dumps({"entries": entries}))
@@ -0,0 +1,241 @@
+import os
+import ast
+import json
+import fnmatch
+import hashlib
+from utils.helper_functions import atomic_write
+
+SKIP_DIRS = {"__pycache__", "node_modules", "venv", "env", "build", "dist", "site-packages"}
+TEST_PATTERNS = ("test_*.py", "*_test.py")
+# Files whose change can affect any test, so they force a full run.
+GLOBAL_FILES = {"conftest.py", "pytest.ini", "setup.cfg", "tox.ini", "pyproject.toml", "requirements.txt", "setup.py"}
+
+
+def skip_dir(name):
+    """
+    Returns True for directories that never contain project sources (VCS data, caches, virtualenvs).
+    """
+    return name.startswith(".") or name in SKIP_DIRS or name.endswith(".egg-info")
+
+
+def is_test_file(path):
+    return any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in TEST_PATTERNS)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def python_files(root):
+    """
+    Lists the Python files under a project root (relative paths), skipping VCS data, caches and
+    virtualenvs.
+    """
+    files = []
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not skip_dir(d))
+        for name in sorted(names):
+            if name.endswith(".py"):
+                files.append(os.path.relpath(os.path.join(directory, name), root))
+    return files
+
+
+def tracked_files(root, files=None):
+    """
+    Lists the files a test run depends on: the given Python files (by default every one under
+    the root) plus the global test settings present at the root. Test selection and the test
+    result cache both fingerprint this set.
+    """
+    tracked = list(python_files(root) if files is None else files)
+    tracked.extend(sorted(name for name in GLOBAL_FILES
+                          if not name.endswith(".py") and os.path.isfile(os.path.join(root, name))))
+    return tracked
+
+
+def module_name(relpath):
+    """
+    Converts a project-relative .py path into its dotted module name.
+    """
+    parts = relpath[:-3].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+class TestSelector:
+    """
+    Picks the test modules affected by the source files that changed since the last green run.
+
+    Changes are detected from content hashes (with mtime/size as a shortcut) against the
+    snapshot stored after the last passing run. A static import graph, cached per file,
+    maps each changed file to the test modules that import it directly or transitively.
+    """
+
+    __test__ = False  # Not a pytest test class
+
+    def __init__(self, root=".", state_dir=".devautomator", logger=None):
+        """
+        :param root: Project root directory.
+        :param state_dir: Directory holding the import graph cache and the last green snapshot.
+        :param logger: Optional logger.
+        """
+        self.root = os.path.abspath(root)
+        self.state_dir = state_dir if os.path.isabs(state_dir) else os.path.join(self.root, state_dir)
+        self.graph_path = os.path.join(self.state_dir, "import_graph.json")
+        self.snapshot_path = os.path.join(self.state_dir, "last_green.json")
+        self.logger = logger
+        self._current = None
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, path, data):
+        atomic_write(path, json.dumps(data))
+
+    def python_files(self):
+        """
+        Lists the project's Python files (relative paths), skipping VCS data, caches and virtualenvs.
+        """
+        return python_files(self.root)
+
+    def _stat(self, relpath):
+        st = os.stat(os.path.join(self.root, relpath))
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot(self, files, previous=None):
+        """
+        Fingerprints the tracked files, reusing the previous hash when mtime and size are unchanged.
+        :return: Dict mapping relative path to [mtime_ns, size, sha256].
+        """
+        previous = previous or {}
+        current = {}
+        for relpath in tracked_files(self.root, files):
+            mtime, size = self._stat(relpath)
+            old = previous.get(relpath)
+            if old and old[0] == mtime and old[1] == size:
+                current[relpath] = old
+            else:
+                current[relpath] = [mtime, size, file_digest(os.path.join(self.root, relpath))]
+        return current
+
+    def _imports(self, relpath, modules):
+        """
+        Resolves the project modules imported by one file.
+        """
+        try:
+            with open(os.path.join(self.root, relpath), "rb") as f:
+                tree = ast.parse(f.read(), filename=relpath)
+        except (SyntaxError, ValueError, OSError):
+            return []
+        package = module_name(relpath)
+        if not relpath.endswith("__init__.py"):
+            package = package.rpartition(".")[0]
+        found = set()
+
+        def add(name):
+            # `import a.b.c` executes a, a.b and a.b.c
+            parts = name.split(".")
+            for i in range(1, len(parts) + 1):
+                target = modules.get(".".join(parts[:i]))
+                if target and target != relpath:
+                    found.add(target)
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    add(alias.name)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = package.split(".") if package else []
+                    base = base[:len(base) - (node.level - 1)] if node.level > 1 else base
+                    prefix = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    prefix = node.module or ""
+                if prefix:
+                    add(prefix)
+                for alias in node.names:
+                    add(f"{prefix}.{alias.name}" if prefix else alias.name)
+        return sorted(found)
+
+    def import_graph(self, files):
+        """
+        Builds the static import graph, re-parsing only files whose mtime or size changed.
+        :return: Dict mapping each relative path to the project files it imports.
+        """
+        modules = {module_name(relpath): relpath for relpath in files}
+        # Also resolve imports relative to a src/ layout.
+        for relpath in files:
+            if relpath.startswith("src" + os.sep):
+                modules.setdefault(module_name(relpath[4:]), relpath)
+        cached = self._load(self.graph_path)
+        graph, entries = {}, {}
+        for relpath in files:
+            mtime, size = self._stat(relpath)
+            entry = cached.get(relpath)
+            if not entry or entry["mtime"] != mtime or entry["size"] != size:
+                entry = {"mtime": mtime, "size": size, "imports": self._imports(relpath, modules)}
+            entries[relpath] = entry
+            graph[relpath] = entry["imports"]
+        if entries != cached:
+            self._save(self.graph_path, entries)
+        return graph
+
+    def affected_tests(self, changed, graph):
+        """
+        Returns the test modules that are, or transitively import, one of the changed files.
+        """
+        dependents = {}
+        for relpath, imports in graph.items():
+            for target in imports:
+                dependents.setdefault(target, set()).add(relpath)
+        seen, stack = set(), list(changed)
+        while stack:
+            relpath = stack.pop()
+            if relpath in seen:
+                continue
+            seen.add(relpath)
+            stack.extend(dependents.get(relpath, ()))
+        return sorted(path for path in seen if is_test_file(path))
+
+    def select(self):
+        """
+        Determines which test modules need to run.
+        :return: A sorted list of test file paths (possibly empty), or None if the whole suite
+                 must run (no green snapshot yet, a global file changed, or a file was deleted).
+        """
+        files = self.python_files()
+        previous = self._load(self.snapshot_path)
+        self._current = self.snapshot(files, previous)
+        if not previous:
+            self._log("No previous green run recorded; running the full test suite.")
+            return None
+        if set(previous) - set(self._current):
+            self._log("Files were removed since the last green run; running the full test suite.")
+            return None
+        changed = [path for path, fp in self._current.items() if path not in previous or previous[path][2] != fp[2]]
+        if any(os.path.basename(path) in GLOBAL_FILES for path in changed):
+            self._log("Test configuration changed; running the full test suite.")
+            return None
+        selected = self.affected_tests(changed, self.import_graph(files))
+        self._log(f"{len(changed)} changed file(s) since the last green run; {len(selected)} test module(s) selected.")
+        return selected
+
+    def record_green(self):
+        """
+        Stores the fingerprint taken by the last select() call as the new green baseline.
+        """
+        if self._current is None:
+            self._current = self.snapshot(self.python_files(), self._load(self.snapshot_path))
+        self._save(self.snapshot_path, self._current)
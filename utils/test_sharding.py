@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import heapq
+import asyncio
+import tempfile
+from utils.helper_functions import astream_command, atomic_write
+
+DURATION_LINE = re.compile(r"^\s*(\d+(?:\.\d+)?)s\s+(?:setup|call|teardown)\s+(\S+)\s*$")
+DEFAULT_DURATION = 1.0
+NO_TESTS_COLLECTED = 5  # pytest exit code when a shard selects nothing
+COLLECTION_ERROR = re.compile(r"^(ERROR\b|=+ ERRORS =+$|.*\b\d+ errors? during collection)")
+
+
+def lpt_shards(test_ids, durations, workers):
+    """
+    Splits test IDs into balanced shards with the longest-processing-time-first heuristic:
+    tests are taken longest first and each goes to the currently lightest shard.
+
+    :param test_ids: List of pytest node IDs.
+    :param durations: Dict mapping node ID to its last known duration in seconds.
+    :param workers: Number of shards.
+    :return: List of non-empty shards, each a list of node IDs.
+    """
+    known = sorted(durations[test_id] for test_id in test_ids if test_id in durations)
+    default = known[len(known) // 2] if known else DEFAULT_DURATION
+    ordered = sorted(test_ids, key=lambda test_id: durations.get(test_id, default), reverse=True)
+    heap = [(0.0, i) for i in range(max(1, workers))]
+    shards = [[] for _ in heap]
+    for test_id in ordered:
+        load, index = heapq.heappop(heap)
+        shards[index].append(test_id)
+        heapq.heappush(heap, (load + durations.get(test_id, default), index))
+    return [shard for shard in shards if shard]
+
+
+def parse_durations(output):
+    """
+    Sums the setup/call/teardown times reported by `pytest --durations=0` per node ID.
+    """
+    totals = {}
+    for line in output.splitlines():
+        match = DURATION_LINE.match(line)
+        if match:
+            totals[match.group(2)] = totals.get(match.group(2), 0.0) + float(match.group(1))
+    return totals
+
+
+class ShardedTestRunner:
+    """
+    Runs a pytest suite as N concurrent pytest processes over duration-balanced shards and
+    merges their results. With fail-fast enabled, the first failing shard cancels the rest.
+    """
+
+    def __init__(self, base_command, cwd=".", workers=2, state_dir=".devautomator", fail_fast=True, logger=None,
+                 timeout=None, idle_timeout=None):
+        """
+        :param base_command: pytest command line without test targets (list of arguments).
+        :param cwd: Directory the tests run in.
+        :param workers: Number of pytest processes.
+        :param state_dir: Directory holding the stored test durations.
+        :param fail_fast: If True, the first failing shard terminates the others.
+        :param logger: Optional logger receiving the shards' output as it streams.
+        :param timeout: Optional wall-clock limit per pytest process, in seconds.
+        :param idle_timeout: Optional limit on the time between two output lines, in seconds.
+        """
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.base_command = list(base_command)
+        self.cwd = cwd
+        self.workers = workers
+        self.fail_fast = fail_fast
+        self.logger = logger
+        if not os.path.isabs(state_dir):
+            state_dir = os.path.join(cwd, state_dir)
+        self.state_dir = state_dir
+        self.durations_path = os.path.join(state_dir, "test_durations.json")
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+
+    def load_durations(self):
+        try:
+            with open(self.durations_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_durations(self, durations):
+        atomic_write(self.durations_path, json.dumps(durations, indent=0, sort_keys=True))
+
+    def collect(self, targets=()):
+        """
+        Lists the node IDs pytest would run for the given targets.
+        """
+        return asyncio.run(self.acollect(targets))
+
+    async def acollect(self, targets=()):
+        """
+        Awaitable variant of collect().
+        :return: List of node IDs, or None if collection failed (e.g. a test module does not
+                 import), since the node IDs then miss the tests of the broken modules.
+        """
+        result = await astream_command(
+            [self.base_command[0], "--collect-only", "-q", *targets],
+            cwd=self.cwd, timeout=self.timeout, buffer_lines=None,
+        )
+        if result.returncode not in (0, NO_TESTS_COLLECTED) or any(
+                COLLECTION_ERROR.match(line) for line in result.lines):
+            self._log(f"Test collection failed (exit {result.returncode}).")
+            return None
+        return [line.strip() for line in result.lines if "::" in line]
+
+    def run(self, targets=()):
+        """
+        Collects, shards and runs the tests.
+        :param targets: Optional test files to restrict the run to.
+        :return: Tuple of (passed, combined_output, returncode).
+        """
+        return asyncio.run(self.arun(targets))
+
+    async def arun(self, targets=()):
+        """
+        Awaitable variant of run(); the shards run concurrently on the event loop.
+        :param targets: Optional test files to restrict the run to.
+        :return: Tuple of (passed, combined_output, returncode).
+        """
+        test_ids = await self.acollect(targets)
+        if not test_ids:
+            # A single process reports collection errors itself and fails the run
+            self._log("No tests collected or collection failed; falling back to a single pytest process.")
+            result = await astream_command(self.base_command + list(targets), self.logger, cwd=self.cwd,
+                                           timeout=self.timeout, idle_timeout=self.idle_timeout)
+            passed = result.returncode in (0, NO_TESTS_COLLECTED)
+            return passed, result.output, result.returncode
+
+        durations = self.load_durations()
+        shards = lpt_shards(test_ids, durations, self.workers)
+        self._log(f"Running {len(test_ids)} tests in {len(shards)} shard(s).")
+        measured = {}
+
+        def record(line):
+            match = DURATION_LINE.match(line)
+            if match:
+                measured[match.group(2)] = measured.get(match.group(2), 0.0) + float(match.group(1))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tasks = []
+            for index, shard in enumerate(shards):
+                args_file = os.path.join(tmp, f"shard-{index}.args")
+                with open(args_file, "w") as f:
+                    f.write("\n".join(shard))
+                command = self.base_command + ["--durations=0", "--durations-min=0", f"@{args_file}"]
+                tasks.append(asyncio.ensure_future(astream_command(
+                    command, self.logger, cwd=self.cwd, timeout=self.timeout, idle_timeout=self.idle_timeout,
+                    prefix=f"[shard {index + 1}] ", line_callback=record,
+                )))
+            results = await self._wait(tasks)
+
+        outputs = []
+        returncodes = []
+        for index, result in enumerate(results):
+            if result is None:
+                returncodes.append(None)
+                outputs.append(f"=== shard {index + 1}/{len(shards)} (cancelled) ===")
+            elif isinstance(result, Exception):
+                returncodes.append(None)
+                outputs.append(f"=== shard {index + 1}/{len(shards)} (error: {result}) ===")
+            else:
+                returncodes.append(result.returncode)
+                outputs.append(f"=== shard {index + 1}/{len(shards)} (exit {result.returncode}) ===\n{result.output}")
+        durations.update(measured)
+        self.save_durations(durations)
+
+        failed = [code for code in returncodes if code not in (0, NO_TESTS_COLLECTED, None)]
+        if None in returncodes and not failed:
+            failed = [1]
+        return not failed, "\n".join(outputs), failed[0] if failed else 0
+
+    async def _wait(self, tasks):
+        """
+        Waits for every shard, cancelling (and thereby killing) the remaining ones after the
+        first failure when fail-fast is enabled, and always after a shard raised or the wait
+        itself was cancelled.
+        :return: List in shard order of CommandResult objects, None for cancelled shards and
+                 the exception of shards that raised.
+        """
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                errors = [task for task in done if not task.cancelled() and task.exception() is not None]
+                failed = errors or [task for task in done if not task.cancelled()
+                                    and task.result().returncode not in (0, NO_TESTS_COLLECTED)]
+                if pending and (errors or (failed and self.fail_fast)):
+                    reason = f"raised {errors[0].exception()!r}" if errors else "failed"
+                    self._log(f"Shard {tasks.index(failed[0]) + 1} {reason}; cancelling the remaining shards.")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return [None if task.cancelled() else task.exception() or task.result() for task in tasks]
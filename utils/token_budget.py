@@ -0,0 +1,141 @@
+import os
+import json
+import math
+import threading
+from utils.helper_functions import atomic_write
+from utils.metrics import percentile
+
+DEFAULT_WINDOW = 50
+DEFAULT_MIN_SAMPLES = 5
+DEFAULT_QUANTILE = 0.95
+DEFAULT_HEADROOM = 1.25
+DEFAULT_MIN_TOKENS = 32
+DEFAULT_MAX_TOKENS_CEILING = 4096
+
+
+class TokenBudget:
+    """
+    Learns the completion lengths of every request tag ("Agent.method") and picks the
+    max_tokens of its next requests from them.
+
+    The last `window` lengths of each tag are kept and accumulate across runs in a JSON file.
+    Once a tag has `min_samples` of them, its budget is their 95th percentile plus some
+    headroom instead of the fixed limit in the request: short answers stop reserving (and
+    rate-limiting on) tokens they never use, and outputs that kept hitting the limit get a
+    larger one. A response that was still truncated only gives a lower bound of its length,
+    so it counts double.
+    """
+
+    def __init__(self, stats_path=None, window=DEFAULT_WINDOW, min_samples=DEFAULT_MIN_SAMPLES,
+                 quantile=DEFAULT_QUANTILE, headroom=DEFAULT_HEADROOM, min_tokens=DEFAULT_MIN_TOKENS,
+                 ceiling=DEFAULT_MAX_TOKENS_CEILING):
+        """
+        :param stats_path: Optional JSON file the lengths are accumulated in.
+        :param window: Number of recent lengths kept per tag.
+        :param min_samples: Lengths needed before the requested max_tokens is overridden.
+        :param quantile: Quantile of the recent lengths the budget covers.
+        :param headroom: Factor applied on top of that quantile.
+        :param min_tokens: Smallest budget ever chosen.
+        :param ceiling: Largest budget ever chosen.
+        """
+        self.stats_path = stats_path
+        self.window = window
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.ceiling = ceiling
+        self.tags = self._load()  # tag -> {"lengths": [...], counters}
+        self.pending = {}  # tag -> {"lengths": [...], counters} observed since the last save
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds the budget described by the "llm_adaptive_max_tokens", "llm_token_budget_stats",
+        "llm_token_budget_min_samples" and "llm_max_tokens_ceiling" settings.
+        :return: A TokenBudget, or None when adaptive budgets are disabled.
+        """
+        if not config.get("llm_adaptive_max_tokens", True):
+            return None
+        state_dir = config.get("state_dir", ".devautomator")
+        return cls(
+            stats_path=config.get("llm_token_budget_stats", os.path.join(state_dir, "token_budgets.json")),
+            min_samples=config.get("llm_token_budget_min_samples", DEFAULT_MIN_SAMPLES),
+            ceiling=config.get("llm_max_tokens_ceiling", DEFAULT_MAX_TOKENS_CEILING),
+        )
+
+    def _load(self):
+        if not self.stats_path:
+            return {}
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f).get("tags", {})
+        except (OSError, ValueError):
+            return {}
+
+    def max_tokens(self, tag, requested=None):
+        """
+        Returns the completion token limit of the next request of a tag.
+        :param tag: Request tag.
+        :param requested: The limit the caller asked for, used until enough lengths are known.
+        """
+        with self._lock:
+            lengths = self.tags.get(tag, {}).get("lengths", [])
+            if len(lengths) < self.min_samples:
+                return requested
+            estimate = percentile(lengths, self.quantile)
+        budget = math.ceil(estimate * self.headroom)
+        return max(self.min_tokens, min(self.ceiling, budget))
+
+    def observe(self, tag, completion_tokens, truncated=False, continuations=0):
+        """
+        Records the length of a finished completion.
+        :param tag: Request tag.
+        :param completion_tokens: Tokens generated, continuations included.
+        :param truncated: True if the output was still cut short by max_tokens.
+        :param continuations: Number of continuation requests that were needed.
+        """
+        length = completion_tokens * 2 if truncated else completion_tokens
+        with self._lock:
+            for target in (self.tags.setdefault(tag, {}), self.pending.setdefault(tag, {})):
+                target["lengths"] = (target.get("lengths", []) + [length])[-self.window:]
+                target["requests"] = target.get("requests", 0) + 1
+                target["truncated"] = target.get("truncated", 0) + int(truncated)
+                target["continuations"] = target.get("continuations", 0) + continuations
+
+    def summary(self):
+        """
+        Returns, per tag, the request and continuation counters and the current budget.
+        """
+        with self._lock:
+            tags = {tag: dict(entry) for tag, entry in self.tags.items()}
+        summary = {}
+        for tag, entry in sorted(tags.items()):
+            lengths = entry.pop("lengths", [])
+            entry["samples"] = len(lengths)
+            entry["max_tokens"] = self.max_tokens(tag)
+            summary[tag] = entry
+        return summary
+
+    def save(self):
+        """
+        Adds the lengths observed by this process to the stats file.
+        """
+        if not self.stats_path:
+            return
+        with self._lock:
+            current, self.pending = self.pending, {}
+        if not current:
+            return
+        tags = self._load()
+        for tag, counters in current.items():
+            target = tags.setdefault(tag, {})
+            for name, value in counters.items():
+                if name == "lengths":
+                    target["lengths"] = (target.get("lengths", []) + value)[-self.window:]
+                else:
+                    target[name] = target.get(name, 0) + value
+        atomic_write(self.stats_path, json.dumps({"tags": tags}, indent=2, sort_keys=True))
+        with self._lock:
+            self.tags = tags
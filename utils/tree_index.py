@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import threading
+from utils.helper_functions import atomic_write
+from utils.test_selection import GLOBAL_FILES
+
+ALWAYS_SKIP = {".git", ".hg", ".svn", "node_modules", "__pycache__"}
+INDEX_VERSION = 1
+
+_worker_indexes = {}  # (root, state_dir) -> TreeIndex, reused by the pooled helpers below
+
+
+def translate_gitignore_pattern(pattern):
+    """
+    Converts one .gitignore glob into a regular expression matched against '/'-separated
+    paths relative to the directory holding the .gitignore file.
+    """
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.lstrip("/")
+    i, out = 0, []
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(pattern[i]))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(prefix + "".join(out) + "$")
+
+
+class GitIgnoreRules:
+    """
+    Ordered .gitignore rules collected while walking down the tree; the last matching rule wins.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)  # (base, regex, negated, dir_only)
+
+    def extended(self, base, text):
+        """
+        Returns a new rule set with the patterns of a .gitignore file located in `base` appended.
+        """
+        rules = list(self.rules)
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line:
+                rules.append((base, translate_gitignore_pattern(line), negated, dir_only))
+        return GitIgnoreRules(rules)
+
+    def ignored(self, relpath, is_dir):
+        """
+        :param relpath: '/'-separated path relative to the project root.
+        :param is_dir: Whether the path is a directory.
+        :return: True if the path is ignored.
+        """
+        result = False
+        for base, regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not relpath.startswith(base + "/"):
+                    continue
+                candidate = relpath[len(base) + 1:]
+            else:
+                candidate = relpath
+            if regex.match(candidate):
+                result = not negated
+        return result
+
+
+class TreeIndex:
+    """
+    Persistent index of a project tree, built with os.scandir and honoring .gitignore files.
+
+    Each directory's listing is stored together with its mtime; a refresh re-lists only the
+    directories whose mtime changed (entries added, removed or renamed) and only stats the
+    rest. Ignored directories, the state directory, VCS metadata, node_modules and virtualenvs
+    are never entered.
+    """
+
+    def __init__(self, root=".", state_dir=".devautomator"):
+        """
+        :param root: Project root directory.
+        :param state_dir: Directory holding the persisted index, relative to the root unless absolute.
+        """
+        self.root = os.path.abspath(root)
+        state_dir = state_dir if os.path.isabs(state_dir) else os.path.join(self.root, state_dir)
+        self.path = os.path.join(state_dir, "tree_index.json")
+        # The state directory's own files change on every run; it is skipped wherever it lives.
+        relative = os.path.relpath(state_dir, self.root)
+        self.state_relpath = None if relative.startswith(os.pardir) else relative.replace(os.sep, "/")
+        self.dirs = {}  # relpath -> {"mtime": ns, "dirs": [...], "files": [...]}
+        self.gitignores = {}  # relpath of .gitignore -> {"mtime": ns, "text": str}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.root:
+            self.dirs = data.get("dirs", {})
+            self.gitignores = data.get("gitignores", {})
+
+    def _save(self):
+        atomic_write(self.path, json.dumps({"version": INDEX_VERSION, "root": self.root, "dirs": self.dirs,
+                                            "gitignores": self.gitignores}))
+        self._dirty = False
+
+    @staticmethod
+    def _join(parent, name):
+        return f"{parent}/{name}" if parent else name
+
+    def _listing(self, relpath):
+        """
+        Returns the cached listing of a directory, re-scanning it only if its mtime changed.
+        """
+        full = os.path.join(self.root, relpath) if relpath else self.root
+        mtime = os.stat(full).st_mtime_ns
+        entry = self.dirs.get(relpath)
+        if entry is not None and entry["mtime"] == mtime:
+            return entry
+        dirs, files = [], []
+        with os.scandir(full) as it:
+            for item in it:
+                try:
+                    is_dir = item.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                (dirs if is_dir else files).append(item.name)
+        entry = {"mtime": mtime, "dirs": sorted(dirs), "files": sorted(files)}
+        self.dirs[relpath] = entry
+        self._dirty = True
+        return entry
+
+    def _gitignore_text(self, relpath):
+        full = os.path.join(self.root, relpath)
+        mtime = os.stat(full).st_mtime_ns
+        cached = self.gitignores.get(relpath)
+        if cached is not None and cached["mtime"] == mtime:
+            return cached["text"]
+        try:
+            with open(full, errors="replace") as f:
+                text = f.read()
+        except OSError:
+            text = ""
+        self.gitignores[relpath] = {"mtime": mtime, "text": text}
+        self._dirty = True
+        return text
+
+    def _skip_dir(self, relpath, name):
+        if name in ALWAYS_SKIP or relpath == self.state_relpath:
+            return True
+        # Virtualenvs are recognized by their pyvenv.cfg marker, whatever they are called.
+        return os.path.isfile(os.path.join(self.root, relpath, "pyvenv.cfg"))
+
+    def refresh(self):
+        """
+        Brings the index up to date with the file system.
+        :return: A dict mapping each visible directory (relative path, "" for the root) to its
+                 filtered (dirs, files) listing.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            visible = {}
+            seen = set()
+            stack = [("", GitIgnoreRules())]
+            while stack:
+                relpath, rules = stack.pop()
+                try:
+                    listing = self._listing(relpath)
+                except OSError:
+                    continue
+                seen.add(relpath)
+                if ".gitignore" in listing["files"]:
+                    rules = rules.extended(relpath, self._gitignore_text(self._join(relpath, ".gitignore")))
+                dirs = []
+                for name in listing["dirs"]:
+                    child = self._join(relpath, name)
+                    if self._skip_dir(child, name) or rules.ignored(child, True):
+                        continue
+                    dirs.append(name)
+                    stack.append((child, rules))
+                files = [name for name in listing["files"] if not rules.ignored(self._join(relpath, name), False)]
+                visible[relpath] = (dirs, files)
+
+            stale = set(self.dirs) - seen
+            for relpath in stale:
+                del self.dirs[relpath]
+            if stale:
+                self._dirty = True
+            if self._dirty:
+                self._save()
+            return visible
+
+    def summary(self, max_depth=None, max_entries=None):
+        """
+        Renders the tree as an indented listing (directories first line, then their files,
+        then their subdirectories).
+        :param max_depth: Optional maximum directory depth to descend into (0 = root only).
+        :param max_entries: Optional maximum number of lines; the rest is summarized.
+        :return: The tree as a string.
+        """
+        visible = self.refresh()
+        lines = []
+        total = [0]
+
+        def emit(line):
+            total[0] += 1
+            if max_entries is None or len(lines) < max_entries:
+                lines.append(line)
+
+        def walk(relpath, name, level):
+            emit(f"{' ' * (level * 4)}{name}/")
+            dirs, files = visible.get(relpath, ((), ()))
+            sub_indent = " " * ((level + 1) * 4)
+            if max_depth is not None and level >= max_depth:
+                if dirs or files:
+                    emit(f"{sub_indent}...")
+                return
+            for f in files:
+                emit(f"{sub_indent}{f}")
+            for d in dirs:
+                walk(self._join(relpath, d), d, level + 1)
+
+        walk("", os.path.basename(self.root) or self.root, 0)
+        if max_entries is not None and total[0] > max_entries:
+            lines.append(f"... ({total[0] - max_entries} more entries)")
+        return "\n".join(lines) + "\n"
+
+    def fingerprint(self, sources_only=False, exclude=()):
+        """
+        Cheap fingerprint of the visible files: [relative path, mtime, size] of each of them.
+        :param sources_only: If True, only Python files and the global test settings (the files
+                             test selection tracks) are included, not docs, logs or other outputs.
+        :param exclude: Relative directory paths ('/'-separated) whose files are left out.
+        """
+        entries = []
+        excluded = tuple(path.rstrip("/") + "/" for path in exclude)
+        for relpath, (_, files) in sorted(self.refresh().items()):
+            if relpath and (relpath + "/").startswith(excluded):
+                continue
+            for name in files:
+                if sources_only and not (name.endswith(".py") or (not relpath and name in GLOBAL_FILES)):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.root, relpath, name))
+                except OSError:
+                    continue
+                entries.append([self._join(relpath, name), st.st_mtime_ns, st.st_size])
+        return entries
+
+
+def _worker_index(root, state_dir):
+    key = (os.path.abspath(root), state_dir)
+    index = _worker_indexes.get(key)
+    if index is None:
+        index = _worker_indexes[key] = TreeIndex(root, state_dir)
+    return index
+
+
+def tree_summary(root, state_dir=".devautomator", max_depth=None, max_entries=None):
+    """
+    Module-level entry point of TreeIndex.summary() that can be submitted to a process pool.
+    """
+    return _worker_index(root, state_dir).summary(max_depth=max_depth, max_entries=max_entries)
+
+
+def tree_fingerprint(root, state_dir=".devautomator", sources_only=False, exclude=()):
+    """
+    Module-level entry point of TreeIndex.fingerprint() that can be submitted to a process pool.
+    """
+    return _worker_index(root, state_dir).fingerprint(sources_only, exclude)